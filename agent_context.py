@@ -0,0 +1,209 @@
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:  # tiktoken is optional; fall back to a character estimate
+    _encoding = None
+
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in a string."""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message):
+    # Every chat message carries a few tokens of role/formatting overhead
+    return estimate_tokens(message.get("content")) + 4
+
+
+def summarize_turn(summary, message, max_chars):
+    """
+    Fold one old message into a rolling plain-text summary.
+
+    Only what the customer said is kept; the assistant's replies are implied
+    by the current order, which the prompt always carries in full. The
+    summary keeps its most recent max_chars characters.
+    """
+    if message.get("role") != "user":
+        return summary
+    said = " ".join((message.get("content") or "").split())
+    if len(said) > 160:
+        said = said[:157] + "..."
+    summary = f"{summary} | {said}" if summary else said
+    if len(summary) > max_chars:
+        summary = "..." + summary[-(max_chars - 3):]
+    return summary
+
+
+class PromptWindow:
+    """
+    Builds the message list sent to the model for one ordering turn.
+
+    The prompt is the system message, a summary of older turns, as many
+    recent turns as fit in the token budget, one current-order slot, and the
+    new user message. The budget covers everything after the system
+    message: the system message carries the whole menu and is the same for
+    every turn, so counting it would leave history room that depends on the
+    menu's size. Orders are never stored inside history messages, so
+    the prompt carries exactly one order snapshot no matter how long the
+    conversation runs.
+
+    The system message is the prompt's static prefix: callers pass the same
+    string for every turn on a menu, and everything that varies per session
+    follows it. The window counts how often a turn's prefix was one it had
+    already sent, and records the prompt tokens the provider reports serving
+    from its prompt cache.
+
+    Args:
+        token_budget (int): Target maximum size in tokens of the prompt after the system message
+                            (summary, history, current order and user message)
+        max_summary_chars (int): Maximum length of the older-turns summary
+        metrics_window (int): Number of recent turns kept for prompt-size metrics
+    """
+
+    def __init__(self, token_budget=3000, max_summary_chars=1200, metrics_window=200):
+        self.token_budget = token_budget
+        self.max_summary_chars = max_summary_chars
+
+        self._recent_metrics = deque(maxlen=metrics_window)
+        self._lock = threading.Lock()
+        self._prefix_tokens = OrderedDict()  # System message -> its token count, most recently used last
+        self.turns = 0
+        self.total_prompt_tokens = 0
+        self.total_build_seconds = 0.0
+        self.reused_prefixes = 0           # Turns whose system message was already sent earlier
+        self.provider_prompt_tokens = 0    # Prompt tokens reported by the provider
+        self.provider_cached_tokens = 0    # ...of which it served from its prompt cache
+
+    @staticmethod
+    def order_message(current_order):
+        """Return the message carrying the session's current order."""
+        return {"role": "system", "content": f"Current order: {json.dumps(current_order)}"}
+
+    def fold(self, summary, message):
+        """Fold a message dropped from conversation memory into a summary."""
+        return summarize_turn(summary, message, self.max_summary_chars)
+
+    def _system_tokens(self, system_message):
+        """Return (tokens, reused) for a system message, counting each distinct message once."""
+        with self._lock:
+            tokens = self._prefix_tokens.get(system_message)
+            if tokens is not None:
+                self._prefix_tokens.move_to_end(system_message)
+                return tokens, True
+        tokens = estimate_tokens(system_message) + 4
+        with self._lock:
+            self._prefix_tokens[system_message] = tokens
+            while len(self._prefix_tokens) > 64:
+                self._prefix_tokens.popitem(last=False)
+        return tokens, False
+
+    def build(self, system_message, history, summary, current_order, user_message, build_started=None):
+        """
+        Build the prompt for one turn.
+
+        Args:
+            system_message (str): Instructions and menu; the same string for every turn on a menu
+            history (list): Earlier user/assistant messages, oldest first
+            summary (str): Rolling summary of turns already dropped from history
+            current_order (dict): The session's current order
+            user_message (str): The new message from the customer
+            build_started (float, optional): perf_counter() when the caller began building
+                                             the prompt, to include its own work in build time
+
+        Returns:
+            tuple: (messages, metrics) where metrics describes the prompt size
+        """
+        if build_started is None:
+            build_started = time.perf_counter()
+        system = {"role": "system", "content": system_message}
+        order_slot = self.order_message(current_order)
+        user = {"role": "user", "content": user_message}
+
+        system_tokens, prefix_reused = self._system_tokens(system_message)
+        fixed_tokens = message_tokens(order_slot) + message_tokens(user)
+        # Room for the summary is reserved up front, since it may grow by what this turn folds in
+        summary_reserve = self.max_summary_chars // 4 + 16
+        remaining = self.token_budget - fixed_tokens - summary_reserve
+
+        # Keep the newest turns that fit; everything older is folded into the summary
+        kept = []
+        cut = len(history)
+        for index in range(len(history) - 1, -1, -1):
+            tokens = message_tokens(history[index])
+            if tokens > remaining:
+                break
+            remaining -= tokens
+            kept.append(history[index])
+            cut = index
+        kept.reverse()
+
+        for message in history[:cut]:
+            summary = self.fold(summary, message)
+
+        messages = [system]
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of earlier conversation (customer said): {summary}"})
+        messages.extend(kept)
+        messages.append(order_slot)
+        messages.append(user)
+
+        history_tokens = sum(message_tokens(m) for m in kept)
+        summary_tokens = message_tokens(messages[1]) if summary else 0
+        metrics = {
+            "system_tokens": system_tokens,
+            "summary_tokens": summary_tokens,
+            "history_tokens": history_tokens,
+            "order_tokens": message_tokens(order_slot),
+            "user_tokens": message_tokens(user),
+            "context_tokens": fixed_tokens + history_tokens + summary_tokens,
+            "total_tokens": system_tokens + fixed_tokens + history_tokens + summary_tokens,
+            "history_messages": len(kept),
+            "summarized_messages": cut,
+            "prefix_reused": prefix_reused,
+            "build_seconds": time.perf_counter() - build_started
+        }
+        self._record(metrics)
+        return messages, metrics
+
+    def _record(self, metrics):
+        with self._lock:
+            self._recent_metrics.append(metrics)
+            self.turns += 1
+            self.total_prompt_tokens += metrics["total_tokens"]
+            self.total_build_seconds += metrics["build_seconds"]
+            self.reused_prefixes += metrics["prefix_reused"]
+
+    def record_usage(self, prompt_tokens, cached_tokens):
+        """Record a model call's prompt tokens and how many the provider served from its cache."""
+        with self._lock:
+            self.provider_prompt_tokens += prompt_tokens
+            self.provider_cached_tokens += cached_tokens
+
+    def stats(self):
+        """Return prompt-size metrics over all turns and the recent window."""
+        with self._lock:
+            recent = [m["total_tokens"] for m in self._recent_metrics]
+            last = self._recent_metrics[-1] if self._recent_metrics else None
+            return {
+                "turns": self.turns,
+                # The budget excludes the system message; with the last turn's system
+                # message, prompts stay within max_prompt_tokens
+                "token_budget": self.token_budget,
+                "max_prompt_tokens": last["system_tokens"] + self.token_budget if last else None,
+                "average_prompt_tokens": self.total_prompt_tokens / self.turns if self.turns else 0,
+                "recent_max_prompt_tokens": max(recent) if recent else 0,
+                "average_build_ms": 1000 * self.total_build_seconds / self.turns if self.turns else 0,
+                "prefix_reuse_rate": self.reused_prefixes / self.turns if self.turns else 0,
+                "provider_cached_token_rate": (self.provider_cached_tokens / self.provider_prompt_tokens
+                                               if self.provider_prompt_tokens else 0),
+                "last_turn": last
+            }
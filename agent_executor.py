@@ -0,0 +1,102 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AgentBusy(Exception):
+    """Raised when a chat turn is submitted while the agent executor is full."""
+
+
+class AgentExecutor:
+    """
+    Bounded pool that runs chat turns off the request path.
+
+    At most max_workers turns call the LLM at once and at most max_queued
+    more wait for a worker; a turn submitted beyond that is rejected with
+    AgentBusy straight away instead of holding a server thread for seconds.
+    Every admitted turn holds the server thread that waits for it (the
+    /api/chat request, or the stream's response generator), so keeping
+    max_workers + max_queued below the web server's thread count means slow
+    LLM calls can never occupy every thread, and cart and menu routes stay
+    responsive however many chat turns are in flight.
+
+    Args:
+        max_workers (int): Turns that run concurrently
+        max_queued (int): Turns that may wait for a worker before new ones are rejected
+    """
+
+    def __init__(self, max_workers=4, max_queued=4):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queued)
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0  # Time turns spent queued for a worker
+        self.total_run_seconds = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule fn(*args, **kwargs) and return its Future. Raises AgentBusy when full."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise AgentBusy(f"{self.max_workers} turns running and {self.max_queued} queued")
+        with self._lock:
+            self.admitted += 1
+        try:
+            return self._pool.submit(self._run, time.perf_counter(), fn, args, kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def run(self, fn, *args, timeout=None, **kwargs):
+        """
+        Run fn on the pool and wait for its result.
+
+        Raises AgentBusy when full and concurrent.futures.TimeoutError if the
+        turn takes longer than timeout seconds; the turn itself still finishes.
+        """
+        return self.submit(fn, *args, **kwargs).result(timeout=timeout)
+
+    def _run(self, submitted_at, fn, args, kwargs):
+        started = time.perf_counter()
+        with self._lock:
+            self.running += 1
+            self.total_wait_seconds += started - submitted_at
+        succeeded = False
+        try:
+            result = fn(*args, **kwargs)
+            succeeded = True
+            return result
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.total_run_seconds += time.perf_counter() - started
+                if succeeded:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            self._slots.release()
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+    def stats(self):
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "max_workers": self.max_workers,
+                "max_queued": self.max_queued,
+                "running": self.running,
+                "queued": self.admitted - finished - self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "average_wait_seconds": self.total_wait_seconds / finished if finished else 0,
+                "average_run_seconds": self.total_run_seconds / finished if finished else 0
+            }
@@ -0,0 +1,80 @@
+import json
+import re
+
+_HIGH_SURROGATE = re.compile(r"\\u[dD][89abAB][0-9a-fA-F]{2}")
+
+
+class JsonFieldStream:
+    """
+    Extracts one string field from a JSON object while the object is still
+    being generated.
+
+    Chunks of raw JSON text are fed in as they arrive from the model, and
+    feed() returns the newly decoded text of the field, so the customer can
+    read the reply before the rest of the object (such as the order) is done.
+    Relies on the field being a top-level string whose name does not appear
+    earlier in the object, which holds for the order turn schema.
+    """
+
+    def __init__(self, field):
+        self._start = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._position = None  # Index of the next undecoded character of the field value
+        self.done = False
+
+    def feed(self, chunk):
+        """Add raw JSON text; return the field text decoded from it (possibly empty)."""
+        self._buffer += chunk
+        if self.done:
+            return ""
+        if self._position is None:
+            match = self._start.search(self._buffer)
+            if match is None:
+                return ""
+            self._position = match.end()
+
+        decoded = []
+        buffer = self._buffer
+        position = self._position
+        while position < len(buffer):
+            char = buffer[position]
+            if char == '"':
+                self.done = True
+                break
+            if char != "\\":
+                decoded.append(char)
+                position += 1
+                continue
+            # Escape sequences are only decoded once they have fully arrived
+            length = 6 if buffer.startswith("\\u", position) else 2
+            if length == 6 and _HIGH_SURROGATE.match(buffer, position):
+                length = 12  # A surrogate pair is decoded as one character
+            if position + length > len(buffer):
+                break
+            decoded.append(json.loads(f'"{buffer[position:position + length]}"'))
+            position += length
+        self._position = position
+        return "".join(decoded)
+
+
+class SeparatorStream:
+    """
+    Passes through the text that follows a separator, such as the reply after
+    the two-stage agent's JSON header line.
+    """
+
+    def __init__(self, separator="\n\n"):
+        self.separator = separator
+        self._buffer = ""
+        self._passing = False
+
+    def feed(self, chunk):
+        if self._passing:
+            return chunk
+        self._buffer += chunk
+        head, found, tail = self._buffer.partition(self.separator)
+        if not found:
+            return ""
+        self._passing = True
+        self._buffer = ""
+        return tail
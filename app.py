@@ -1,16 +1,28 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, Response, abort, g, render_template, request, jsonify, session, redirect, url_for
 import os
+import gzip
+import queue
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import time
 from datetime import datetime
 import json
 import sys
 import random
+import uuid
+from markupsafe import Markup
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from menu import Menu, MenuItem
-from shopping_cart import ShoppingCart
-from new_agent import client, load_current_order, save_order, initialize_new_order, process_order_request, reset_conversation_history
+from menu import Menu, MenuItem, size_display_name, split_item_id
+from shopping_cart import customized_line as build_customized_line
+from local_parser import OrderParser
+from order_repair import OrderRepairer
+from order_tools import ingredient_index
+from menu_registry import MenuRegistry
+from menu_compiler import compile_menu
+from agent_executor import AgentBusy
+from new_agent import agent_executor, order_store, conversation_store, prompt_window, response_cache, load_current_order, initialize_new_order, process_order_request, reset_conversation_history
 
 app = Flask(__name__)
 app.secret_key = 'fastfoodkiosk_secretkey'
@@ -24,37 +36,22 @@ def load_test_orders():
 TEST_ORDERS = load_test_orders()
 
 class CustomMenu(Menu):
-    def load_menu(self, filename: str):
-        with open(filename, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-
-        for item in data['menuItems']:
-            menu_item = MenuItem(
-                name=item['name'],
-                id=item['id'],
-                price=item['price'],
-                ingredients=item['ingredients'],
-                combo=False,
-                size=item['size'],
-                category=item['category'],
-                description=item['description']
-            )
-            self.items[item['id']] = menu_item
-
-        for item in self.items.values():
-            resolved_ingredients = []
-            for ing_id in item.ingredients:
-                if ing_id in self.items:
-                    resolved_ingredients.append(self.items[ing_id])
-                else:
-                    print(f"Warning: Ingredient {ing_id} not found for item {item.id}")
-            
-            item.ingredients = resolved_ingredients
+    available_extras = []  # Extras offered with every item, rebuilt by build_indexes
 
-    def serialize_item(self, item):
-        if not item:
-            return None
-        
+    def create_item(self, item):
+        # Kiosk items carry no per-item add-ons, and the study UI does not offer combos
+        return MenuItem(
+            name=item['name'],
+            id=item['id'],
+            price=item['price'],
+            ingredients=item['ingredients'],
+            combo=False,
+            size=item['size'],
+            category=item['category'],
+            description=item['description']
+        )
+
+    def build_serialized_item(self, item):
         serialized = {
             'id': item.id,
             'name': item.name,
@@ -82,7 +79,10 @@ class CustomMenu(Menu):
         
         return serialized
     
-    def get_available_extras(self, item):
+    def build_indexes(self, prebuilt=None):
+        super().build_indexes(prebuilt)
+        
+        # Every item offers the same extras, so they are built once per menu load
         extras = []
         extra_categories = ['toppings', 'condiments']
         
@@ -97,54 +97,268 @@ class CustomMenu(Menu):
                     })
                     continue
                 
-                # Normal logic for other toppings
-                
-                is_already_ingredient = False
-                
-                if not is_already_ingredient:
-                    extras.append({
-                        'id': potential_extra.id,
-                        'name': potential_extra.name,
-                        'price': potential_extra.price
-                    })
+                extras.append({
+                    'id': potential_extra.id,
+                    'name': potential_extra.name,
+                    'price': potential_extra.price
+                })
+        
+        self.available_extras = extras
         
-        return extras
+        # Resolves simple orders against this menu without calling the LLM
+        self.order_parser = OrderParser(self.items, self.normalized_words)
+        # Maps the agent's unknown IDs and mangled sizes onto this menu
+        self.order_repairer = OrderRepairer(self.items, self.normalized_words)
+        # Reads the ingredients added and removed in the agent's notes on this menu
+        self.ingredient_index = ingredient_index(self.items, self.normalized_words)
+    
+    def get_available_extras(self, item):
+        return self.available_extras
       
     def find_items_by_category(self, category):
-        matching_items = []
-        category_lower = category.lower()
-        for item in self.items.values():
-            if item.category.lower() == category_lower:
-                matching_items.append(item)
-        return matching_items
-
-class CustomizedMenuItem:
-    def __init__(self, base_item, removed_ingredients=None, added_ingredients=None):
-        self.base_item = base_item
-        self.removed_ingredients = removed_ingredients or []
-        self.added_ingredients = added_ingredients or []
-        self.id = f"{base_item.id}-custom-{datetime.now().timestamp()}"
-        
-        self.price = base_item.price
+        return self.get_items(category)
+
+def get_session_id():
+    """Return the ID keying this kiosk session's order, creating one if needed."""
+    if 'session_id' not in session:
+        session['session_id'] = uuid.uuid4().hex
+    return session['session_id']
+
+# Menus for every store this process serves, loaded on first use and reloaded in the
+# background when their files change. The default store is menu_data.json.
+menu_registry = MenuRegistry(
+    directory=os.environ.get("MENU_DIRECTORY", "menus"),
+    default_store=os.environ.get("DEFAULT_STORE_ID", "default"),
+    menu_factory=CustomMenu,
+    max_resident=int(os.environ.get("MAX_RESIDENT_MENUS", "50")),
+    poll_interval=float(os.environ.get("MENU_POLL_INTERVAL", "2.0"))
+).start()
+menu_registry.preload([menu_registry.default_store] +
+                      [store for store in os.environ.get("PRELOAD_STORES", "").split(",") if store])
+
+@app.cli.command("compile-menu")
+def compile_menu_command():
+    """Validate and compile the menu files of every store for fast loading."""
+    paths = [menu_registry.default_path]
+    if os.path.isdir(menu_registry.directory):
+        paths += sorted(os.path.join(menu_registry.directory, name)
+                        for name in os.listdir(menu_registry.directory) if name.endswith(".json"))
+    for path in paths:
+        try:
+            print(f"Compiled {path} -> {compile_menu(path)}")
+        except Exception as e:
+            print(f"Error compiling {path}: {e}")
+
+def get_store_id():
+    """
+    Return this session's store; a ?store= parameter on any page switches it.
+
+    The parameter is only saved to the session once the store's menu loads,
+    so an unknown store fails that one request rather than the whole session.
+    """
+    store_id = request.args.get('store')
+    if not store_id:
+        return session.get('store_id', menu_registry.default_store)
+    if 'menu' not in g:
+        try:
+            g.menu = menu_registry.menu(store_id)
+        except KeyError:
+            abort(404, f"Unknown store {store_id}")
+    session['store_id'] = store_id
+    return store_id
+
+def get_menu():
+    """Return the session's store menu snapshot; a request keeps one snapshot even across a reload."""
+    if 'menu' not in g:
+        store_id = get_store_id()
+        if 'menu' not in g:
+            try:
+                g.menu = menu_registry.menu(store_id)
+            except KeyError:
+                # A store that has since been removed is forgotten, so the next request gets the default
+                session.pop('store_id', None)
+                abort(404, f"Unknown store {store_id}")
+    return g.menu
+
+# Seconds a browser may reuse a menu lookup before revalidating it with its ETag
+MENU_CACHE_MAX_AGE = int(os.environ.get("MENU_CACHE_MAX_AGE", "60"))
+
+def menu_cached_response(build, gzip_variant=False):
+    """
+    Return a menu lookup response that browsers can cache until the menu changes.
+
+    GET responses carry the menu's ETag and a private Cache-Control header; a
+    request whose If-None-Match already names the current ETag gets an empty
+    304 without the response being built. The store comes from the session
+    cookie, so responses vary on it.
+
+    Args:
+        build (callable): Takes the menu and returns the full response
+        gzip_variant (bool): build gzips the response when the request accepts gzip.
+                             The gzipped and identity bodies then get distinct ETags,
+                             and responses vary on Accept-Encoding
+    """
+    menu = get_menu()
+    if request.method != 'GET':
+        return build(menu)
+
+    etag = menu.etag
+    if gzip_variant and accepts_gzip():
+        etag += "-gzip"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = build(menu)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = MENU_CACHE_MAX_AGE
+    response.vary.add('Cookie')
+    if gzip_variant:
+        response.vary.add('Accept-Encoding')
+    return response
+
+def accepts_gzip():
+    """Return True if the current request accepts a gzip-encoded response."""
+    return 'gzip' in request.accept_encodings
+
+MENU_PAGE_EXCLUDED_CATEGORIES = ['ingredients', 'toppings', 'condiments']
+MENU_PAGE_CATEGORY_ORDER = ['burgers', 'sides', 'drinks', 'desserts', 'breakfast']
+
+# Rendered menu categories and items, keyed by menu version (one entry per store menu)
+menu_fragment_cache = {}
+# Compressed menu snapshots for the client, keyed by menu version
+menu_snapshot_cache = {}
+menu_cache_lock = threading.Lock()
+
+def cached_per_menu_version(cache, menu, build):
+    """Return cache[menu.version], building it with build(menu) on first use."""
+    value = cache.get(menu.version)
+    if value is None:
+        value = build(menu)
+        with menu_cache_lock:
+            # Drop the oldest entries, from reloaded or evicted menus
+            while len(cache) >= 2 * menu_registry.max_resident:
+                cache.pop(next(iter(cache)))
+            cache[menu.version] = value
+    return value
+
+def build_menu_display(menu):
+    """Group the menu's items by base ID for the menu page. Returns (categories, display_items)."""
+    grouped_items = {}
+    
+    for item in menu.get_items():
+        if item.category in MENU_PAGE_EXCLUDED_CATEGORIES:
+            continue
         
-        for ing_id in self.added_ingredients:
-            ing = menu.get_item_information(ing_id)
-            if ing:
-                self.price += ing.price
+        base_id, size_code = split_item_id(item.id)
+        if base_id in grouped_items:
+            continue
         
-        self.name = f"{base_item.name} (Customized)"
+        grouped_items[base_id] = {
+            'id': base_id,
+            'name': item.name.split(' (')[0] if ' (' in item.name else item.name,  # Remove size from name
+            'description': item.description,
+            'category': item.category,
+            'combo': item.combo,
+            'sizes': [],
+            'has_multiple_sizes': False,
+            'base_price': item.price  # Default to the first found item's price
+        }
         
-        self.category = base_item.category
-        self.size = base_item.size
-        self.combo = False
-        self.description = base_item.description
+        if size_code:
+            sizes = list(menu.get_size_options(base_id))
+            grouped_items[base_id]['sizes'] = sizes
+            grouped_items[base_id]['has_multiple_sizes'] = True
+            # Set the default price to the medium size if available, otherwise the first size
+            medium_size = next((s for s in sizes if s['size_code'] == 'm'), None)
+            grouped_items[base_id]['base_price'] = (medium_size or sizes[0])['price']
+    
+    display_items = list(grouped_items.values())
+    
+    categories = []
+    for item in display_items:
+        if item['category'] not in categories:
+            categories.append(item['category'])
+    
+    categories.sort(key=lambda x: MENU_PAGE_CATEGORY_ORDER.index(x) if x in MENU_PAGE_CATEGORY_ORDER else 999)
+    
+    return categories, display_items
+
+def get_menu_fragment():
+    """Return the rendered menu categories and items, rendering them once per menu version."""
+    def render(menu):
+        categories, display_items = build_menu_display(menu)
+        return Markup(render_template('menu_items.html',
+                                      categories=categories,
+                                      menu_items=display_items))
+
+    return cached_per_menu_version(menu_fragment_cache, get_menu(), render)
+
+def item_details(menu, item_id):
+    """Return the serialized item with its size options, or None if it is not on the menu."""
+    item = menu.get_item_information(item_id)
+    if not item:
+        return None
+
+    serialized_item = menu.serialize_item(item)
+
+    # If this is a size variation, also include information about other sizes
+    base_id, size_code = split_item_id(item_id)
+    if size_code:
+        serialized_item['available_sizes'] = list(menu.get_size_options(base_id))
+        serialized_item['is_size_variant'] = True
+        serialized_item['base_id'] = base_id
+    return serialized_item
+
+def list_sauces(menu):
+    return [{
+        'id': item.id,
+        'name': item.name,
+        'price': item.price
+    } for item in menu.sauces]
+
+def list_drinks(menu):
+    return [{
+        'id': item.id,
+        'name': item.name,
+        'price': item.price,
+        'size': item.size,
+    } for item in menu.drinks]
+
+def list_sides(menu):
+    return [{
+        'id': item.id,
+        'name': item.name,
+        'price': item.price,
+        'size': item.size
+    } for item in menu.sides]
+
+def build_menu_snapshot(menu):
+    """
+    Build the whole display menu as (json_bytes, gzipped_bytes) for the client to preload.
 
-menu = CustomMenu()
+    The snapshot holds what the menu page otherwise fetches item by item: the
+    grouped display items, the details (sizes and extras included) of every
+    item the customer can order, and the sauce, drink and side lists.
+    """
+    categories, display_items = build_menu_display(menu)
+    details = {item.id: item_details(menu, item.id)
+               for item in menu.get_items()
+               if item.category not in MENU_PAGE_EXCLUDED_CATEGORIES}
+    for item in menu.sauces:
+        details[item.id] = item_details(menu, item.id)
 
-try:
-    menu.load_menu("menu_data.json")
-except Exception as e:
-    print(f"Error loading menu: {e}")
+    body = json.dumps({
+        'success': True,
+        'version': menu.etag,
+        'categories': categories,
+        'items': display_items,
+        'details': details,
+        'sauces': list_sauces(menu),
+        'drinks': list_drinks(menu),
+        'sides': list_sides(menu)
+    }, separators=(',', ':')).encode('utf-8')
+    return body, gzip.compress(body, compresslevel=9)
 
 @app.route('/')
 def start_page():
@@ -213,9 +427,9 @@ def start_test():
         return "Error: Order not found", 500
     
     # Initialize a new empty order
-    initialize_new_order()
+    initialize_new_order(get_session_id())
     # Reset conversation history for AI
-    reset_conversation_history()
+    reset_conversation_history(get_session_id())
     print('order initialized')
     
     # Store test start time
@@ -260,103 +474,8 @@ def menu_page():
     order_id = current_test['order_id']
     order_details = next((order for order in TEST_ORDERS if order['id'] == order_id), None)
     
-    # Ensure we have a valid order file
-    if not os.path.exists('order.json'):
-        initialize_new_order()
-        print('order initialized')
-        
-    excluded_categories = ['ingredients', 'toppings', 'condiments']
-    
-    menu_items = menu.get_items()
-    
-    # Group items with the same base ID
-    grouped_items = {}
-    
-    for item in menu_items:
-        if item.category in excluded_categories:
-            continue
-            
-        # Extract base ID (everything before the dash if it exists)
-        base_id = item.id.split('-')[0] if '-' in item.id else item.id
-        
-        # Create or get the group for this base ID
-        if base_id not in grouped_items:
-            # Initialize with the first item found with this base ID
-            grouped_items[base_id] = {
-                'id': base_id,
-                'name': item.name.split(' (')[0] if ' (' in item.name else item.name,  # Remove size from name
-                'description': item.description,
-                'category': item.category,
-                'combo': item.combo,
-                'sizes': [],
-                'has_multiple_sizes': False,
-                'base_price': item.price  # Default to the first found item's price
-            }
-        
-        # Add this item as a size option
-        if '-' in item.id:
-            size_code = item.id.split('-')[1]
-            size_name = item.size
-            
-            # Map size codes to full names if needed
-            # Check if this is a piece-count item like McNuggets or Mozzarella Sticks
-            is_piece_count_item = 'NUG' in base_id or 'SIDE006' in base_id  # McNuggets or Mozzarella Sticks
-            
-            if is_piece_count_item:
-                # Extract piece count from the name
-                pc_count = ""
-                if "(" in item.name and ")" in item.name:
-                    pc_info = item.name.split("(")[1].split(")")[0]
-                    if "pc" in pc_info.lower():
-                        pc_count = pc_info
-                    else:
-                        pc_count = size_name.capitalize()
-                else:
-                    pc_count = size_name.capitalize()
-                size_display = pc_count
-            else:
-                size_display = {
-                    's': 'Small', 
-                    'm': 'Medium', 
-                    'l': 'Large',
-                    'xl': 'Extra Large'
-                }.get(size_code, size_name)
-            
-            grouped_items[base_id]['sizes'].append({
-                'id': item.id,
-                'size_code': size_code,
-                'size_name': size_display,
-                'price': item.price,
-                'name': item.name
-            })
-            grouped_items[base_id]['has_multiple_sizes'] = True
-    
-    # Sort sizes within each group (s, m, l, xl)
-    size_order = {'s': 0, 'm': 1, 'l': 2, 'xl': 3}
-    for item in grouped_items.values():
-        if item['sizes']:
-            item['sizes'].sort(key=lambda x: size_order.get(x['size_code'], 99))
-            # Set the default price to the medium size if available, otherwise the first size
-            medium_size = next((s for s in item['sizes'] if s['size_code'] == 'm'), None)
-            if medium_size:
-                item['base_price'] = medium_size['price']
-            elif item['sizes']:
-                item['base_price'] = item['sizes'][0]['price']
-    
-    # Convert dictionary to list for the template
-    display_items = list(grouped_items.values())
-    
-    categories = []
-    for item in display_items:
-        if item['category'] not in categories and item['category'] not in excluded_categories:
-            categories.append(item['category'])
-    
-    category_order = ['burgers', 'sides', 'drinks', 'desserts', 'breakfast']
-    categories.sort(key=lambda x: category_order.index(x) if x in category_order else 999)
-    
     return render_template('menu.html', 
-                          categories=categories, 
-                          menu_items=display_items,
+                          menu_fragment=get_menu_fragment(),
                           order_description=order_details['description'],
                           method=session['method'])
 
@@ -372,8 +491,8 @@ def checkout_page():
     seconds = int(session['elapsed_time'] % 60)
     time_display = f"{minutes}m {seconds}s"
     
-    # Load current order from order.json
-    current_order = load_current_order()
+    # Load current order for this session
+    current_order = load_current_order(get_session_id())
     
     # Get current test info
     current_test = session['test_sequence'][session['current_test_index']]
@@ -411,7 +530,7 @@ def complete_test():
     order_details = next((order for order in TEST_ORDERS if order['id'] == order_id), None)
     
     # Load final order
-    final_order = load_current_order()
+    final_order = load_current_order(get_session_id())
     
     # Create a human-readable log entry in a separate file
     with open('test_results_readable.txt', 'a', encoding='utf-8') as f:
@@ -449,90 +568,50 @@ def complete_test():
 
 @app.route('/api/add_to_cart', methods=['POST'])
 def add_to_cart():
+    menu = get_menu()
     item_id = request.json.get('item_id')
     # Add support for multiple items in a single request
     multiple_items = request.json.get('multiple_items', False)
     items_to_add = request.json.get('items', [])
     
+    session_id = get_session_id()
+    
     # If we're adding multiple items at once
     if multiple_items and items_to_add:
-        # Load current order from order.json
-        current_order = load_current_order()
-        
-        # Prepare the order structure if needed
-        if "menuItems" not in current_order:
-            current_order["menuItems"] = []
-        
-        # Add each item to the cart
+        # Add each item to the cart, persisted as a single batch
+        ops = []
         for item_data in items_to_add:
             item_id_to_add = item_data.get('id')
             item = menu.get_item_information(item_id_to_add)
             if not item:
                 continue  # Skip invalid items
-                
-            # Check if item already exists in order
-            item_exists = False
-            for order_item in current_order["menuItems"]:
-                if order_item["id"] == item_id_to_add:
-                    order_item["quantity"] += 1
-                    item_exists = True
-                    break
             
-            # If item doesn't exist, add it
-            if not item_exists:
-                current_order["menuItems"].append({
-                    "id": item_id_to_add,
-                    "name": item.name,
-                    "price": item.price,
-                    "quantity": 1
-                })
-        
-        # Calculate the new total
-        current_order["total"] = sum(item["price"] * item["quantity"] for item in current_order["menuItems"])
+            ops.append({
+                "op": "add",
+                "line": {"id": item_id_to_add, "name": item.name, "price": item.price, "quantity": 1}
+            })
         
-        # Save the updated order
-        save_order(current_order, menu.get_items())
+        with order_store.lock(session_id):
+            order_store.apply(session_id, {"op": "batch", "ops": ops})
+            current_order = load_current_order(session_id)
         
-        return jsonify({
-            "success": True, 
-            "cart": current_order["menuItems"], 
-            "total": current_order["total"]
-        })
+            return jsonify({
+                "success": True, 
+                "cart": current_order["menuItems"], 
+                "total": current_order["total"]
+            })
     
     # Original single item logic
     item = menu.get_item_information(item_id)
     if not item:
         return jsonify({"success": False, "message": "Item not found"})
     
-    # Load current order from order.json
-    current_order = load_current_order()
-    
-    # Prepare the order structure if needed
-    if "menuItems" not in current_order:
-        current_order["menuItems"] = []
-    
-    # Check if item already exists in order
-    item_exists = False
-    for order_item in current_order["menuItems"]:
-        if order_item["id"] == item_id:
-            order_item["quantity"] += 1
-            item_exists = True
-            break
-    
-    # If item doesn't exist, add it
-    if not item_exists:
-        current_order["menuItems"].append({
-            "id": item_id,
-            "name": item.name,
-            "price": item.price,
-            "quantity": 1
+    with order_store.lock(session_id):
+        order_store.apply(session_id, {
+            "op": "add",
+            "line": {"id": item_id, "name": item.name, "price": item.price, "quantity": 1}
         })
-    
-    # Calculate the new total
-    current_order["total"] = sum(item["price"] * item["quantity"] for item in current_order["menuItems"])
-    
-    # Save the updated order
-    save_order(current_order, menu.get_items())
+        current_order = load_current_order(session_id)
     
     # Check if we should suggest sides/drinks or sauces
     suggestion = None
@@ -565,9 +644,8 @@ def add_to_cart():
 
 @app.route('/api/clear_cart', methods=['POST'])
 def clear_cart():
-    # Create an empty order and save it
-    empty_order = {"menuItems": [], "total": 0.0}
-    save_order(empty_order)
+    # Replace this session's order with an empty one
+    initialize_new_order(get_session_id())
     
     return jsonify({
         "success": True,
@@ -576,79 +654,81 @@ def clear_cart():
 
 @app.route('/api/get_cart', methods=['GET'])
 def get_cart():
-    # Load current order from order.json
-    current_order = load_current_order()
+    session_id = get_session_id()
     
-    return jsonify({
-        "success": True,
-        "cart": current_order.get("menuItems", []),
-        "total": current_order.get("total", 0.0)
-    })
+    with order_store.lock(session_id):
+        # Load current order for this session
+        current_order = load_current_order(session_id)
+        
+        return jsonify({
+            "success": True,
+            "cart": current_order.get("menuItems", []),
+            "total": current_order.get("total", 0.0)
+        })
 
-@app.route('/api/get_item_details', methods=['POST'])
+# GET ?item_id= is cacheable; POST with a JSON body is kept for older clients
+@app.route('/api/get_item_details', methods=['GET', 'POST'])
 def get_item_details():
-    item_id = request.json.get('item_id')
-    
-    # Check if this is a size-specific ID (contains a dash)
-    base_id = item_id.split('-')[0] if '-' in item_id else item_id
-    size_code = item_id.split('-')[1] if '-' in item_id else None
-    
-    item = menu.get_item_information(item_id)
-    if not item:
-        return jsonify({"success": False, "message": "Item not found"})
-    
-    serialized_item = menu.serialize_item(item)
-    
-    # If this is a size variation, also include information about other sizes
-    if size_code:
-        sizes = []
-        # Look for other size variations of this item
-        for menu_item in menu.get_items():
-            if '-' in menu_item.id and menu_item.id.split('-')[0] == base_id:
-                item_size_code = menu_item.id.split('-')[1]
-                
-                # Check if this is a piece-count item
-                is_piece_count_item = 'NUG' in base_id or 'SIDE006' in base_id  # McNuggets or Mozzarella Sticks
-                
-                if is_piece_count_item:
-                    # Extract piece count from the name
-                    pc_count = ""
-                    if "(" in menu_item.name and ")" in menu_item.name:
-                        pc_info = menu_item.name.split("(")[1].split(")")[0]
-                        if "pc" in pc_info.lower():
-                            pc_count = pc_info
-                        else:
-                            pc_count = menu_item.size.capitalize()
-                    else:
-                        pc_count = menu_item.size.capitalize()
-                    size_display = pc_count
-                else:
-                    size_display = {
-                        's': 'Small', 
-                        'm': 'Medium', 
-                        'l': 'Large',
-                        'xl': 'Extra Large'
-                    }.get(item_size_code, menu_item.size)
-                
-                sizes.append({
-                    'id': menu_item.id,
-                    'size_code': item_size_code,
-                    'size_name': size_display,
-                    'price': menu_item.price
-                })
-        
-        # Sort sizes
-        size_order = {'s': 0, 'm': 1, 'l': 2, 'xl': 3}
-        sizes.sort(key=lambda x: size_order.get(x['size_code'], 99))
-        
-        serialized_item['available_sizes'] = sizes
-        serialized_item['is_size_variant'] = True
-        serialized_item['base_id'] = base_id
-    
-    return jsonify({"success": True, "item": serialized_item})
+    if request.method == 'GET':
+        item_id = request.args.get('item_id')
+    else:
+        item_id = request.json.get('item_id')
+    if not item_id:
+        return jsonify({"success": False, "message": "Item ID is required"})
+
+    def build(menu):
+        serialized_item = item_details(menu, item_id)
+        if serialized_item is None:
+            return jsonify({"success": False, "message": "Item not found"})
+        return jsonify({"success": True, "item": serialized_item})
+
+    return menu_cached_response(build)
+
+# Most IDs a single batch lookup may ask for
+MAX_BATCH_ITEMS = 200
+
+# Details of many items in one round trip: GET ?ids=A,B,C (cacheable) or POST {"item_ids": [...]}
+@app.route('/api/get_item_details/batch', methods=['GET', 'POST'])
+def get_item_details_batch():
+    if request.method == 'GET':
+        item_ids = [item_id for item_id in request.args.get('ids', '').split(',') if item_id]
+    else:
+        item_ids = (request.json or {}).get('item_ids') or []
+    if not item_ids:
+        return jsonify({"success": False, "message": "Item IDs are required"})
+    if len(item_ids) > MAX_BATCH_ITEMS:
+        return jsonify({"success": False, "message": f"At most {MAX_BATCH_ITEMS} items per request"}), 400
+
+    def build(menu):
+        items = {}
+        missing = []
+        for item_id in dict.fromkeys(item_ids):
+            serialized_item = item_details(menu, item_id)
+            if serialized_item is None:
+                missing.append(item_id)
+            else:
+                items[item_id] = serialized_item
+        return jsonify({"success": True, "items": items, "missing": missing})
+
+    return menu_cached_response(build)
+
+# The whole display menu in one compressed payload, cached by the browser until the menu changes
+@app.route('/api/menu/snapshot', methods=['GET'])
+def get_menu_snapshot():
+    def build(menu):
+        body, compressed = cached_per_menu_version(menu_snapshot_cache, menu, build_menu_snapshot)
+        if accepts_gzip():
+            response = Response(compressed, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(body, mimetype='application/json')
+        return response
+
+    return menu_cached_response(build, gzip_variant=True)
 
 @app.route('/api/add_customized_item', methods=['POST'])
 def add_customized_item():
+    menu = get_menu()
     item_id = request.json.get('item_id')
     removed_ingredients = request.json.get('removed_ingredients', [])
     added_ingredients = request.json.get('added_ingredients', [])
@@ -657,81 +737,15 @@ def add_customized_item():
     if not base_item:
         return jsonify({"success": False, "message": "Base item not found"})
     
-    custom_item = CustomizedMenuItem(base_item, removed_ingredients, added_ingredients)
+    session_id = get_session_id()
     
-    # Load current order from order.json
-    current_order = load_current_order()
-    
-    # Prepare the order structure if needed
-    if "menuItems" not in current_order:
-        current_order["menuItems"] = []
-    
-    # Create the customized item entry
-    customization_notes = []
-    
-    # Add size information if this is a size variation
-    if '-' in item_id:
-        base_id = item_id.split('-')[0]
-        size_code = item_id.split('-')[1]
-        
-        # Check if this is a piece-count item
-        is_piece_count_item = 'NUG' in base_id or 'SIDE006' in base_id  # McNuggets or Mozzarella Sticks
-        
-        if is_piece_count_item:
-            # Extract piece count from the name
-            pc_count = ""
-            if "(" in base_item.name and ")" in base_item.name:
-                pc_info = base_item.name.split("(")[1].split(")")[0]
-                if "pc" in pc_info.lower():
-                    pc_count = pc_info
-                else:
-                    pc_count = base_item.size.capitalize()
-            else:
-                pc_count = base_item.size.capitalize()
-            customization_notes.append(f"Size: {pc_count}")
-        else:
-            size_display = {
-                's': 'Small', 
-                'm': 'Medium', 
-                'l': 'Large',
-                'xl': 'Extra Large'
-            }.get(size_code, base_item.size)
-            customization_notes.append(f"Size: {size_display}")
-    
-    if removed_ingredients:
-        removed_names = []
-        for ing_id in removed_ingredients:
-            ing = menu.get_item_information(ing_id)
-            if ing:
-                removed_names.append(ing.name)
-            else:
-                removed_names.append(ing_id)  # Fallback to ID if name not found
-        customization_notes.append(f"Removed: {', '.join(removed_names)}")
-    
-    if added_ingredients:
-        added_names = []
-        for ing_id in added_ingredients:
-            ing = menu.get_item_information(ing_id)
-            if ing:
-                added_names.append(ing.name)
-            else:
-                added_names.append(ing_id)  # Fallback to ID if name not found
-        customization_notes.append(f"Added: {', '.join(added_names)}")
-    
-    # Add the item to the order
-    current_order["menuItems"].append({
-        "id": item_id,  # Use the specific size item ID
-        "name": custom_item.name,
-        "price": custom_item.price,
-        "quantity": 1,
-        "notes": "; ".join(customization_notes)
-    })
-    
-    # Calculate the new total
-    current_order["total"] = sum(item["price"] * item["quantity"] for item in current_order["menuItems"])
-    
-    # Save the updated order
-    save_order(current_order, menu.get_items())
+    with order_store.lock(session_id):
+        # Add the item to the order as its own line
+        order_store.apply(session_id, {
+            "op": "customize",
+            "line": customized_line(menu, base_item, removed_ingredients, added_ingredients)
+        })
+        current_order = load_current_order(session_id)
     
     # Check if we should suggest sides/drinks or sauces - same logic as in add_to_cart
     suggestion = None
@@ -762,112 +776,319 @@ def add_customized_item():
         "suggestion_type": suggestion_type
     })
 
+def customized_line(menu, base_item, removed_ingredients, added_ingredients):
+    """Return the order line for a customized item, priced and described from the menu."""
+    base_id, size_code = split_item_id(base_item.id)
+    size_notes = [f"Size: {size_display_name(base_item, base_id, size_code)}"] if size_code else []
+    
+    # Ingredients not on the menu are kept by ID in the notes
+    def resolve(ingredient_ids):
+        return [menu.get_item_information(ing_id) or ing_id for ing_id in ingredient_ids]
+    
+    return build_customized_line(base_item, resolve(removed_ingredients), resolve(added_ingredients),
+                                 extra_notes=size_notes)
+
+# Most operations a single cart batch may carry
+MAX_BATCH_OPERATIONS = 50
+
+# Combos come with medium fries and a drink; drinks above the standard price cost the difference
+COMBO_SIDE_ID = 'SIDE001'
+COMBO_SIDE_SIZE = 'm'
+COMBO_UPCHARGE = 2.99
+STANDARD_DRINK_PRICE = 1.99
+
+def combo_line(menu, base_item, drink_item):
+    """Return the order line for a combo of base_item, medium fries and drink_item, priced from the menu."""
+    if not base_item.combo:
+        raise ValueError(f"Item {base_item.id} is not available as a combo")
+    if drink_item not in menu.drinks:
+        raise ValueError(f"Item {drink_item.id} is not a drink")
+    fries = next((item for item in menu.size_variants.get(COMBO_SIDE_ID, ())
+                  if split_item_id(item.id)[1] == COMBO_SIDE_SIZE), None)
+    if fries is None:
+        raise ValueError(f"Combo side {COMBO_SIDE_ID} is not on the menu")
+    
+    price = base_item.price + COMBO_UPCHARGE + max(0, drink_item.price - STANDARD_DRINK_PRICE)
+    return {
+        "id": base_item.id,
+        "name": f"{base_item.name} Combo",
+        "price": round(price, 2),
+        "quantity": 1,
+        "notes": f"With {fries.name} and {drink_item.name}"
+    }
+
+def batch_cart_op(menu, operation):
+    """
+    Translate one /api/cart/batch operation into a cart operation, priced from the menu.
+
+    Raises ValueError if the operation is malformed or names an item not on the menu.
+    """
+    if not isinstance(operation, dict):
+        raise ValueError("Operation must be an object")
+    for field in ('item_id', 'drink_id', 'line_key'):
+        if operation.get(field) is not None and not isinstance(operation[field], str):
+            raise ValueError(f"{field} must be a string")
+    for field in ('removed_ingredients', 'added_ingredients'):
+        ingredients = operation.get(field, [])
+        if not isinstance(ingredients, list) or not all(isinstance(ing_id, str) for ing_id in ingredients):
+            raise ValueError(f"{field} must be a list of ingredient IDs")
+    kind = operation.get('op')
+    item_id = operation.get('item_id')
+
+    if kind in ('add', 'customize', 'combo'):
+        item = menu.get_item_information(item_id)
+        if not item:
+            raise ValueError(f"Item {item_id} not found")
+        if kind == 'combo':
+            drink_id = operation.get('drink_id')
+            drink = menu.get_item_information(drink_id)
+            if not drink:
+                raise ValueError(f"Drink {drink_id} not found")
+            return {"op": "customize", "line": combo_line(menu, item, drink)}
+        if kind == 'customize':
+            return {"op": "customize", "line": customized_line(
+                menu, item, operation.get('removed_ingredients', []), operation.get('added_ingredients', []))}
+        quantity = operation.get('quantity', 1)
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or not 1 <= quantity <= 99:
+            raise ValueError(f"Invalid quantity {quantity!r} for item {item_id}")
+        return {"op": "add", "line": {"id": item_id, "name": item.name, "price": item.price, "quantity": quantity}}
+
+    if kind in ('remove', 'decrease'):
+        line_key = operation.get('line_key')
+        if not item_id and not line_key:
+            raise ValueError(f"{kind} needs an item_id or line_key")
+        return {"op": "remove", "key": line_key, "id": item_id, "decrease_only": kind == 'decrease'}
+
+    raise ValueError(f"Unknown operation {kind!r}")
+
+@app.route('/api/cart/batch', methods=['POST'])
+def cart_batch():
+    """
+    Apply an ordered list of cart operations in one request.
+
+    Body: {"operations": [...]} where each operation is one of
+        {"op": "add", "item_id": ..., "quantity": n}
+        {"op": "customize", "item_id": ..., "removed_ingredients": [...], "added_ingredients": [...]}
+        {"op": "combo", "item_id": ..., "drink_id": ...}
+        {"op": "remove" or "decrease", "item_id" or "line_key": ...}
+
+    The operations apply atomically: if any fails, the cart is unchanged. The
+    whole batch is persisted with a single write.
+    """
+    menu = get_menu()
+    operations = (request.json or {}).get('operations') or []
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'success': False, 'message': 'Operations are required'}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'success': False, 'message': f'At most {MAX_BATCH_OPERATIONS} operations per request'}), 400
+
+    ops = []
+    for index, operation in enumerate(operations):
+        try:
+            ops.append(batch_cart_op(menu, operation))
+        except ValueError as e:
+            return jsonify({'success': False, 'message': f'Operation {index}: {e}', 'failed_operation': index}), 400
+
+    session_id = get_session_id()
+
+    with order_store.lock(session_id):
+        try:
+            results = order_store.apply(session_id, {"op": "batch", "ops": ops})
+        except KeyError as e:
+            return jsonify({'success': False, 'message': f'Item {e.args[0]} not found in cart'}), 404
+        current_order = load_current_order(session_id)
+
+    return jsonify({
+        'success': True,
+        'cart': current_order["menuItems"],
+        'total': current_order["total"],
+        'removed_items': [{'index': index, 'quantity': result}
+                          for index, result in enumerate(results) if result is not None]
+    })
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
+    menu = get_menu()
     user_message = request.json.get('message', '')
     conversation_history = request.json.get('conversationHistory', [])
+    session_id = get_session_id()
     
     try:
-        # Process the order request using the new agent
-        result = process_order_request(user_message, menu.get_items())
-        
-        message_to_user = result.get('message', '')
-        updated_order = result.get('updated_order', {})
-        
-        # Check for termination or checkout
-        action_response = None
-        if message_to_user.strip() == "TERMINATE_CHAT" or "checkout" in user_message.lower() or "pay" in user_message.lower():
-            action_response = "checkout"
-            message_to_user = "Great! Taking you to checkout now."
-            
-        # Get items added or removed
-        items_to_add = []
-        removed_items = []
-        
-        # Add items based on the updated order
-        menu_items = menu.get_items()
-        id_to_item = {item.id: item for item in menu_items}
+        # Process the order request using the new agent, on the bounded agent pool
+        result = agent_executor.run(process_order_request, user_message, menu.get_items(), session_id=session_id,
+                                    order_parser=menu.order_parser, order_repairer=menu.order_repairer,
+                                    ingredients=menu.ingredient_index,
+                                    menu_version=menu.version, store_id=get_store_id(), timeout=AGENT_TURN_TIMEOUT)
         
-        for item in updated_order.get("menuItems", []):
-            if item["id"] in id_to_item:
-                items_to_add.append(id_to_item[item["id"]])
+        payload = chat_response(menu, user_message, result)
+        # The agent answers upstream LLM failures with an apology; they are still failed turns
+        return jsonify(payload), 502 if 'error' in payload else 200
         
+    except AgentBusy:
+        return agent_busy_response(session_id)
+    except FutureTimeoutError:
+        print("Error in chat API: agent turn timed out")
         return jsonify({
-            "response": message_to_user,
-            "order": updated_order,
-            "items": [menu.serialize_item(item) for item in items_to_add if item],
-            "removed_items": removed_items,
-            "action": action_response,
-            "pendingCombo": False
-        })
-        
+            "response": "Sorry, that took too long. Please try again.",
+            "order": load_current_order(session_id),
+            "action": None
+        }), 504
     except Exception as e:
         print(f"Error in chat API: {str(e)}")
         return jsonify({
             "response": "I apologize, but I encountered an error. Please try again.",
-            "order": load_current_order(),
+            "order": load_current_order(session_id),
             "action": None
         }), 500
 
+# Seconds a chat request waits for its turn before giving up (the turn itself still completes)
+AGENT_TURN_TIMEOUT = float(os.environ.get("AGENT_TURN_TIMEOUT", "60"))
+
+def agent_busy_response(session_id):
+    """Response for a chat turn rejected because the agent pool is full."""
+    response = jsonify({
+        "response": "I'm helping a lot of customers right now. Please try again in a moment.",
+        "order": load_current_order(session_id),
+        "action": None
+    })
+    response.headers['Retry-After'] = '2'
+    return response, 503
+
+def chat_response(menu, user_message, result):
+    """Build the chat API payload for a processed order request."""
+    message_to_user = result.get('message', '')
+    updated_order = result.get('updated_order', {})
+    
+    # Check for termination or checkout
+    action_response = None
+    if message_to_user.strip() == "TERMINATE_CHAT" or "checkout" in user_message.lower() or "pay" in user_message.lower():
+        action_response = "checkout"
+        message_to_user = "Great! Taking you to checkout now."
+        
+    # Get items added or removed
+    items_to_add = []
+    removed_items = []
+    
+    # Add items based on the updated order
+    for item in updated_order.get("menuItems", []):
+        menu_item = menu.get_item_information(item["id"])
+        if menu_item:
+            items_to_add.append(menu_item)
+    
+    payload = {
+        "response": message_to_user,
+        "order": updated_order,
+        "items": [menu.serialize_item(item) for item in items_to_add],
+        "removed_items": removed_items,
+        "action": action_response,
+        "pendingCombo": False
+    }
+    if result.get('error'):
+        payload["error"] = result['error']
+    # Order changes the agent made that were substituted or could not be applied
+    for key in ('repaired_changes', 'rejected_changes'):
+        if result.get(key):
+            payload[key] = result[key]
+    return payload
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /api/chat, as Server-Sent Events.
+
+    The reply is sent as "delta" events ({"text": ...}) while it is generated,
+    followed by one terminal "order" event carrying the same payload /api/chat
+    returns, or an "error" event when the turn failed or took longer than
+    AGENT_TURN_TIMEOUT.
+    """
+    menu = get_menu()
+    store_id = get_store_id()
+    user_message = request.json.get('message', '')
+    session_id = get_session_id()
+    events = queue.Queue()
+    
+    def run():
+        try:
+            result = process_order_request(user_message, menu.get_items(), session_id=session_id,
+                                           order_parser=menu.order_parser, order_repairer=menu.order_repairer,
+                                           ingredients=menu.ingredient_index,
+                                           menu_version=menu.version, store_id=store_id, on_delta=lambda text: events.put(('delta', {'text': text})))
+            payload = chat_response(menu, user_message, result)
+            events.put(('error' if 'error' in payload else 'order', payload))
+        except Exception as e:
+            print(f"Error in chat stream API: {str(e)}")
+            events.put(('error', {
+                "response": "I apologize, but I encountered an error. Please try again.",
+                "order": load_current_order(session_id),
+                "action": None
+            }))
+    
+    try:
+        agent_executor.submit(run)
+    except AgentBusy:
+        return agent_busy_response(session_id)
+    
+    def generate():
+        # The same limit /api/chat applies, so a stuck turn can't hold this thread forever
+        deadline = time.monotonic() + AGENT_TURN_TIMEOUT
+        while True:
+            try:
+                event, data = events.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                print("Error in chat stream API: agent turn timed out")
+                yield sse_event('error', {
+                    "response": "Sorry, that took too long. Please try again.",
+                    "order": load_current_order(session_id),
+                    "action": None
+                })
+                break
+            yield sse_event(event, data)
+            if event != 'delta':
+                break
+    
+    return Response(generate(), mimetype='text/event-stream',
+                     headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/remove_from_cart', methods=['POST'])
 def remove_from_cart():
     try:
         item_id = request.json.get('item_id')
+        line_key = request.json.get('line_key')
         decrease_only = request.json.get('decrease_only', False)
         
-        if not item_id:
+        if not item_id and not line_key:
             return jsonify({
                 'success': False,
                 'message': 'Item ID is required'
             }), 400
         
-        # Load current order from order.json
-        current_order = load_current_order()
-        
-        # Prepare the order structure if needed
-        if "menuItems" not in current_order:
-            current_order["menuItems"] = []
+        session_id = get_session_id()
         
-        removed_items = []
-        item_index = None
-        item_data = None
-        
-        # Find the item in the order
-        for i, item in enumerate(current_order["menuItems"]):
-            if item["id"] == item_id:
-                item_index = i
-                item_data = item
-                break
-        
-        # If item not found, return error
-        if item_index is None:
+        with order_store.lock(session_id):
+            try:
+                removed_quantity = order_store.apply(session_id, {
+                    "op": "remove",
+                    "key": line_key,
+                    "id": item_id,
+                    "decrease_only": decrease_only
+                })
+            except KeyError:
+                return jsonify({
+                    'success': False,
+                    'message': 'Item not found in cart'
+                }), 404
+            
+            current_order = load_current_order(session_id)
+            
             return jsonify({
-                'success': False,
-                'message': 'Item not found in cart'
-            }), 404
-        
-        # If decrease_only and quantity > 1, just decrease the quantity
-        if decrease_only and item_data["quantity"] > 1:
-            item_data["quantity"] -= 1
-            removed_items.append({'id': item_id, 'quantity': 1})
-        else:
-            # Otherwise remove the item completely
-            removed_quantity = item_data["quantity"]
-            removed_items.append({'id': item_id, 'quantity': removed_quantity})
-            current_order["menuItems"].pop(item_index)
-        
-        # Recalculate the total
-        current_order["total"] = sum(item["price"] * item["quantity"] for item in current_order["menuItems"])
-        
-        # Save the updated order
-        save_order(current_order, menu.get_items())
-        
-        return jsonify({
-            'success': True,
-            'cart': current_order["menuItems"],
-            'total': current_order["total"],
-            'removed_items': removed_items
-        })
+                'success': True,
+                'cart': current_order["menuItems"],
+                'total': current_order["total"],
+                'removed_items': [{'id': item_id, 'quantity': removed_quantity}]
+            })
         
     except Exception as e:
         print(f"Error in remove_from_cart: {str(e)}")
@@ -876,74 +1097,97 @@ def remove_from_cart():
             'message': f'Error removing item from cart: {str(e)}'
         }), 500
 
-@app.route('/api/get_category_items', methods=['POST'])
+# GET ?category= is cacheable; POST with a JSON body is kept for older clients
+@app.route('/api/get_category_items', methods=['GET', 'POST'])
 def get_category_items():
-    category = request.json.get('category')
+    if request.method == 'GET':
+        category = request.args.get('category')
+    else:
+        category = request.json.get('category')
     if not category:
         return jsonify({'success': False, 'message': 'Category is required'})
-    
-    items = menu.find_items_by_category(category)
-    serialized_items = [menu.serialize_item(item) for item in items]
-    
-    return jsonify({
-        'success': True,
-        'items': serialized_items
-    })
+
+    def build(menu):
+        items = menu.find_items_by_category(category)
+
+        # Each item's JSON is cached, so the response is assembled without re-serializing
+        body = b'{"success": true, "items": ' + menu.serialize_items_json(items) + b'}'
+        return Response(body, mimetype='application/json')
+
+    return menu_cached_response(build)
 
 # New endpoint to get available sauces
 @app.route('/api/get_sauces', methods=['GET'])
 def get_sauces():
-    sauces = []
-    
-    for item in menu.get_items():
-        if item.category.lower() == 'condiments' and 'sauce' in item.name.lower():
-            sauces.append({
-                'id': item.id,
-                'name': item.name,
-                'price': item.price
-            })
-    
-    return jsonify({
-        'success': True,
-        'sauces': sorted(sauces, key=lambda x: x['name'])
-    })
+    def build(menu):
+        return jsonify({
+            'success': True,
+            'sauces': list_sauces(menu)
+        })
+
+    return menu_cached_response(build)
 
 # New endpoint to get available drinks
 @app.route('/api/get_drinks', methods=['GET'])
 def get_drinks():
-    drinks = []
-    
-    for item in menu.get_items():
-        if item.category.lower() == 'drinks' or item.category.lower() == 'mccafe':
-            drinks.append({
-                'id': item.id,
-                'name': item.name,
-                'price': item.price,
-                'size': item.size,
-            })
-    
-    return jsonify({
-        'success': True,
-        'drinks': sorted(drinks, key=lambda x: x['name'])
-    })
+    def build(menu):
+        return jsonify({
+            'success': True,
+            'drinks': list_drinks(menu)
+        })
+
+    return menu_cached_response(build)
 
 # New endpoint to get available sides
 @app.route('/api/get_sides', methods=['GET'])
 def get_sides():
-    sides = []
-    
-    for item in menu.get_items():
-        if item.category.lower() == 'sides':
-            sides.append({
-                'id': item.id,
-                'name': item.name,
-                'price': item.price,
-                'size': item.size
-            })
-    
+    def build(menu):
+        return jsonify({
+            'success': True,
+            'sides': list_sides(menu)
+        })
+
+    return menu_cached_response(build)
+
+@app.route('/api/search', methods=['GET'])
+def search_menu():
+    menu = get_menu()
+    query = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 10, type=int), 50)
+
+    start_time = time.perf_counter()
+    matches = menu.search(query, limit) if query else []
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+    return jsonify({
+        'success': True,
+        'query': query,
+        'results': [{
+            'id': item.id,
+            'name': item.name,
+            'price': item.price,
+            'category': item.category,
+            'size': item.size,
+            'description': item.description,
+            'combo': item.combo,
+            'score': score
+        } for item, score in matches],
+        'elapsed_ms': round(elapsed_ms, 3)
+    })
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
     return jsonify({
         'success': True,
-        'sides': sorted(sides, key=lambda x: x['name'])
+        'order_sessions': order_store.session_count(),
+        'conversations': conversation_store.stats(),
+        'prompts': prompt_window.stats(),
+        'store_id': get_store_id(),
+        'menus': menu_registry.stats(),
+        'local_parser': get_menu().order_parser.stats(),
+        'order_repair': get_menu().order_repairer.stats(),
+        'response_cache': response_cache.stats(),
+        'agent_executor': agent_executor.stats()
     })
 
 @app.route('/survey_break')
@@ -0,0 +1,161 @@
+"""
+Concurrent chat load test: simulated kiosks ordering through /api/chat.
+
+Each kiosk is its own session (its own cookie jar). It clears its cart, then
+orders one of the test orders turn by turn, one numbered entry of the order
+per message, and finishes with a checkout message. Kiosks repeat this for the
+requested number of conversations. Reports per-turn latency percentiles,
+throughput and error rates, plus the server's agent stats.
+
+Run it against the app backed by mock_openai.py so the numbers are
+reproducible and free:
+
+    python mock_openai.py --latency 0.8 --jitter 0.3 --seed 1
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=mock flask run --with-threads
+    python benchmark_chat_load.py --kiosks 20 --conversations 3
+
+Set RESPONSE_CACHE_SIZE=0 on the app to measure without the response cache.
+
+Usage: python benchmark_chat_load.py [--base-url URL] [--kiosks N] [--conversations N]
+                                     [--endpoint chat|stream] [--orders FILE] [--timeout S]
+"""
+import argparse
+import http.cookiejar
+import json
+import math
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+# Numbered entries of a test order description: "1. Big Mac, add ketchup. 2. ..."
+ORDER_ENTRY = re.compile(r"\d+\.\s*(.*?)(?=\s*\d+\.\s|$)", re.DOTALL)
+
+
+def conversation_turns(order):
+    """Split a test order into the messages a customer would send, ending with checkout."""
+    description = order["description"].partition(":")[2] or order["description"]
+    turns = [entry.strip().rstrip(".") for entry in ORDER_ENTRY.findall(description) if entry.strip()]
+    return ["I'd like " + turns[0]] + turns[1:] + ["That's all, checkout please"] if turns else [description]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Kiosk:
+    """One simulated kiosk with its own session."""
+
+    def __init__(self, base_url, endpoint, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def post(self, path, payload):
+        request = urllib.request.Request(self.base_url + path, data=json.dumps(payload).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        with self.opener.open(request, timeout=self.timeout) as response:
+            return response.status, response.read()
+
+    def send(self, message):
+        """Send one chat turn. Returns (seconds, outcome); outcome is "ok", an HTTP status or an error name."""
+        started = time.perf_counter()
+        try:
+            if self.endpoint == "stream":
+                _, body = self.post("/api/chat/stream", {"message": message})
+                if b"event: order" in body:
+                    outcome = "ok"
+                else:
+                    outcome = "agent_error" if b"event: error" in body else "stream_error"
+            else:
+                _, body = self.post("/api/chat", {"message": message})
+                payload = json.loads(body)
+                if "error" in payload:
+                    outcome = "agent_error"
+                else:
+                    outcome = "ok" if "response" in payload else "bad_payload"
+        except urllib.error.HTTPError as e:
+            outcome = str(e.code)
+        except Exception as e:
+            outcome = type(e).__name__
+        return time.perf_counter() - started, outcome
+
+
+def run_kiosk(kiosk, conversations, orders, offset, results, lock):
+    for number in range(conversations):
+        order = orders[(offset + number) % len(orders)]
+        try:
+            kiosk.post("/api/clear_cart", {})
+        except Exception:
+            pass
+        for message in conversation_turns(order):
+            seconds, outcome = kiosk.send(message)
+            with lock:
+                results.append((seconds, outcome))
+
+
+def fetch_stats(base_url, timeout):
+    try:
+        with urllib.request.urlopen(base_url.rstrip("/") + "/api/stats", timeout=timeout) as response:
+            return json.loads(response.read())
+    except Exception as e:
+        print(f"Could not fetch /api/stats: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/chat with concurrent simulated kiosks.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--kiosks", type=int, default=10, help="concurrent kiosks")
+    parser.add_argument("--conversations", type=int, default=2, help="conversations per kiosk")
+    parser.add_argument("--endpoint", choices=("chat", "stream"), default="chat")
+    parser.add_argument("--orders", default="test_orders.json")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds before a turn counts as failed")
+    args = parser.parse_args()
+
+    with open(args.orders, "r", encoding="utf-8") as file:
+        orders = json.load(file)
+
+    results = []
+    lock = threading.Lock()
+    threads = [threading.Thread(target=run_kiosk,
+                                args=(Kiosk(args.base_url, args.endpoint, args.timeout),
+                                      args.conversations, orders, index, results, lock))
+               for index in range(args.kiosks)]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds for seconds, outcome in results if outcome == "ok")
+    outcomes = Counter(outcome for _, outcome in results)
+    errors = len(results) - outcomes["ok"]
+
+    print(f"{args.kiosks} kiosks x {args.conversations} conversations via /api/{args.endpoint}: "
+          f"{len(results)} turns in {elapsed:.2f}s")
+    print(f"throughput: {len(results) / elapsed:.2f} turns/s")
+    print(f"latency (successful turns): p50 {percentile(latencies, 0.50) * 1000:.0f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms, p99 {percentile(latencies, 0.99) * 1000:.0f} ms, "
+          f"max {(latencies[-1] if latencies else 0) * 1000:.0f} ms")
+    print(f"errors: {errors} ({100 * errors / len(results) if results else 0:.1f}%)"
+          + "".join(f", {outcome}: {count}" for outcome, count in sorted(outcomes.items()) if outcome != "ok"))
+
+    stats = fetch_stats(args.base_url, args.timeout)
+    if stats:
+        for name in ("agent_executor", "response_cache", "local_parser", "order_repair"):
+            if name in stats:
+                print(f"{name}: {json.dumps(stats[name])}")
+
+
+if __name__ == "__main__":
+    main()
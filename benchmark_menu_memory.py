@@ -0,0 +1,103 @@
+"""
+Memory benchmark: compact menu items vs. the previous plain-object representation.
+
+Loads the same menu many times, as a multi-store process would, and reports
+the memory held by the items of each representation.
+
+Usage: python benchmark_menu_memory.py [menu_file] [store_count]
+"""
+import gc
+import json
+import sys
+import tracemalloc
+
+from menu import Menu, MenuItem
+
+
+class LegacyMenuItem:
+    """The menu item representation used before MenuItem gained slots and index references."""
+
+    def __init__(self, name, id, price, ingredients, combo, size, category, description,
+                 customizable=False, free_add_ons=None, paid_add_ons=None):
+        self.name = name
+        self.id = id
+        self.price = price
+        self.ingredients = ingredients
+        self.combo = combo
+        self.size = size
+        self.category = category
+        self.description = description
+        self.customizable = customizable
+        self.free_add_ons = free_add_ons or []
+        self.paid_add_ons = paid_add_ons or []
+
+
+def load_legacy(data):
+    items = {}
+    for item in data['menuItems']:
+        items[item['id']] = LegacyMenuItem(
+            name=item['name'], id=item['id'], price=item['price'], ingredients=item['ingredients'],
+            combo=item['combo'], size=item['size'], category=item['category'],
+            description=item['description'], customizable=item.get('customizable', False),
+            free_add_ons=item.get('freeAddOns', []), paid_add_ons=item.get('paidAddOns', [])
+        )
+    for item in items.values():
+        item.ingredients = [items[i] for i in item.ingredients if i in items]
+        item.free_add_ons = [items[i] for i in item.free_add_ons if i in items]
+        item.paid_add_ons = [items[i] for i in item.paid_add_ons if i in items]
+    return items
+
+
+def load_compact(data):
+    # Same steps as Menu.load_data, without building the lookup indexes
+    menu = Menu()
+    for item in data['menuItems']:
+        menu.add_item(MenuItem(
+            name=item['name'], id=item['id'], price=item['price'], ingredients=item['ingredients'],
+            combo=item['combo'], size=item['size'], category=item['category'],
+            description=item['description'], customizable=item.get('customizable', False),
+            free_add_ons=item.get('freeAddOns', []), paid_add_ons=item.get('paidAddOns', [])
+        ))
+    for item in menu.items.values():
+        item.ingredients = [menu.items[i] for i in item.ingredients if i in menu.items]
+        item.free_add_ons = [menu.items[i] for i in item.free_add_ons if i in menu.items]
+        item.paid_add_ons = [menu.items[i] for i in item.paid_add_ons if i in menu.items]
+    return menu
+
+
+def measure(loader, text, store_count):
+    """Return the bytes held by store_count menus built from independently parsed JSON."""
+    gc.collect()
+    tracemalloc.start()
+    stores = []
+    for _ in range(store_count):
+        # Each store's menu is parsed from its own file, so nothing is shared by accident
+        data = json.loads(text)
+        stores.append(loader(data))
+        del data
+    gc.collect()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return held, stores
+
+
+def main():
+    menu_file = sys.argv[1] if len(sys.argv) > 1 else "menu_data.json"
+    store_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with open(menu_file, "r", encoding="utf-8") as file:
+        text = file.read()
+    item_count = len(json.loads(text)["menuItems"])
+
+    legacy_bytes, _ = measure(load_legacy, text, store_count)
+    compact_bytes, _ = measure(load_compact, text, store_count)
+
+    print(f"{store_count} stores x {item_count} items")
+    for label, held in (("legacy", legacy_bytes), ("compact", compact_bytes)):
+        per_item = held / (store_count * item_count)
+        print(f"{label:>8}: {held / 1024 / 1024:8.2f} MiB total, {per_item:7.1f} bytes per item")
+    print(f" savings: {100 * (1 - compact_bytes / legacy_bytes):.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Startup benchmark: loading a menu from its JSON file vs. its compiled artifact.
+
+Times the same steps MenuManager.reload takes on each path, from reading the
+file to a menu with every index the kiosk builds (including the local parser
+and order repairer), and reports the best of several rounds. The artifact is
+compiled to a temporary file first.
+
+Usage: python benchmark_menu_startup.py [menu_file] [rounds]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from local_parser import OrderParser
+from menu import Menu
+from menu_compiler import CompiledMenu, compile_menu
+from order_repair import OrderRepairer
+
+
+class KioskMenu(Menu):
+    """Builds the same per-menu indexes as the app's CustomMenu, without importing the app."""
+
+    def build_indexes(self, prebuilt=None):
+        super().build_indexes(prebuilt)
+        self.order_parser = OrderParser(self.items, self.normalized_words)
+        self.order_repairer = OrderRepairer(self.items, self.normalized_words)
+
+
+def load_json(path):
+    with open(path, "rb") as file:
+        source = file.read()
+    menu = KioskMenu()
+    menu.load_data(json.loads(source))
+    return menu
+
+
+def load_artifact(path):
+    menu = KioskMenu()
+    menu.load_compiled(CompiledMenu(path))
+    return menu
+
+
+def best_time(loader, path, rounds):
+    """Return the fastest of rounds loads, in seconds."""
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        loader(path)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    menu_file = sys.argv[1] if len(sys.argv) > 1 else "menu_data.json"
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    with tempfile.TemporaryDirectory() as directory:
+        compiled_file = compile_menu(menu_file, os.path.join(directory, "menu.menuc"))
+        json_seconds = best_time(load_json, menu_file, rounds)
+        compiled_seconds = best_time(load_artifact, compiled_file, rounds)
+
+    item_count = len(load_json(menu_file).items)
+    print(f"{item_count} items, best of {rounds} rounds")
+    print(f"    json: {json_seconds * 1000:8.2f} ms")
+    print(f"compiled: {compiled_seconds * 1000:8.2f} ms")
+    print(f" speedup: {json_seconds / compiled_seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
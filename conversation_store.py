@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class Conversation:
+    def __init__(self):
+        self.messages = []          # Chat messages in OpenAI format
+        self.chars = 0              # Total characters held in message contents
+        self.summary = ""           # Rolling summary of messages trimmed from the history
+        self.last_used = time.time()
+
+
+class ConversationStore:
+    """
+    Per-session conversation memory for the ordering agent.
+
+    Sessions are kept in least-recently-used order. A session is evicted once
+    it has been idle for longer than ttl_seconds, or when more than
+    max_sessions are resident. Within a session, the oldest non-system
+    messages are dropped once the history exceeds max_messages or max_chars;
+    if a summarizer is given, each dropped message is folded into the
+    session's rolling summary first.
+
+    Args:
+        max_sessions (int): Maximum number of resident sessions
+        ttl_seconds (float): Idle time after which a session is forgotten
+        max_messages (int): Maximum messages kept per session
+        max_chars (int): Maximum message characters kept per session
+        summarizer (callable, optional): summarizer(summary, message) -> new summary
+    """
+
+    def __init__(self, max_sessions=500, ttl_seconds=3600, max_messages=40, max_chars=60000,
+                 summarizer=None):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self.summarizer = summarizer
+
+        self._sessions = OrderedDict()  # Session ID -> Conversation, least recently used first
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.trimmed_messages = 0
+
+    def _touch(self, session_id):
+        """Return a session's conversation, marking it most recently used. Caller holds the lock."""
+        self._evict_expired()
+        conversation = self._sessions.get(session_id)
+        if conversation is None:
+            conversation = Conversation()
+            self._sessions[session_id] = conversation
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._sessions.move_to_end(session_id)
+        conversation.last_used = time.time()
+        return conversation
+
+    def _evict_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        while self._sessions:
+            session_id, conversation = next(iter(self._sessions.items()))
+            if conversation.last_used >= cutoff:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def _trim(self, conversation):
+        """Drop the oldest non-system messages until the session fits its caps."""
+        messages = conversation.messages
+        while len(messages) > self.max_messages or conversation.chars > self.max_chars:
+            index = next((i for i, m in enumerate(messages) if m["role"] != "system"), None)
+            if index is None or index == len(messages) - 1:
+                break  # Always keep the newest message
+            dropped = messages.pop(index)
+            conversation.chars -= len(dropped.get("content") or "")
+            if self.summarizer is not None:
+                conversation.summary = self.summarizer(conversation.summary, dropped)
+            self.trimmed_messages += 1
+
+    def history(self, session_id):
+        """Return a copy of the session's messages."""
+        with self._lock:
+            return list(self._touch(session_id).messages)
+
+    def context(self, session_id):
+        """Return a copy of the session's messages and its rolling summary."""
+        with self._lock:
+            conversation = self._touch(session_id)
+            return list(conversation.messages), conversation.summary
+
+    def append(self, session_id, message):
+        """Append a message to the session's history, enforcing the per-session caps."""
+        with self._lock:
+            conversation = self._touch(session_id)
+            conversation.messages.append(message)
+            conversation.chars += len(message.get("content") or "")
+            self._trim(conversation)
+
+    def reset(self, session_id):
+        """Forget a session's conversation."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self):
+        """Return counters describing resident conversation memory."""
+        with self._lock:
+            self._evict_expired()
+            return {
+                "resident_sessions": len(self._sessions),
+                "resident_messages": sum(len(c.messages) for c in self._sessions.values()),
+                "resident_chars": sum(c.chars for c in self._sessions.values()),
+                "evictions": self.evictions,
+                "trimmed_messages": self.trimmed_messages
+            }
@@ -0,0 +1,359 @@
+import re
+import threading
+import unicodedata
+
+from shopping_cart import customized_line
+
+# Common names customers use for menu items, mapped to the menu name they mean.
+# Aliases whose target is not on the loaded menu are ignored.
+ITEM_ALIASES = {
+    "coke": "Coca-Cola",
+    "fries": "French Fries",
+    "fry": "French Fries",
+    "nuggets": "Chicken McNuggets",
+    "mcnuggets": "Chicken McNuggets",
+    "chicken nuggets": "Chicken McNuggets",
+    "spicy nuggets": "Spicy Chicken McNuggets",
+    "spicy mcnuggets": "Spicy Chicken McNuggets",
+    "oj": "Minute Maid Orange Juice",
+    "orange juice": "Minute Maid Orange Juice",
+    "water": "Dasani Bottled Water",
+    "bottled water": "Dasani Bottled Water",
+    "unsweet tea": "Unsweetened Iced Tea",
+    "unsweetened tea": "Unsweetened Iced Tea",
+    "iced tea": "Unsweetened Iced Tea",
+    "coffee": "Premium Roast Coffee",
+    "quarter pounder": "Quarter Pounder with Cheese",
+    "double quarter pounder": "Double Quarter Pounder with Cheese",
+    "oreo mcflurry": "McFlurry with OREO Cookies",
+    "m and m mcflurry": "McFlurry with M&M'S Candies",
+    "mozzarella sticks": "Mozzarella Sticks",
+    "hashbrowns": "Hash Browns",
+    "hash brown": "Hash Browns",
+    "pancakes": "Hotcakes",
+}
+
+INGREDIENT_ALIASES = {
+    "mayo": "Mayonnaise",
+    "bbq": "BBQ Sauce",
+    "barbecue": "BBQ Sauce",
+    "barbecue sauce": "BBQ Sauce",
+    "ranch": "Ranch Sauce",
+    "honey mustard": "Honey Mustard Sauce",
+    "sweet and sour": "Sweet 'N Sour Sauce",
+    "sweet n sour": "Sweet 'N Sour Sauce",
+    "tartar": "Tartar Sauce",
+    "big mac sauce": "Big Mac Sauce",
+    "special sauce": "Big Mac Sauce",
+    "marinara": "Marinara Sauce",
+    "syrup": "Maple Syrup",
+    "tomato": "Tomatoes",
+    "sausage": "Sausage Patty",
+    "patty": "Beef Patty",
+}
+
+SIZE_WORDS = {
+    "small": "s",
+    "medium": "m",
+    "regular": "m",
+    "large": "l",
+    "big": "l",
+    "extra large": "xl",
+}
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "a couple of": 2,
+}
+
+REMOVE_WORDS = ("no", "without", "hold", "hold the", "minus", "remove")
+ADD_WORDS = ("add", "added", "extra", "with", "plus", "with extra", "add extra", "and extra")
+PIECE_WORDS = ("pc", "pcs", "piece", "pieces", "count")
+
+# Words that carry no order information
+FILLER_WORDS = (
+    "and", "i", "d", "like", "want", "would", "can", "could", "get", "please", "me",
+    "have", "ll", "take", "of", "side", "the", "also", "some", "to", "go", "id", "im",
+    "m", "for", "just", "let", "s", "thanks", "thank", "you", "may", "give",
+    "on", "it", "that", "them", "hi", "hello", "hey", "okay", "ok", "need",
+)
+
+# Words that carry no items but may start a new order ("I'd like to order ...")
+NEW_ORDER_WORDS = ("order", "an order")
+
+MAX_QUANTITY = 20
+MAX_PHRASE_TOKENS = 8
+
+
+def normalize(text):
+    """Lower-case, strip accents and punctuation, and reduce plurals to their singular form."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.lower().replace("&", " and ").replace("'", "")
+    return [singular(token) for token in re.findall(r"[a-z]+|\d+", text)]
+
+
+class NormalizedWords(dict):
+    """
+    Text -> normalize(text), computed on first lookup.
+
+    The menu indexes normalize the same item names and aliases every time a
+    menu loads, so they share one of these per menu, and a compiled menu
+    arrives with it already filled in.
+    """
+
+    def __missing__(self, text):
+        words = self[text] = normalize(text)
+        return words
+
+
+def singular(token):
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def base_name(name):
+    """Strip a trailing size or piece-count parenthetical from a menu item name."""
+    return re.sub(r"\s*\([^)]*\)\s*$", "", name)
+
+
+class ParsedLine:
+    def __init__(self, quantity=1, size=None, pieces=None):
+        self.quantity = quantity    # Number of units
+        self.size = size            # Size code (s/m/l/xl) if one was given
+        self.pieces = pieces        # Piece count if one was given
+        self.group = None           # Base item group the line refers to
+        self.item = None            # Resolved MenuItem
+        self.removed = []           # Ingredients to remove
+        self.added = []             # Ingredients to add
+
+    @property
+    def notes(self):
+        notes = []
+        if self.removed:
+            notes.append(f"Removed: {', '.join(ing.name for ing in self.removed)}")
+        if self.added:
+            notes.append(f"Added: {', '.join(ing.name for ing in self.added)}")
+        return "; ".join(notes)
+
+    def to_op(self):
+        """Return the cart operation that adds this line."""
+        if not self.removed and not self.added:
+            return {"op": "add", "line": {
+                "id": self.item.id, "name": self.item.name,
+                "price": self.item.price, "quantity": self.quantity
+            }}
+        return {"op": "customize", "line": customized_line(self.item, self.removed, self.added, self.quantity)}
+
+    def describe(self):
+        text = f"{self.quantity} {self.item.name}"
+        return f"{text} ({self.notes})" if self.notes else text
+
+
+class ParseResult:
+    def __init__(self, lines=None, confident=False, reason="", new_order=False):
+        self.lines = lines or []        # ParsedLine objects, in the order they were said
+        self.confident = confident      # True when every word was understood
+        self.reason = reason            # Why the parse is not confident
+        self.new_order = new_order      # True when the utterance may start a new order
+
+
+class ItemGroup:
+    """All size variants of one menu item."""
+
+    def __init__(self, base_id):
+        self.base_id = base_id
+        self.variants = {}      # Size code -> MenuItem ("" for items without sizes)
+        self.by_pieces = {}     # Piece count -> MenuItem
+
+    def resolve(self, size, pieces):
+        if pieces is not None:
+            return self.by_pieces.get(pieces)
+        if size is not None:
+            return self.variants.get(size)
+        if "" in self.variants:
+            return self.variants[""]
+        if self.by_pieces:
+            return None  # Piece-count items must say how many pieces
+        if "m" in self.variants:
+            return self.variants["m"]  # Default to medium when no size is given
+        if len(self.variants) == 1:
+            return next(iter(self.variants.values()))
+        return None
+
+
+class OrderParser:
+    """
+    Deterministic parser for simple ordering utterances.
+
+    Understands quantities, sizes (mapped to the -s/-m/-l/-xl ID variants),
+    piece counts, item names and aliases, and "no X" / "add X" / "with X"
+    modifiers. A parse is only confident when every word of the utterance
+    was understood; anything else is left to the LLM.
+    """
+
+    def __init__(self, menu_items, normalized=None):
+        """
+        Args:
+            menu_items (dict or list): Menu items, as Menu.items or Menu.get_items()
+            normalized (NormalizedWords, optional): The menu's normalized names, shared with its other indexes
+        """
+        if isinstance(menu_items, dict):
+            menu_items = list(menu_items.values())
+
+        self._normalized = normalized if normalized is not None else NormalizedWords()
+        self._phrases = {}  # Token tuple -> (kind, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        groups = {}
+        by_name = {}
+        for item in menu_items:
+            by_name[item.name.lower()] = item
+            if item.category in ("toppings", "condiments", "patties"):
+                self._add_phrase(item.name, "ingredient", item)
+                continue
+            base_id, _, size_code = item.id.partition("-")
+            group = groups.setdefault(base_id, ItemGroup(base_id))
+            group.variants[size_code] = item
+            pieces = re.search(r"\((\d+)\s*pc\)", item.name)
+            if pieces:
+                group.by_pieces[int(pieces.group(1))] = item
+            self._add_phrase(base_name(item.name), "item", group)
+
+        groups_by_name = {}
+        for group in groups.values():
+            for item in group.variants.values():
+                groups_by_name[base_name(item.name).lower()] = group
+        for alias, target in ITEM_ALIASES.items():
+            if target.lower() in groups_by_name:
+                self._add_phrase(alias, "item", groups_by_name[target.lower()])
+        for alias, target in INGREDIENT_ALIASES.items():
+            if target.lower() in by_name:
+                self._add_phrase(alias, "ingredient", by_name[target.lower()])
+
+        for word, code in SIZE_WORDS.items():
+            self._add_phrase(word, "size", code)
+        for word, number in NUMBER_WORDS.items():
+            self._add_phrase(word, "number", number)
+        for word in REMOVE_WORDS:
+            self._add_phrase(word, "remove", None)
+        for word in ADD_WORDS:
+            self._add_phrase(word, "add", None)
+        for word in PIECE_WORDS:
+            self._add_phrase(word, "pieces", None)
+        for word in FILLER_WORDS:
+            self._phrases.setdefault(tuple(self._normalized[word]), ("filler", None))
+        for word in NEW_ORDER_WORDS:
+            self._phrases.setdefault(tuple(self._normalized[word]), ("new_order", None))
+
+    def _add_phrase(self, text, kind, value):
+        tokens = tuple(self._normalized[text])
+        if tokens and tokens not in self._phrases:
+            self._phrases[tokens] = (kind, value)
+
+    def _tokens(self, text):
+        """Yield (kind, value) for each phrase, preferring the longest match at every position."""
+        words = normalize(text)
+        position = 0
+        while position < len(words):
+            for length in range(min(MAX_PHRASE_TOKENS, len(words) - position), 0, -1):
+                phrase = tuple(words[position:position + length])
+                if phrase in self._phrases:
+                    yield self._phrases[phrase]
+                    position += length
+                    break
+            else:
+                word = words[position]
+                yield ("number", int(word)) if word.isdigit() else ("unknown", word)
+                position += 1
+
+    def parse(self, text):
+        """Parse an utterance into order lines. Returns a ParseResult."""
+        result = self._parse(text)
+        with self._lock:
+            if result.confident:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return result
+
+    def _parse(self, text):
+        lines = []
+        target = None        # Last item line, which modifiers apply to
+        pending = ParsedLine()
+        pending_number = None
+        modifier = None      # "remove" or "add" while a modifier list is being read
+        new_order = False
+
+        for kind, value in self._tokens(text):
+            if kind == "unknown":
+                return ParseResult(reason=f"unknown word '{value}'")
+            if kind == "filler":
+                continue
+            if kind == "new_order":
+                new_order = True
+                continue
+            if kind == "number":
+                if pending_number is not None:
+                    return ParseResult(reason="two numbers in a row")
+                pending_number = value
+                modifier = None
+            elif kind == "pieces":
+                if pending_number is None:
+                    return ParseResult(reason="piece count without a number")
+                pending.pieces = pending_number
+                pending_number = None
+            elif kind == "size":
+                pending.size = value
+                modifier = None
+            elif kind in ("remove", "add"):
+                if target is None:
+                    return ParseResult(reason="modifier before any item")
+                modifier = kind
+            elif kind == "ingredient":
+                if modifier is None or pending_number is not None:
+                    return ParseResult(reason=f"'{value.name}' without a modifier")
+                if modifier == "remove":
+                    if value not in target.item.ingredients:
+                        return ParseResult(reason=f"{target.item.name} has no {value.name}")
+                    target.removed.append(value)
+                elif value.category == "condiments" and not target.item.ingredients:
+                    # Sauces for nuggets, fries and other plain sides are their own line
+                    sauce = ParsedLine(quantity=1)
+                    sauce.item = value
+                    lines.append(sauce)
+                else:
+                    target.added.append(value)
+            elif kind == "item":
+                if modifier is not None:
+                    return ParseResult(reason="item inside a modifier list")
+                if pending_number is not None:
+                    pending.quantity = pending_number
+                    pending_number = None
+                if pending.quantity > MAX_QUANTITY:
+                    return ParseResult(reason="quantity too large")
+                pending.group = value
+                pending.item = value.resolve(pending.size, pending.pieces)
+                if pending.item is None:
+                    return ParseResult(reason=f"no matching size of {value.base_id}")
+                lines.append(pending)
+                target = pending
+                pending = ParsedLine()
+
+        if pending_number is not None or pending.size or pending.pieces:
+            return ParseResult(reason="size or quantity without an item")
+        if not lines:
+            return ParseResult(reason="no menu items")
+        return ParseResult(lines, confident=True, new_order=new_order)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "local_hits": self.hits,
+                "llm_fallbacks": self.misses,
+                "hit_rate": self.hits / total if total else 0
+            }
@@ -1,26 +1,141 @@
+import itertools
 import json
+import sys
+from array import array
 from typing import List, Optional
 
+from local_parser import NormalizedWords
+from menu_search import MenuSearchIndex
+
 # Defining a type alias for a list of strings
 str_list = List[str]
 
+# Size codes used in item ID suffixes (e.g. "SIDE001-m"), in display order
+SIZE_ORDER = {'s': 0, 'm': 1, 'l': 2, 'xl': 3}
+SIZE_NAMES = {'s': 'Small', 'm': 'Medium', 'l': 'Large', 'xl': 'Extra Large'}
+
+# Menu versions are unique across every Menu instance in the process
+_versions = itertools.count(1)
+
+# Fields every menu item needs for the menu to be served
+REQUIRED_ITEM_FIELDS = ("id", "name", "price", "ingredients", "size", "category", "description")
+
+# Checking parsed menu data; an empty list of problems means it can be served
+def validate_menu_data(data) -> List[str]:
+    items = data.get("menuItems") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return ["menu has no menuItems"]
+
+    problems = []
+    ids = set()
+    for index, item in enumerate(items):
+        missing = [field for field in REQUIRED_ITEM_FIELDS if field not in item]
+        if missing:
+            problems.append(f"item {index} is missing {', '.join(missing)}")
+            continue
+        if item["id"] in ids:
+            problems.append(f"duplicate item ID {item['id']}")
+        ids.add(item["id"])
+        price = item["price"]
+        if isinstance(price, bool) or not isinstance(price, (int, float)) or price < 0:
+            problems.append(f"item {item['id']} has an invalid price {price!r}")
+
+    for item in items:
+        for field in ("ingredients", "freeAddOns", "paidAddOns"):
+            for ref in item.get(field) or []:
+                if ref not in ids:
+                    problems.append(f"item {item.get('id')} references unknown {field} item {ref}")
+    return problems
+
+# Splitting an item ID into its base ID and size code (None for items without sizes)
+def split_item_id(item_id: str):
+    base_id, _, size_code = item_id.partition('-')
+    return base_id, size_code or None
+
+# Getting the label shown for one size variant of an item
+def size_display_name(item, base_id: str, size_code: str) -> str:
+    # Piece-count items like McNuggets or Mozzarella Sticks are labelled by piece count
+    if 'NUG' in base_id or 'SIDE006' in base_id:
+        if "(" in item.name and ")" in item.name:
+            pc_info = item.name.split("(")[1].split(")")[0]
+            if "pc" in pc_info.lower():
+                return pc_info
+        return item.size.capitalize()
+    return SIZE_NAMES.get(size_code, item.size)
+
+# Shared value for items without ingredients or add-ons
+NO_REFS = ()
+
+# Interning a repeated string so every item shares one copy
+def intern_text(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
 # Class representing a menu item
 class MenuItem:
+    # Slots keep each item compact; menus for many stores are held in one process
+    __slots__ = ('name', 'id', 'price', 'combo', 'size', 'category', 'description', 'customizable',
+                 'index', '_table', '_ingredient_refs', '_free_add_on_refs', '_paid_add_on_refs')
+
     def __init__(self, name: str, id: str, price: float, ingredients: str_list,
                  combo: bool, size: str, category: str, description: str,
                  customizable: bool = False, free_add_ons: str_list = None, 
                  paid_add_ons: str_list = None):
-        self.name = name                # Assigning the name of the menu item
-        self.id = id                    # Assigning the unique identifier for the menu item
+        self.name = intern_text(name)   # Assigning the name of the menu item
+        self.id = intern_text(id)       # Assigning the unique identifier for the menu item
         self.price = price              # Assigning the price of the menu item
-        self.ingredients = ingredients  # Listing underlying ingredients
         self.combo = combo              # Boolean flag indicating if the menu item is part of a combo
-        self.size = size                # The size of the menu item
-        self.category = category        # Category to which the item belongs
+        self.size = intern_text(size)   # The size of the menu item
+        self.category = intern_text(category)  # Category to which the item belongs
         self.description = description  # A textual description of the menu item
         self.customizable = customizable  # Whether this item can be customized
-        self.free_add_ons = free_add_ons or []  # Free add-ons available for this item
-        self.paid_add_ons = paid_add_ons or []  # Paid add-ons available for this item
+        self.index = -1                 # Position in the owning menu's item table
+        self._table = None              # The owning menu's item table, once added to a menu
+        self.ingredients = ingredients  # Listing underlying ingredients
+        self.free_add_ons = free_add_ons  # Free add-ons available for this item
+        self.paid_add_ons = paid_add_ons  # Paid add-ons available for this item
+
+    # Storing item references as indexes into the menu's item table; anything
+    # not yet resolved to menu items (such as raw IDs) is stored as given
+    def _to_refs(self, values):
+        if isinstance(values, (array, memoryview)):
+            # Already index references; precompiled menus pass views into the mapped artifact
+            return values if len(values) else NO_REFS
+        if not values:
+            return NO_REFS
+        if all(isinstance(value, MenuItem) and value._table is not None for value in values):
+            self._table = values[0]._table
+            return array('I', (value.index for value in values))
+        return tuple(values)
+
+    def _from_refs(self, refs):
+        if isinstance(refs, (array, memoryview)) and self._table is not None:
+            table = self._table
+            return [table[index] for index in refs]
+        return list(refs)
+
+    @property
+    def ingredients(self):
+        return self._from_refs(self._ingredient_refs)
+
+    @ingredients.setter
+    def ingredients(self, values):
+        self._ingredient_refs = self._to_refs(values)
+
+    @property
+    def free_add_ons(self):
+        return self._from_refs(self._free_add_on_refs)
+
+    @free_add_ons.setter
+    def free_add_ons(self, values):
+        self._free_add_on_refs = self._to_refs(values)
+
+    @property
+    def paid_add_ons(self):
+        return self._from_refs(self._paid_add_on_refs)
+
+    @paid_add_ons.setter
+    def paid_add_ons(self, values):
+        self._paid_add_on_refs = self._to_refs(values)
 
     # Returning a string representation of a MenuItem
     def __str__(self):
@@ -31,33 +146,83 @@ class Menu:
     def __init__(self):
         # Initializing a dictionary to store MenuItem objects, keyed by their IDs
         self.items = {}
+        # Array-backed tables indexed by MenuItem.index; item references are stored as these indexes
+        self.item_table = []
+        self.name_table = []
+        self.price_table = array('d')
+        self.search_index = MenuSearchIndex([])  # Fuzzy name index, rebuilt on load
+        self.normalized_words = NormalizedWords()  # Normalized names and aliases, shared by the name indexes
+        self.version = 0                         # Unique per build of the indexes, for dependent caches
+        self.source_sha256 = None                # Digest of the menu file contents, when loaded from one
+
+        # Secondary indexes, rebuilt by build_indexes() whenever the items change
+        self.by_category = {}    # Case-folded category -> tuple of items, in menu order
+        self.size_variants = {}  # Base ID -> tuple of its size-variant items, smallest first
+        self.size_options = {}   # Base ID -> tuple of size option dicts for display
+        self.sauces = ()         # Sauce condiments, sorted by name
+        self.drinks = ()         # Drinks and McCafe items, sorted by name
+        self.sides = ()          # Sides, sorted by name
+
+        # Serialized items, built on first use and dropped whenever the items change
+        self._serialized = {}       # Item ID -> serialized dict
+        self._serialized_json = {}  # Item ID -> UTF-8 JSON bytes of the serialized dict
 
     def load_menu(self, filename: str):
         # Loading menu data from a JSON file
         with open(filename, 'r', encoding='utf-8') as file:
             data = json.load(file)  # Parsing the JSON data
+        self.load_data(data)
 
+    # Loading menu items from parsed menu data ({"menuItems": [...]})
+    def load_data(self, data: dict):
         # Iterating through each item in the loaded menu data
         for item in data['menuItems']:
-            # Creating a MenuItem object for each item in the data
-            menu_item = MenuItem(
-                name=item['name'],
-                id=item['id'],
-                price=item['price'],
-                ingredients=item['ingredients'],
-                combo=item['combo'],
-                size=item['size'],
-                category=item['category'],
-                description=item['description'],
-                customizable=item.get('customizable', False),
-                free_add_ons=item.get('freeAddOns', []),
-                paid_add_ons=item.get('paidAddOns', [])
-            )
-            # Adding the MenuItem to the items dictionary, using its ID as the key
-            self.items[item['id']] = menu_item
-
-        # Resolving ingredient references
+            # Adding a MenuItem for each item to the items dictionary, using its ID as the key
+            self.add_item(self.create_item(item))
+
+        self.resolve_references()
+        self.build_indexes()
+
+    # Loading menu items from a precompiled menu (see menu_compiler), whose
+    # item references are already resolved and whose indexes are prebuilt
+    def load_compiled(self, compiled):
+        for record in compiled.records():
+            self.add_item(self.create_item(record))
+        # The price table is shared with the memory-mapped artifact
+        self.price_table = compiled.prices
+        self.source_sha256 = compiled.source_sha256
+        self.build_indexes(prebuilt=compiled)
+
+    # Entity tag of the menu's contents for HTTP caching. The file digest is the
+    # same in every worker process, while version numbers are per process
+    @property
+    def etag(self) -> str:
+        if self.source_sha256:
+            return self.source_sha256[:32]
+        return f"v{self.version}"
+
+    # Creating a MenuItem from one item of the menu data
+    def create_item(self, item: dict) -> MenuItem:
+        return MenuItem(
+            name=item['name'],
+            id=item['id'],
+            price=item['price'],
+            ingredients=item['ingredients'],
+            combo=item['combo'],
+            size=item['size'],
+            category=item['category'],
+            description=item['description'],
+            customizable=item.get('customizable', False),
+            free_add_ons=item.get('freeAddOns', []),
+            paid_add_ons=item.get('paidAddOns', [])
+        )
+
+    # Resolving ingredient and add-on IDs to the menu's items
+    def resolve_references(self):
         for item in self.items.values():
+            for ing_id in item.ingredients:
+                if ing_id not in self.items:
+                    print(f"Warning: Ingredient {ing_id} not found for item {item.id}")
             # Resolve ingredients
             item.ingredients = [self.items[ing_id] for ing_id in item.ingredients if ing_id in self.items]
             # Resolve free add-ons
@@ -65,6 +230,64 @@ class Menu:
             # Resolve paid add-ons
             item.paid_add_ons = [self.items[ing_id] for ing_id in item.paid_add_ons if ing_id in self.items]
 
+    # Adding an item to the menu and its tables
+    def add_item(self, item: MenuItem):
+        item.index = len(self.item_table)
+        item._table = self.item_table
+        self.item_table.append(item)
+        self.name_table.append(item.name)
+        self.price_table.append(item.price)
+        self.items[item.id] = item
+
+    # Rebuilding the lookup indexes after the items change; a precompiled menu
+    # supplies its category and size-variant indexes as item table positions,
+    # its search index, and the normalized names the other name indexes are built from
+    def build_indexes(self, prebuilt=None):
+        if prebuilt is not None:
+            self.normalized_words = prebuilt.normalized_words()
+            table = self.item_table
+            self.by_category = {category: tuple(table[i] for i in positions)
+                                for category, positions in prebuilt.by_category.items()}
+            self.size_variants = {base_id: tuple(table[i] for i in positions)
+                                  for base_id, positions in prebuilt.size_variants.items()}
+        else:
+            by_category = {}
+            size_variants = {}
+            for item in self.items.values():
+                by_category.setdefault(item.category.casefold(), []).append(item)
+                base_id, size_code = split_item_id(item.id)
+                if size_code:
+                    size_variants.setdefault(base_id, []).append(item)
+
+            for base_id, variants in size_variants.items():
+                variants.sort(key=lambda item: SIZE_ORDER.get(split_item_id(item.id)[1], 99))
+
+            self.by_category = {category: tuple(items) for category, items in by_category.items()}
+            self.size_variants = {base_id: tuple(items) for base_id, items in size_variants.items()}
+
+        self.size_options = {
+            base_id: tuple({
+                'id': item.id,
+                'size_code': split_item_id(item.id)[1],
+                'size_name': size_display_name(item, base_id, split_item_id(item.id)[1]),
+                'price': item.price,
+                'name': item.name
+            } for item in variants)
+            for base_id, variants in self.size_variants.items()
+        }
+
+        by_name = lambda item: item.name
+        self.sauces = tuple(sorted((item for item in self.by_category.get('condiments', ())
+                                    if 'sauce' in item.name.lower()), key=by_name))
+        self.drinks = tuple(sorted(self.by_category.get('drinks', ()) + self.by_category.get('mccafe', ()),
+                                   key=by_name))
+        self.sides = tuple(sorted(self.by_category.get('sides', ()), key=by_name))
+
+        self.search_index = MenuSearchIndex(self.items, normalized=self.normalized_words, prebuilt=prebuilt)
+        self._serialized = {}
+        self._serialized_json = {}
+        self.version = next(_versions)
+
     # Getting information about a specific item based on its ID
     def get_item_information(self, item_id: str) -> Optional[MenuItem]:
         return self.items.get(item_id)  # Returning the MenuItem if found, otherwise None
@@ -73,15 +296,43 @@ class Menu:
     def get_items(self, category: Optional[str] = None) -> List[MenuItem]:
         if category:
             # Returning a list of items that belong to the specified category
-            return [item for item in self.items.values() if item.category == category]
+            return list(self.by_category.get(category.casefold(), ()))
         # Returning all items if no category is specified
         return list(self.items.values())
+
+    # Getting the size options of an item, smallest first (empty for items without sizes)
+    def get_size_options(self, item_id: str):
+        return self.size_options.get(split_item_id(item_id)[0], ())
+
+    # Searching items by name, tolerating typos and partial words
+    def search(self, query: str, limit: int = 10):
+        return self.search_index.search(query, limit)
     
-    # Serialize a menu item for JSON response
+    # Serialize a menu item for JSON response, memoized until the menu is reloaded
     def serialize_item(self, item):
         if not item:
             return None
-        
+        serialized = self._serialized.get(item.id)
+        if serialized is None:
+            serialized = self.build_serialized_item(item)
+            self._serialized[item.id] = serialized
+        # Callers may add keys to the result, so each gets its own copy
+        return dict(serialized)
+
+    # Serialize a menu item straight to JSON bytes, memoized like serialize_item
+    def serialize_item_json(self, item) -> bytes:
+        data = self._serialized_json.get(item.id)
+        if data is None:
+            data = json.dumps(self.serialize_item(item)).encode('utf-8')
+            self._serialized_json[item.id] = data
+        return data
+
+    # Serialize a list of menu items to a JSON array, reusing each item's cached bytes
+    def serialize_items_json(self, items) -> bytes:
+        return b'[' + b', '.join(self.serialize_item_json(item) for item in items) + b']'
+
+    # Build the serialized form of a menu item
+    def build_serialized_item(self, item):
         serialized = {
             'id': item.id,
             'name': item.name,
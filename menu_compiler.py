@@ -0,0 +1,281 @@
+"""
+Precompiled menu artifacts.
+
+compile_menu() validates a menu JSON file and writes a binary artifact next to
+it (menu_data.json -> menu_data.menuc) holding every item's fields, item
+references already resolved to item table positions, the category and
+size-variant indexes, and the normalized form of every name and alias the
+search index, local parser, order repairer and ingredient index are built
+from. Normalizing those names is most of the cost of building a menu, so
+Menu.load_compiled() skips it along with parsing the menu JSON and resolving
+IDs.
+
+Layout: an 8-byte magic, the format version and header length as two
+little-endian 64-bit integers, a small UTF-8 JSON header with the indexes and
+the section table, then 8-byte aligned raw sections: the price table, the
+reference tables, and string tables (NUL-separated UTF-8) for the text
+columns and normalized names. The header is plain data, so loading an
+artifact never runs code from it. The artifact is memory-mapped read-only, and
+items keep their prices and references as views into the mapping, so worker
+processes serving the same menu share those pages; each string table is
+decoded with a single split.
+
+Usage: python menu_compiler.py [menu_file] [-o output_file]
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+from array import array
+
+from local_parser import NormalizedWords, OrderParser
+from menu import Menu, validate_menu_data
+from order_repair import OrderRepairer
+from order_tools import ingredient_index
+
+MAGIC = b"TTEMENU1"
+FORMAT_VERSION = 3
+PREFIX = struct.Struct("<QQ")  # Format version, header length
+COMPILED_EXTENSION = ".menuc"
+
+# Reference fields of the menu data, stored as reference tables
+REFERENCE_FIELDS = ("ingredients", "freeAddOns", "paidAddOns")
+
+# Item fields stored as string tables, and as one byte per item
+TEXT_COLUMNS = ("id", "name", "size", "category", "description")
+FLAG_COLUMNS = ("combo", "customizable")
+
+
+def compiled_path_for(path):
+    """Return where the compiled artifact of a menu JSON file is written."""
+    return os.path.splitext(path)[0] + COMPILED_EXTENSION
+
+
+def source_digest(source_bytes):
+    return hashlib.sha256(source_bytes).hexdigest()
+
+
+def _aligned(length):
+    return (length + 7) & ~7
+
+
+def compile_menu(path, output=None):
+    """
+    Validate a menu JSON file and write its compiled artifact.
+
+    Returns the artifact path. Raises ValueError if the menu is invalid.
+    """
+    with open(path, "rb") as file:
+        source = file.read()
+    data = json.loads(source)
+    problems = validate_menu_data(data)
+    if problems:
+        raise ValueError("; ".join(problems))
+
+    # A plain Menu resolves the references and orders the indexes exactly as loading would.
+    # Building the kiosk's parser, repairer and ingredient index too records every text the name
+    # indexes normalize
+    menu = Menu()
+    menu.load_data(data)
+    OrderParser(menu.items, menu.normalized_words)
+    OrderRepairer(menu.items, menu.normalized_words)
+    ingredient_index(menu.items, menu.normalized_words)
+    records = data["menuItems"]
+    position = {item.id: item.index for item in menu.item_table}
+
+    sections = [("price", array("d", (float(item["price"]) for item in records)))]
+    for column in TEXT_COLUMNS:
+        sections.append((f"{column}.text", _string_table([item[column] for item in records])))
+    for column in FLAG_COLUMNS:
+        sections.append((column, array("B", (bool(item.get(column, False)) for item in records))))
+    normalized = sorted(menu.normalized_words.items())
+    sections.append(("normalized.text", _string_table([text for text, _ in normalized])))
+    sections.append(("normalized.words", _string_table([" ".join(words) for _, words in normalized])))
+
+    entries = menu.search_index.entries
+    sections.append(("search.text", _string_table([entry.text for entry in entries])))
+    sections.append(("search.items", array("I", (entry.item.index for entry in entries))))
+    sections.append(("search.gram_counts", array("I", (entry.gram_count for entry in entries))))
+    postings = sorted(menu.search_index.postings().items())
+    offsets = array("I", [0])
+    refs = array("I")
+    for _, entry_indexes in postings:
+        refs.extend(entry_indexes)
+        offsets.append(len(refs))
+    sections.append(("search.grams", _string_table([gram for gram, _ in postings])))
+    sections.append(("search.postings.offsets", offsets))
+    sections.append(("search.postings.refs", refs))
+    for field in REFERENCE_FIELDS:
+        offsets = array("I", [0])
+        refs = array("I")
+        for item in records:
+            refs.extend(position[ref] for ref in item.get(field) or [] if ref in position)
+            offsets.append(len(refs))
+        sections.append((f"{field}.offsets", offsets))
+        sections.append((f"{field}.refs", refs))
+
+    header = {
+        "source_sha256": source_digest(source),
+        "count": len(records),
+        "normalized_count": len(normalized),
+        "by_category": {category: [item.index for item in items] for category, items in menu.by_category.items()},
+        "size_variants": {base_id: [item.index for item in items] for base_id, items in menu.size_variants.items()},
+        "sections": {}
+    }
+
+    # Section offsets depend on the header length, which depends on the offsets; the
+    # header is padded to a fixed aligned size once its final length is known
+    blobs = [(name, values.typecode, values.tobytes()) for name, values in sections]
+    for name, typecode, blob in blobs:
+        header["sections"][name] = [0, len(blob), typecode]
+    header_size = _aligned(len(json.dumps(header).encode("utf-8")) + 256)
+    offset = len(MAGIC) + PREFIX.size + header_size
+    for name, typecode, blob in blobs:
+        header["sections"][name] = [offset, len(blob), typecode]
+        offset += _aligned(len(blob))
+    header_bytes = json.dumps(header).encode("utf-8")
+    assert len(header_bytes) <= header_size
+
+    output = output or compiled_path_for(path)
+    temp_path = f"{output}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(MAGIC)
+        file.write(PREFIX.pack(FORMAT_VERSION, header_size))
+        file.write(header_bytes.ljust(header_size, b" "))
+        for name, typecode, blob in blobs:
+            file.write(blob.ljust(_aligned(len(blob)), b"\0"))
+        file.flush()
+        os.fsync(file.fileno())
+    # Replacing rather than rewriting keeps existing mappings of the old artifact valid
+    os.replace(temp_path, output)
+    return output
+
+
+def _string_table(values):
+    """Return values as one NUL-separated UTF-8 string table."""
+    if any("\0" in value for value in values):
+        raise ValueError("Menu text may not contain NUL characters")
+    return array("B", "\0".join(values).encode("utf-8"))
+
+
+class CompiledMenu:
+    """A memory-mapped compiled menu artifact."""
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self._mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mapped)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a compiled menu")
+        format_version, header_size = PREFIX.unpack_from(self._mapped, len(MAGIC))
+        if format_version != FORMAT_VERSION:
+            raise ValueError(f"{path} has unsupported format {format_version}")
+        header_start = len(MAGIC) + PREFIX.size
+        if header_start + header_size > len(self._mapped):
+            raise ValueError(f"{path} is truncated")
+        header = json.loads(bytes(view[header_start:header_start + header_size]).decode("utf-8"))
+
+        self.path = path
+        self.source_sha256 = header["source_sha256"]
+        self.count = header["count"]
+        self._normalized_count = header["normalized_count"]
+        self.by_category = header["by_category"]
+        self.size_variants = header["size_variants"]
+        self._sections = {}
+        for name, (start, length, typecode) in header["sections"].items():
+            if typecode not in ("d", "I", "B") or start % 8 or start + length > len(self._mapped):
+                raise ValueError(f"{path} has an invalid {name} section")
+            self._sections[name] = view[start:start + length].cast(typecode)
+        self.prices = self._sections["price"]
+        self.columns = {column: self._strings(f"{column}.text", self.count) for column in TEXT_COLUMNS}
+        for column in FLAG_COLUMNS:
+            self.columns[column] = [bool(flag) for flag in self._sections[column]]
+        for column, values in self.columns.items():
+            if len(values) != self.count:
+                raise ValueError(f"{path} has a damaged {column} column")
+
+    def _strings(self, name, count):
+        if not count:
+            return []
+        return bytes(self._sections[name]).decode("utf-8").split("\0")
+
+    def search_entries(self):
+        """Return (normalized text, item position, trigram count) for each search index entry."""
+        items = self._sections["search.items"]
+        texts = self._strings("search.text", len(items))
+        if len(texts) != len(items):
+            raise ValueError(f"{self.path} has a damaged search index")
+        return zip(texts, items, self._sections["search.gram_counts"])
+
+    def search_postings(self):
+        """Return the search index's trigram -> entry indexes, as views into the mapping."""
+        offsets = self._sections["search.postings.offsets"]
+        refs = self._sections["search.postings.refs"]
+        grams = self._strings("search.grams", len(offsets) - 1)
+        return {gram: refs[offsets[index]:offsets[index + 1]] for index, gram in enumerate(grams)}
+
+    def normalized_words(self):
+        """Return a NormalizedWords prefilled with the menu's normalized names and aliases."""
+        texts = self._strings("normalized.text", self._normalized_count)
+        words = self._strings("normalized.words", self._normalized_count)
+        if len(texts) != len(words):
+            raise ValueError(f"{self.path} has a damaged normalized names table")
+        return NormalizedWords(zip(texts, (text.split() for text in words)))
+
+    def _references(self, field, index):
+        # A view into the mapping, not a copy, so the reference tables stay shared
+        offsets = self._sections[f"{field}.offsets"]
+        return self._sections[f"{field}.refs"][offsets[index]:offsets[index + 1]]
+
+    def records(self):
+        """Yield one item dict per item, with references as item table positions."""
+        columns = self.columns
+        for index in range(self.count):
+            yield {
+                "id": columns["id"][index],
+                "name": columns["name"][index],
+                "price": self.prices[index],
+                "size": columns["size"][index],
+                "category": columns["category"][index],
+                "description": columns["description"][index],
+                "combo": columns["combo"][index],
+                "customizable": columns["customizable"][index],
+                "ingredients": self._references("ingredients", index),
+                "freeAddOns": self._references("freeAddOns", index),
+                "paidAddOns": self._references("paidAddOns", index)
+            }
+
+
+def load_compiled_for(path, source_bytes):
+    """
+    Return the CompiledMenu of a menu JSON file if it is current, otherwise None.
+
+    The artifact is current when it was compiled from exactly source_bytes.
+    """
+    compiled_path = compiled_path_for(path)
+    if not os.path.exists(compiled_path):
+        return None
+    try:
+        compiled = CompiledMenu(compiled_path)
+    except Exception as e:
+        print(f"Ignoring unreadable compiled menu {compiled_path}: {e}")
+        return None
+    if compiled.source_sha256 != source_digest(source_bytes):
+        print(f"Ignoring stale compiled menu {compiled_path}; run compile-menu to rebuild it")
+        return None
+    return compiled
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a menu JSON file for fast loading.")
+    parser.add_argument("menu_file", nargs="?", default="menu_data.json")
+    parser.add_argument("-o", "--output", help="artifact path (default: next to the menu file)")
+    args = parser.parse_args()
+    output = compile_menu(args.menu_file, args.output)
+    print(f"Compiled {args.menu_file} -> {output}")
+
+
+if __name__ == "__main__":
+    main()
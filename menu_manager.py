@@ -0,0 +1,149 @@
+import json
+import os
+import threading
+import time
+
+from menu import Menu, validate_menu_data
+from menu_compiler import load_compiled_for, source_digest
+
+
+class MenuManager:
+    """
+    Serves the current menu snapshot and hot-reloads it when the menu file changes.
+
+    A snapshot is a fully loaded menu, indexes included, that is never modified
+    once published. A background thread polls the file; when it changes, a new
+    snapshot is built and validated off the request path and then swapped in
+    with a single reference assignment. Requests that already hold the old
+    snapshot keep using it, and a file that fails validation leaves the current
+    snapshot in place. Each snapshot carries its own menu version, so caches
+    keyed on the version invalidate themselves.
+
+    When a compiled artifact of the menu file exists (see menu_compiler) and
+    was compiled from the file's current contents, it is loaded instead of
+    the JSON.
+
+    Args:
+        path (str): Menu JSON file
+        menu_factory (callable): Creates an empty Menu (or subclass) to load into
+        poll_interval (float): Seconds between checks of the menu file
+    """
+
+    def __init__(self, path, menu_factory=Menu, poll_interval=2.0):
+        self.path = path
+        self.menu_factory = menu_factory
+        self.poll_interval = poll_interval
+
+        self.menu = menu_factory()    # Current snapshot; replaced, never modified
+        self.menu.build_indexes()
+        self._signature = None        # (mtime, size) of the file the snapshot was built from
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error = None
+        self.last_load_seconds = 0.0
+        self.loaded_at = None
+        self.compiled = False         # Whether the current snapshot came from a compiled artifact
+
+        try:
+            self.reload()
+        except Exception as e:
+            print(f"Error loading menu: {e}")
+
+    @property
+    def version(self):
+        return self.menu.version
+
+    def _file_signature(self):
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def build(self, data):
+        """Build a new snapshot from parsed menu data, raising ValueError if it is invalid."""
+        problems = validate_menu_data(data)
+        if problems:
+            raise ValueError("; ".join(problems[:5]))
+        menu = self.menu_factory()
+        menu.load_data(data)
+        return menu
+
+    def reload(self):
+        """Load the menu file into a new snapshot and publish it. Returns the new version."""
+        with self._reload_lock:
+            started = time.perf_counter()
+            try:
+                signature = self._file_signature()
+                with open(self.path, "rb") as file:
+                    source = file.read()
+                compiled = load_compiled_for(self.path, source)
+                if compiled is not None:
+                    menu = self.menu_factory()
+                    menu.load_compiled(compiled)
+                else:
+                    menu = self.build(json.loads(source))
+                    menu.source_sha256 = source_digest(source)
+                self.compiled = compiled is not None
+            except Exception as e:
+                self.failed_reloads += 1
+                self.last_error = str(e)
+                # Remember the bad file so it is not rebuilt on every poll
+                try:
+                    self._signature = self._file_signature()
+                except OSError:
+                    pass
+                raise
+
+            self.menu = menu
+            self._signature = signature
+            self.reloads += 1
+            self.last_error = None
+            self.last_load_seconds = time.perf_counter() - started
+            self.loaded_at = time.time()
+            return menu.version
+
+    def check(self):
+        """Reload if the menu file changed since the current snapshot was built. Returns True if reloaded."""
+        try:
+            if self._file_signature() == self._signature:
+                return False
+        except OSError:
+            return False
+        try:
+            self.reload()
+        except Exception as e:
+            print(f"Error reloading menu, keeping version {self.version}: {e}")
+            return False
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.check()
+
+    def start(self):
+        """Start watching the menu file in a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="menu-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "version": self.version,
+            "items": len(self.menu.items),
+            "compiled": self.compiled,
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "last_error": self.last_error,
+            "last_load_seconds": self.last_load_seconds,
+            "loaded_at": self.loaded_at
+        }
@@ -0,0 +1,196 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from menu import Menu
+from menu_manager import MenuManager
+
+STORE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class StoreMetrics:
+    def __init__(self):
+        self.loads = 0                  # Times the store's menu was loaded into memory
+        self.total_load_seconds = 0.0
+        self.last_load_seconds = 0.0
+        self.requests = 0
+        self.last_used = None
+
+    def to_dict(self):
+        return {
+            "loads": self.loads,
+            "last_load_seconds": self.last_load_seconds,
+            "average_load_seconds": self.total_load_seconds / self.loads if self.loads else 0,
+            "requests": self.requests,
+            "last_used": self.last_used
+        }
+
+
+class MenuRegistry:
+    """
+    Menus for many stores in one process.
+
+    Each store's menu is loaded the first time one of its kiosks asks for it
+    and is then kept hot-reloadable by a MenuManager. At most max_resident
+    stores are held in memory; beyond that the least recently used store is
+    dropped and reloaded on its next request. Preloaded stores are never
+    evicted. A single background thread watches the menu files of every
+    resident store.
+
+    The default store reads default_path; every other store reads
+    <directory>/<store_id>.json.
+
+    Args:
+        directory (str): Directory holding one menu file per store
+        default_store (str): Store used by sessions that have not chosen one
+        default_path (str): Menu file of the default store
+        menu_factory (callable): Creates an empty Menu (or subclass) to load into
+        max_resident (int): Maximum number of stores held in memory
+        poll_interval (float): Seconds between checks of the resident menu files
+    """
+
+    def __init__(self, directory="menus", default_store="default", default_path="menu_data.json",
+                 menu_factory=Menu, max_resident=50, poll_interval=2.0):
+        self.directory = directory
+        self.default_store = default_store
+        self.default_path = default_path
+        self.menu_factory = menu_factory
+        self.max_resident = max_resident
+        self.poll_interval = poll_interval
+
+        self._managers = OrderedDict()  # Store ID -> MenuManager, least recently used first
+        self._pinned = set()            # Preloaded store IDs, never evicted
+        self._load_locks = {}           # Store ID -> lock held while that store loads
+        self._metrics = {}              # Store ID -> StoreMetrics
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path_for(self, store_id):
+        """Return the menu file of a store. Raises KeyError for malformed store IDs."""
+        if store_id == self.default_store:
+            return self.default_path
+        if not STORE_ID_PATTERN.match(store_id or ""):
+            raise KeyError(store_id)
+        return os.path.join(self.directory, f"{store_id}.json")
+
+    def manager(self, store_id):
+        """Return the store's MenuManager, loading the store if it is not resident."""
+        with self._lock:
+            manager = self._lookup(store_id)
+            if manager is not None:
+                return manager
+            load_lock = self._load_locks.setdefault(store_id, threading.Lock())
+
+        # Only one request loads a given store; others for the same store wait for it
+        with load_lock:
+            with self._lock:
+                manager = self._lookup(store_id)
+                if manager is not None:
+                    return manager
+            try:
+                return self._load(store_id)
+            except Exception:
+                # Unknown or broken stores leave nothing behind
+                with self._lock:
+                    self._load_locks.pop(store_id, None)
+                raise
+
+    def menu(self, store_id):
+        """Return the current menu snapshot of a store."""
+        return self.manager(store_id).menu
+
+    def _lookup(self, store_id):
+        """Return a resident manager, marking it most recently used. Caller holds the lock."""
+        manager = self._managers.get(store_id)
+        if manager is not None:
+            self._managers.move_to_end(store_id)
+            metrics = self._metrics[store_id]
+            metrics.requests += 1
+            metrics.last_used = time.time()
+            self.hits += 1
+        return manager
+
+    def _load(self, store_id):
+        path = self.path_for(store_id)
+        if not os.path.exists(path):
+            raise KeyError(store_id)
+
+        started = time.perf_counter()
+        manager = MenuManager(path, menu_factory=self.menu_factory, poll_interval=self.poll_interval)
+        if manager.reloads == 0:
+            raise ValueError(f"Menu for store {store_id} could not be loaded: {manager.last_error}")
+        seconds = time.perf_counter() - started
+
+        with self._lock:
+            self._managers[store_id] = manager
+            self._load_locks.pop(store_id, None)
+            metrics = self._metrics.setdefault(store_id, StoreMetrics())
+            metrics.loads += 1
+            metrics.total_load_seconds += seconds
+            metrics.last_load_seconds = seconds
+            metrics.requests += 1
+            metrics.last_used = time.time()
+            self.misses += 1
+            self._evict()
+        return manager
+
+    def _evict(self):
+        """Drop least recently used stores beyond max_resident. Caller holds the lock."""
+        for store_id in list(self._managers):
+            if len(self._managers) <= self.max_resident:
+                break
+            if store_id not in self._pinned:
+                del self._managers[store_id]
+                self.evictions += 1
+
+    def preload(self, store_ids):
+        """Load stores ahead of their first request and keep them resident."""
+        for store_id in store_ids:
+            try:
+                self.manager(store_id)
+            except Exception as e:
+                print(f"Error preloading menu for store {store_id}: {e}")
+                continue
+            with self._lock:
+                self._pinned.add(store_id)
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            with self._lock:
+                managers = list(self._managers.values())
+            for manager in managers:
+                manager.check()
+
+    def start(self):
+        """Start watching the resident stores' menu files in a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="menu-registry-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "resident": list(self._managers),
+                "pinned": sorted(self._pinned),
+                "max_resident": self.max_resident,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "stores": {store_id: dict(metrics.to_dict(),
+                                          menu=self._managers[store_id].stats() if store_id in self._managers else None)
+                           for store_id, metrics in self._metrics.items()}
+            }
@@ -0,0 +1,122 @@
+from collections import defaultdict
+
+from local_parser import ITEM_ALIASES, NormalizedWords, base_name, normalize
+
+# Ingredient-only categories are not offered as search results
+UNSEARCHABLE_CATEGORIES = ("toppings", "patties", "ingredients")
+
+MIN_SCORE = 0.3
+
+
+def trigrams(words, partial_last=False):
+    """
+    Return the set of padded character trigrams of a list of words.
+
+    With partial_last, the last word is treated as a prefix still being typed,
+    so its end-of-word trigram is left out.
+    """
+    grams = set()
+    for index, word in enumerate(words):
+        padded = f"  {word}" if partial_last and index == len(words) - 1 else f"  {word} "
+        for start in range(len(padded) - 2):
+            grams.add(padded[start:start + 3])
+    return grams
+
+
+class SearchEntry:
+    def __init__(self, words, item, gram_count):
+        self.words = words              # Normalized words of the name or alias
+        self.text = " ".join(self.words)
+        self.item = item                # MenuItem the entry points to
+        self.gram_count = gram_count    # Number of distinct trigrams of the words
+
+
+class MenuSearchIndex:
+    """
+    Typo-tolerant search over menu item names and common aliases.
+
+    Every name and alias is broken into padded character trigrams, and an
+    inverted index maps each trigram to the entries containing it. A query
+    only scores the entries sharing at least one trigram with it, using the
+    Dice coefficient of the two trigram sets plus a bonus for prefix matches,
+    so misspellings and half-typed words still rank the intended item first.
+    """
+
+    def __init__(self, menu_items, aliases=ITEM_ALIASES, normalized=None, prebuilt=None):
+        """
+        Args:
+            menu_items (dict or list): Menu items, as Menu.items or Menu.get_items()
+            aliases (dict): Alias -> base menu item name
+            normalized (NormalizedWords, optional): The menu's normalized names, shared with its other indexes
+            prebuilt (optional): A compiled menu's entries and postings (see menu_compiler),
+                                 used instead of building them from menu_items
+        """
+        if isinstance(menu_items, dict):
+            menu_items = list(menu_items.values())
+
+        self._normalized = normalized if normalized is not None else NormalizedWords()
+        self.entries = []
+        self._postings = defaultdict(list)  # Trigram -> indexes into entries
+
+        if prebuilt is not None:
+            by_position = {item.index: item for item in menu_items}
+            self.entries = [SearchEntry(text.split(), by_position[position], gram_count)
+                            for text, position, gram_count in prebuilt.search_entries()]
+            self._postings = prebuilt.search_postings()
+            return
+
+        variants = defaultdict(list)  # Lower-cased base name -> size variants
+        for item in menu_items:
+            if item.category in UNSEARCHABLE_CATEGORIES:
+                continue
+            self._add(item.name, item)
+            variants[base_name(item.name).lower()].append(item)
+
+        for alias, target in aliases.items():
+            for item in variants.get(target.lower(), []):
+                self._add(alias, item)
+
+    def _add(self, text, item):
+        words = self._normalized[text]
+        if not words:
+            return
+        grams = trigrams(words)
+        for gram in grams:
+            self._postings[gram].append(len(self.entries))
+        self.entries.append(SearchEntry(words, item, len(grams)))
+
+    def postings(self):
+        """Return the inverted index as trigram -> entry indexes."""
+        return self._postings
+
+    def search(self, query, limit=10):
+        """
+        Return up to limit (MenuItem, score) pairs for a query, best match first.
+        """
+        words = normalize(query)
+        if not words:
+            return []
+        query_text = " ".join(words)
+        query_grams = trigrams(words, partial_last=True)
+
+        shared = defaultdict(int)  # Entry index -> trigrams shared with the query
+        for gram in query_grams:
+            for index in self._postings.get(gram, ()):
+                shared[index] += 1
+
+        best = {}  # Item ID -> (score, position in menu order, item)
+        for index, count in shared.items():
+            entry = self.entries[index]
+            score = 2 * count / (len(query_grams) + entry.gram_count)
+            if entry.text.startswith(query_text):
+                score += 0.5
+            elif any(word.startswith(words[-1]) for word in entry.words):
+                score += 0.2
+            if score < MIN_SCORE:
+                continue
+            item = entry.item
+            if item.id not in best or score > best[item.id][0]:
+                best[item.id] = (score, index, item)
+
+        ranked = sorted(best.values(), key=lambda match: (-match[0], match[1]))
+        return [(item, round(score, 3)) for score, _, item in ranked[:limit]]
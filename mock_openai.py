@@ -0,0 +1,388 @@
+"""
+Local stand-in for the OpenAI API, for load testing the agent offline.
+
+Serves POST /v1/responses and POST /v1/chat/completions (streaming and not)
+with scripted, menu-aware replies: each clause of the customer's message is
+matched against the menu with the menu search index, modifier clauses ("add
+bacon", "no pickles") become notes on the item before them, and each matched
+item becomes an add_item order change (a function call when the request
+offers tools). Every call waits
+a configurable latency with jitter before answering, and a fraction of calls
+can fail, so the numbers reflect a slow, imperfect upstream.
+
+Point the app at it with the OpenAI client's environment variables:
+
+    python mock_openai.py --port 8099 --latency 0.8 --jitter 0.3
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=mock flask run --with-threads
+
+Usage: python mock_openai.py [--host H] [--port P] [--menu FILE] [--latency S] [--jitter S]
+                             [--token-delay S] [--error-rate R] [--seed N]
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from menu import Menu
+
+# Clauses of an utterance: numbered list entries, sentences, commas and "and"
+CLAUSE_SEPARATOR = re.compile(r"\d+\.\s|[.,;]\s*|\band\b|\balso\b", re.IGNORECASE)
+MODIFIER_START = re.compile(r"^(add|extra|no|remove|without|hold the|light|with)\b", re.IGNORECASE)
+FILLER = re.compile(r"^(i'?d like|i want|i'll have|can i (get|have)|give me|please|a side of|side of|a|an|one)\s+",
+                    re.IGNORECASE)
+GOODBYE = re.compile(r"\b(checkout|check out|pay|bye|goodbye|exit|quit|that'?s all|that is all)\b", re.IGNORECASE)
+CURRENT_ORDER_PREFIX = "Current order: "
+
+# Lowest search score accepted as naming a menu item
+MIN_MATCH_SCORE = 0.5
+
+# Like the real API, prompts are cached by prefix in blocks once they reach a minimum length
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_BLOCK_TOKENS = 128
+
+
+class ScriptedAgent:
+    """Builds plausible agent replies from the menu, without a model."""
+
+    def __init__(self, menu):
+        self.menu = menu
+
+    def match(self, clause):
+        """Return the menu item a clause names, or None."""
+        text = FILLER.sub("", clause.strip())
+        # "Quarter Pounder with Cheese" is an item; "McNuggets with ranch" is an item and a note
+        head, _, _ = text.partition(" with ")
+        for query in dict.fromkeys((head, text)):
+            matches = self.menu.search(query, 1) if query else []
+            if matches and matches[0][1] >= MIN_MATCH_SCORE:
+                return matches[0][0]
+        return None
+
+    def order_lines(self, utterance):
+        """Return the order lines an utterance asks for, with modifier clauses as notes."""
+        lines = []
+        for clause in CLAUSE_SEPARATOR.split(utterance):
+            clause = clause.strip()
+            if not clause:
+                continue
+            if MODIFIER_START.match(clause) and lines:
+                notes = lines[-1]["notes"]
+                lines[-1]["notes"] = f"{notes}; {clause}" if notes else clause
+                continue
+            item = self.match(clause)
+            if item is not None:
+                lines.append({"id": item.id, "name": item.name, "price": item.price, "quantity": 1, "notes": ""})
+        return lines
+
+    def turn(self, messages):
+        """Return the structured turn for a prompt, as the order_turn schema describes it."""
+        utterance = last_message(messages, "user")
+        current_order = find_current_order(messages)
+        if GOODBYE.search(utterance):
+            return {"is_order": False, "is_valid": True, "is_new_order": False,
+                    "message": "TERMINATE_CHAT", "order_changes": []}
+
+        lines = self.order_lines(utterance)
+        if not lines:
+            return {"is_order": False, "is_valid": True, "is_new_order": False,
+                    "message": "What can I get for you today?", "order_changes": []}
+
+        names = ", ".join(line["name"] for line in lines)
+        return {
+            "is_order": True,
+            "is_valid": True,
+            "is_new_order": not current_order.get("menuItems"),
+            "message": f"I've added {names} to your order. Would you like anything else?",
+            "order_changes": [{"tool": "add_item", "item_id": line["id"], "name": line["name"],
+                               "quantity": line["quantity"], "notes": line["notes"]} for line in lines]
+        }
+
+
+def message_text(message):
+    content = message.get("content", "")
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def last_message(messages, role):
+    return next((message_text(m) for m in reversed(messages) if m.get("role") == role), "")
+
+
+def find_current_order(messages):
+    for message in reversed(messages):
+        text = message_text(message)
+        if text.startswith(CURRENT_ORDER_PREFIX):
+            try:
+                return json.loads(text[len(CURRENT_ORDER_PREFIX):])
+            except json.JSONDecodeError:
+                break
+    return {"menuItems": []}
+
+
+def chunks(text, size=12):
+    """Split text into stream deltas of about size characters."""
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+class MockStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.seen_prefixes = set()  # First messages of earlier prompts, standing in for the prompt cache
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def count(self, error=False):
+        with self.lock:
+            self.requests += 1
+            self.errors += error
+
+    def prompt_usage(self, messages):
+        """
+        Return (prompt_tokens, cached_tokens) for a prompt.
+
+        Tokens are estimated at four characters each. A prompt whose first
+        message was seen before reports that message as cached, rounded down
+        to whole cache blocks, as the real API does for a repeated prefix.
+        """
+        prompt_tokens = sum(len(message_text(m)) + 16 for m in messages) // 4
+        prefix = message_text(messages[0]) if messages else ""
+        prefix_tokens = len(prefix) // 4
+        with self.lock:
+            seen = prefix in self.seen_prefixes
+            self.seen_prefixes.add(prefix)
+            cached = 0
+            if seen and prompt_tokens >= PROMPT_CACHE_MIN_TOKENS:
+                cached = prefix_tokens - prefix_tokens % PROMPT_CACHE_BLOCK_TOKENS
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached
+        return prompt_tokens, cached
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # Set on the class by serve()
+    agent = None
+    options = None
+    stats = None
+    rng = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            stats = self.stats
+            self.send_json(200, {"requests": stats.requests, "errors": stats.errors,
+                                 "prompt_tokens": stats.prompt_tokens, "cached_tokens": stats.cached_tokens})
+        else:
+            self.send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        options = self.options
+        time.sleep(max(0.0, options.latency + self.rng.uniform(-options.jitter, options.jitter)))
+        if self.rng.random() < options.error_rate:
+            self.stats.count(error=True)
+            self.send_json(500, {"error": {"message": "Injected failure", "type": "server_error"}})
+            return
+        self.stats.count()
+
+        path = self.path.rstrip("/")
+        if path.endswith("/responses"):
+            self.respond_responses(body)
+        elif path.endswith("/chat/completions"):
+            self.respond_chat(body)
+        else:
+            self.send_json(404, {"error": {"message": f"Unknown endpoint {self.path}"}})
+
+    # Endpoints
+
+    def respond_responses(self, body):
+        messages = body.get("input", [])
+        turn = self.agent.turn(messages)
+        prompt_tokens, cached_tokens = self.stats.prompt_usage(messages)
+        if body.get("tools"):
+            # Second stage of the two-stage pipeline: the order changes as function calls
+            calls = [function_call(change) for change in turn["order_changes"]]
+            response = response_object(body.get("model", "mock"), "", prompt_tokens, cached_tokens, calls)
+            self.send_json(200, response)
+            return
+
+        text = json.dumps(turn)
+        response = response_object(body.get("model", "mock"), text, prompt_tokens, cached_tokens)
+        if not body.get("stream"):
+            self.send_json(200, response)
+            return
+
+        self.start_stream()
+        sequence = 0
+        for delta in chunks(text):
+            self.send_event("response.output_text.delta", {
+                "type": "response.output_text.delta", "item_id": response["output"][0]["id"],
+                "output_index": 0, "content_index": 0, "delta": delta, "sequence_number": sequence
+            })
+            sequence += 1
+            time.sleep(self.options.token_delay)
+        self.send_event("response.completed", {"type": "response.completed", "response": response,
+                                               "sequence_number": sequence})
+        self.end_stream()
+
+    def respond_chat(self, body):
+        messages = body.get("messages", [])
+        turn = self.agent.turn(messages)
+        header = {key: turn[key] for key in ("is_order", "is_valid", "is_new_order")}
+        text = f"{json.dumps(header)}\n\n{turn['message']}"
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model", "mock")
+        prompt_tokens, cached_tokens = self.stats.prompt_usage(messages)
+        output_tokens = len(text) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": output_tokens,
+                 "total_tokens": prompt_tokens + output_tokens,
+                 "prompt_tokens_details": {"cached_tokens": cached_tokens}}
+
+        if not body.get("stream"):
+            self.send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage
+            })
+            return
+
+        self.start_stream()
+        for delta in chunks(text):
+            self.send_event(None, {
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]
+            })
+            time.sleep(self.options.token_delay)
+        self.send_event(None, {
+            "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        })
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self.send_event(None, {
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [], "usage": usage
+            })
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.end_stream()
+
+    # HTTP helpers
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def send_event(self, event, payload):
+        frame = f"event: {event}\n" if event else ""
+        self.write_chunk(f"{frame}data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def function_call(change):
+    """Return a Responses API function_call output item for an order change."""
+    arguments = {key: value for key, value in change.items() if key != "tool"}
+    return {
+        "type": "function_call",
+        "id": f"fc_{uuid.uuid4().hex}",
+        "call_id": f"call_{uuid.uuid4().hex}",
+        "name": change["tool"],
+        "arguments": json.dumps(arguments),
+        "status": "completed"
+    }
+
+
+def response_object(model, text, prompt_tokens, cached_tokens, calls=None):
+    output_tokens = len(text) // 4 + sum(len(call["arguments"]) for call in calls or []) // 4
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": model,
+        "output": calls or [{
+            "type": "message",
+            "id": f"msg_{uuid.uuid4().hex}",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": text, "annotations": []}]
+        }],
+        "parallel_tool_calls": bool(calls),
+        "tool_choice": "required" if calls else "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": prompt_tokens,
+            "input_tokens_details": {"cached_tokens": cached_tokens},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": prompt_tokens + output_tokens
+        }
+    }
+
+
+def serve(options):
+    """Build the mock server from parsed options. Call serve_forever() on the result."""
+    menu = Menu()
+    menu.load_menu(options.menu)
+    MockHandler.agent = ScriptedAgent(menu)
+    MockHandler.options = options
+    MockHandler.stats = MockStats()
+    MockHandler.rng = random.Random(options.seed)
+    return ThreadingHTTPServer((options.host, options.port), MockHandler)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a scripted stand-in for the OpenAI API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--menu", default="menu_data.json", help="menu the replies are drawn from")
+    parser.add_argument("--latency", type=float, default=0.8, help="seconds before each reply starts")
+    parser.add_argument("--jitter", type=float, default=0.3, help="latency varies by up to this many seconds")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed deltas")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with a 500")
+    parser.add_argument("--seed", type=int, default=None, help="seed for reproducible latency and failures")
+    return parser.parse_args(argv)
+
+
+def main():
+    options = parse_args()
+    server = serve(options)
+    print(f"Mock OpenAI API on http://{options.host}:{options.port}/v1 "
+          f"(latency {options.latency}s +/- {options.jitter}s, error rate {options.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
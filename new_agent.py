@@ -1,44 +1,59 @@
 from openai import OpenAI
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
 
-client = OpenAI()
+from agent_context import PromptWindow
+from agent_executor import AgentExecutor
+from agent_stream import JsonFieldStream, SeparatorStream
+from conversation_store import ConversationStore
+from order_store import create_order_store, empty_order
+from order_repair import substitution_notice
+from order_tools import ORDER_TOOLS, function_calls, plan_order_changes, turn_changes
+from response_cache import ResponseCache
 
-conversation_history = []
+# A hung LLM call would hold an agent worker indefinitely, so calls time out
+client = OpenAI(timeout=float(os.environ.get("OPENAI_TIMEOUT", "30")))
 
-def load_menu_data():
-    """Load the menu data from menu_data.json"""
-    try:
-        with open("menu_data.json", "r", encoding='utf-8') as file:
-            return json.load(file)
-    except Exception as e:
-        print(f"Error loading menu data: {e}")
-        return {"menuItems": []}
+# Per-session order storage (in-memory unless ORDER_STORE_BACKEND says otherwise)
+order_store = create_order_store()
+
+# Builds each turn's prompt within a token budget for everything after the system message,
+# summarizing older turns
+prompt_window = PromptWindow(token_budget=int(os.environ.get("AGENT_PROMPT_TOKEN_BUDGET", "3000")))
+
+# Per-session conversation memory, bounded in sessions, age and size
+conversation_store = ConversationStore(summarizer=prompt_window.fold)
+
+# Agent turns for repeated utterances, reused while the order, context and menu match
+response_cache = ResponseCache(
+    max_entries=int(os.environ.get("RESPONSE_CACHE_SIZE", "1000")),
+    ttl_seconds=float(os.environ.get("RESPONSE_CACHE_TTL", "900"))
+)
 
-def load_menu_schema():
-    with open("menu_schema.json", "r") as file:
+# Runs chat turns on a bounded pool so slow LLM calls can't take every server thread.
+# Each admitted turn also holds the server thread waiting for it, so the server needs
+# more threads than AGENT_MAX_CONCURRENCY + AGENT_MAX_QUEUED (8 by default)
+agent_executor = AgentExecutor(
+    max_workers=int(os.environ.get("AGENT_MAX_CONCURRENCY", "4")),
+    max_queued=int(os.environ.get("AGENT_MAX_QUEUED", "4"))
+)
+
+DEFAULT_SESSION_ID = "default"
+
+def load_turn_schema():
+    with open("turn_schema.json", "r") as file:
         return json.load(file)
 
-def initialize_new_order():
-    """Create a fresh empty order and save it."""
-    empty_order = {"menuItems": [], "total": 0.0}
-    save_order(empty_order)
-    return empty_order
+def initialize_new_order(session_id=DEFAULT_SESSION_ID):
+    """Create a fresh empty order for the session and save it."""
+    return order_store.clear(session_id)
 
-def load_current_order():
-    """Load the current order from order.json"""
-    try:
-        with open("order.json", "r", encoding='utf-8') as file:
-            order = json.load(file)
-            
-            # Backward compatibility: convert 'items' to 'menuItems' if needed
-            if "items" in order and "menuItems" not in order:
-                order["menuItems"] = order["items"]
-                order.pop("items", None)
-                save_order(order)
-            return order
-    except (FileNotFoundError, json.JSONDecodeError):
-        return initialize_new_order()
+def load_current_order(session_id=DEFAULT_SESSION_ID):
+    """Load the current order for the session from the order store"""
+    return order_store.load(session_id)
 
 def translate_ingredient_ids_to_names(notes, menu_items):
     """
@@ -79,11 +94,15 @@ def translate_ingredient_ids_to_names(notes, menu_items):
     
     return notes  # Return original if no patterns match
 
-def save_order(order_data, menu_items=None):
-    """Save the updated order to order.json"""
+def save_order(order_data, menu_items=None, session_id=DEFAULT_SESSION_ID):
+    """
+    Replace the session's cart with a complete order document.
+
+    The cart recomputes the total itself, so any total in order_data is ignored.
+    """
     # Ensure we have a valid order structure
     if not order_data:
-        order_data = {"menuItems": [], "total": 0.0}
+        order_data = empty_order()
     
     # Convert 'items' to 'menuItems' for consistency if needed
     if "items" in order_data and "menuItems" not in order_data:
@@ -93,10 +112,6 @@ def save_order(order_data, menu_items=None):
     # Ensure the required fields exist
     if "menuItems" not in order_data:
         order_data["menuItems"] = []
-    if "total" not in order_data:
-        # Calculate total from menu items
-        order_data["total"] = sum(item.get("price", 0) * item.get("quantity", 1) 
-                                for item in order_data["menuItems"])
     
     # Translate ingredient IDs to names in notes if menu_items is provided
     if menu_items is not None:
@@ -104,43 +119,13 @@ def save_order(order_data, menu_items=None):
             if "notes" in item and item["notes"]:
                 item["notes"] = translate_ingredient_ids_to_names(item["notes"], menu_items)
     
-    with open("order.json", "w", encoding='utf-8') as file:
-        json.dump(order_data, file, indent=4)
+    order_store.save(session_id, order_data)
 
-def process_order_request(user_message, menu_items, current_order=None):
-    """
-    Process an order request from the user.
-
-    Args:
-        user_message (str): The user's message/order request
-        menu_items (list): List of menu items
-        current_order (dict, optional): Current order data. 
-                                        If None, loads from order.json.
-    Returns:
-        dict: Result dictionary with the processed order information
-    """
-    global conversation_history  # Access the global conversation history
+# Which LLM pipeline process_order_request uses: "single" makes one structured
+# call per turn, "two_stage" classifies first and then rebuilds the order.
+AGENT_MODE = os.environ.get("AGENT_MODE", "single")
 
-    if current_order is None:
-        current_order = load_current_order()
-    
-    # Prepare the system message (only add once if conversation_history is empty).
-    system_message = f"""You are a helpful restaurant assistant.
-    Here is our menu: {json.dumps([{'name': item.name, 'id': item.id, 'category': item.category} 
-                                 for item in menu_items])}
-    
-    RESPONSE FORMAT:
-    Your response must always begin with a JSON object on the first line, followed by two newlines, then your conversational response to the user.
-    Only respond in plaintext, do not use markdown, bold, dash or bullet point lists, etc.
-    
-    The JSON object must contain:
-    1. "is_order": true if they're attempting to order food, false otherwise
-    2. "is_valid": true if all requested items/modifications match our menu, false otherwise
-    3. "is_new_order": true if this is a new order (e.g., "I'd like to order..." or starting a fresh order)
-    
-    Example first line: {{"is_order": true, "is_valid": true, "is_new_order": false}}
-    
-    CRITICAL RULES FOR ORDER PROCESSING:
+ORDER_RULES = """CRITICAL RULES FOR ORDER PROCESSING:
     - Item IDs are permanent and must never be modified
     - When customizing items, always use the original menu item ID
     - Never create new IDs for modified items
@@ -163,120 +148,303 @@ def process_order_request(user_message, menu_items, current_order=None):
     If they request items not on the menu, kindly let them know what's available instead.
     Keep track of their order across multiple requests."""
 
-    # If this is the very first user request, push the system message onto the conversation
-    if not conversation_history:
-        conversation_history.append({"role": "system", "content": system_message})
+def menu_prompt_json(menu_items):
+    """Return the menu as the model sees it, as compact JSON in menu order."""
+    return json.dumps([{'id': item.id, 'name': item.name, 'price': item.price,
+                        'category': item.category, 'size': item.size}
+                       for item in menu_items])
+
+def render_system_message(menu_items, mode):
+    """Render the agent's system message for the given pipeline mode."""
+    # Both modes share the menu block, so its text is the same for either pipeline
+    menu_block = f"""You are a helpful restaurant assistant.
+    Here is our menu: {menu_prompt_json(menu_items)}
+    """
+    if mode == "two_stage":
+        return menu_block + f"""
+    RESPONSE FORMAT:
+    Your response must always begin with a JSON object on the first line, followed by two newlines, then your conversational response to the user.
+    Only respond in plaintext, do not use markdown, bold, dash or bullet point lists, etc.
+    
+    The JSON object must contain:
+    1. "is_order": true if they're attempting to order food, false otherwise
+    2. "is_valid": true if all requested items/modifications match our menu, false otherwise
+    3. "is_new_order": true if this is a new order (e.g., "I'd like to order..." or starting a fresh order)
+    
+    Example first line: {{"is_order": true, "is_valid": true, "is_new_order": false}}
     
-    # Add the current order context to the user message
-    # so the AI sees what has been ordered so far.
-    context_message = f"Current order: {json.dumps(current_order)}\n\n{user_message}"
+    {ORDER_RULES}"""
 
-    # Append the user's new message (including context) to the conversation history
-    conversation_history.append({"role": "user", "content": context_message})
+    return menu_block + f"""
+    RESPONSE FORMAT:
+    Respond in the json schema format with these fields:
+    1. "is_order": true if they're attempting to order food, false otherwise
+    2. "is_valid": true if all requested items/modifications match our menu, false otherwise
+    3. "is_new_order": true if this is a new order (e.g., "I'd like to order..." or starting a fresh order)
+    4. "message": your conversational response to the user, in plaintext without markdown, bold, dash or bullet point lists
+    5. "order_changes": if is_order and is_valid are both true, only the changes this message makes to the
+       current order, as calls to these tools; otherwise an empty list. Never restate items already in the order.
+       - add_item: item_id, name, quantity, and notes with the customizations (empty when not customized),
+         written as "Removed: <ingredients>; Added: <ingredients>"; added ingredients are charged
+       - remove_item: item_id of a line in the order, and quantity to remove (null removes the line)
+       - set_quantity: item_id of a line in the order, and its new quantity
+       - set_notes: item_id of a line in the order, and its new notes
+       - clear_order: empties the order
+       Set the fields a tool does not use to null. For a new order, the current order is cleared first.
+    
+    {ORDER_RULES}"""
 
-    try:
-        # Generate completion with the entire conversation so far
-        completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=conversation_history
-        )
-        
-        full_response = completion.choices[0].message.content
+# System messages by (menu version, mode). They depend only on the menu, so each is
+# rendered once and then sent as the same string every turn, in every session,
+# which keeps the start of every prompt byte-identical for provider prompt caching
+_system_messages = OrderedDict()
+_system_messages_lock = threading.Lock()
+MAX_CACHED_SYSTEM_MESSAGES = 64
 
-        # Append the AI's answer to the conversation history
-        conversation_history.append({"role": "assistant", "content": full_response})
-        
-        try:
-            json_str, _, conversation = full_response.partition('\n\n')
-            evaluation = json.loads(json_str)
-            message_to_user = conversation
-            
-            is_order = evaluation.get("is_order", False)
-            is_valid = evaluation.get("is_valid", False)
-            is_new_order = evaluation.get("is_new_order", False)
-        except:
-            # If parsing fails, treat it as a normal text message
-            message_to_user = full_response
-            is_order = False
-            is_valid = False
-            is_new_order = False
-        
-        result = {
-            "message": message_to_user,
-            "is_order": is_order,
-            "is_valid": is_valid,
-            "is_new_order": is_new_order,
-            "updated_order": current_order
-        }
+def build_system_message(menu_items, mode, menu_version=None):
+    """Return the agent's system message, rendered once per menu version and mode when menu_version is given."""
+    if menu_version is None:
+        return render_system_message(menu_items, mode)
+    key = (menu_version, mode)
+    with _system_messages_lock:
+        message = _system_messages.get(key)
+        if message is not None:
+            _system_messages.move_to_end(key)
+            return message
+    message = render_system_message(menu_items, mode)
+    with _system_messages_lock:
+        message = _system_messages.setdefault(key, message)
+        while len(_system_messages) > MAX_CACHED_SYSTEM_MESSAGES:
+            _system_messages.popitem(last=False)
+    return message
 
-        client_input = []
-        client_input.append({"role": "system", "content": f"""Here is the menu data:\n{json.dumps([
-                            {
-                                'id': item.id,
-                                'name': item.name,
-                                'price': item.price,
-                                'category': item.category,
-                                'size': item.size
-                            } for item in menu_items
-                        ])}\n
-                        Current order: {json.dumps(current_order)}
-                        
-                        STRICT ID RULES:
-                        - Never modify existing item IDs
-                        - Use original menu IDs for all items, even when customized
-                        - Do not create new IDs for any reason
-                        - All items must use IDs exactly as they appear in the menu
-                        - Capture any special requests in the item's "notes" field
-                        - Use the "notes" field to record customizations and special instructions
-                        
-                        - If an item with multiple sizes is ordered but no size is chosen, default to medium."""})
-                        
-                        
-        client_input.append({"role": "system", "content": """Process the order request and return the complete updated order in the json schema format.
-                        Include all existing items and any additions/modifications requested.
-                        Return the complete order with all items, not just the changes.
-                        Remember to maintain original item IDs even when modifications are made.
-                        If any customizations are made to the item, include them in the notes field.
-                        Only include notes if there are customizations to the item."""})
-
-        client_input.extend(conversation_history)
-        
-        # Process order if needed
-        if is_order and is_valid:
-            try:
-                # If this is a new order, clear the existing order
-                if is_new_order:
-                    current_order = {"menuItems": [], "total": 0.0}
-                
-                menu_schema = load_menu_schema()
-                
-                # Make a second call to create the final updated order object
-                order_response = client.responses.create(
-                    model="gpt-4o",
-                    input=client_input,
-                    text=menu_schema
-                )
-                
-                updated_order = json.loads(order_response.output_text)
-                save_order(updated_order, menu_items)
-                
-                # Update the result with the processed order
-                result["updated_order"] = updated_order
-                
-                # Add order total to the message
-                total = updated_order.get("total", 0.0)
-                if "total" not in updated_order:
-                    total = sum(
-                        item.get("price", 0) * item.get("quantity", 1) 
-                        for item in updated_order.get("menuItems", [])
-                    )
-                
-                result["message"] += f"\n\n Your current order total is ${total:.2f}"
-                
-            except Exception as e:
-                print(f"Error processing order: {e}")
-                result["message"] += "\n\nI apologize, but there was an error processing your order. Please try again."
-        
+# Second-stage instructions of the two-stage pipeline. They follow the first stage's
+# prompt and reply, so the second call reuses the first call's prompt as its prefix
+ORDER_BUILDER_INSTRUCTIONS = """Make the changes the customer asked for in their last message by calling the order tools.
+    Only call tools for what changed; never re-add items that are already in the current order.
+    To change an item already in the order, refer to it by its item ID or line key.
+    
+    STRICT ID RULES:
+    - Never modify existing item IDs
+    - Use original menu IDs for all items, even when customized
+    - Do not create new IDs for any reason
+    - All items must use IDs exactly as they appear in the menu
+    - Capture any special requests in the item's notes
+    - Use the notes to record customizations and special instructions
+    - Leave notes empty if there are no customizations to the item
+    
+    - If an item with multiple sizes is ordered but no size is chosen, default to medium."""
+
+def record_usage(usage):
+    """Record the prompt tokens a model call used and how many the provider served from its prompt cache."""
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "input_tokens", None)
+    details = getattr(usage, "input_tokens_details", None)
+    if prompt_tokens is None:
+        # Chat completions name the same numbers differently
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        details = getattr(usage, "prompt_tokens_details", None)
+    if prompt_tokens is not None:
+        prompt_window.record_usage(prompt_tokens, getattr(details, "cached_tokens", 0) or 0)
+
+def apply_order_changes(result, calls, menu_items, session_id, is_new_order=False, order_repairer=None,
+                        ingredients=None):
+    """
+    Apply the order changes the model made as tool calls, then report the new total to the user.
+
+    The calls are validated against the menu and the session's cart under its
+    lock and applied as one atomic batch. With an order_repairer, unknown IDs
+    and mangled sizes are mapped onto the menu first; calls that still cannot
+    be applied are skipped and listed in result["rejected_changes"].
+    """
+    menu_items_by_id = {item.id: item for item in menu_items}
+    
+    def describe_notes(notes):
+        return translate_ingredient_ids_to_names(notes, menu_items)
+    
+    with order_store.lock(session_id):
+        current_order = empty_order() if is_new_order else load_current_order(session_id)
+        ops, rejected, repaired = plan_order_changes(calls, menu_items_by_id, current_order, describe_notes,
+                                                     order_repairer, ingredients)
+        if is_new_order:
+            ops = [{"op": "clear"}] + ops
+        if ops:
+            order_store.apply(session_id, {"op": "batch", "ops": ops})
+        updated_order = load_current_order(session_id)
+    
+    result["updated_order"] = updated_order
+    result["order_changes"] = len(calls)
+    if repaired:
+        # Substitutions are guesses, so the customer is always told about them
+        result["repaired_changes"] = [f"{asked} -> {used}" for asked, used in repaired]
+        notice = substitution_notice(repaired)
+        if notice:
+            result["message"] += "\n\n" + notice
+    if rejected:
+        print(f"Skipped order changes: {'; '.join(rejected)}")
+        result["rejected_changes"] = rejected
+        result["message"] += "\n\nI couldn't make every change you asked for, so please check your order."
+    
+    result["message"] += f"\n\n Your current order total is ${updated_order['total']:.2f}"
+
+def apply_local_parse(user_message, parsed, session_id):
+    """Apply a confident local parse directly to the session's cart, without calling the LLM."""
+    with order_store.lock(session_id):
+        # One batch, so a line that fails leaves none of the others applied
+        order_store.apply(session_id, {"op": "batch", "ops": [line.to_op() for line in parsed.lines]})
+        updated_order = load_current_order(session_id)
+    
+    message_to_user = f"Got it! I added {', '.join(line.describe() for line in parsed.lines)} to your order."
+    
+    # Same follow-ups the kiosk suggests after adding these items
+    categories = {line.item.category for line in parsed.lines}
+    if categories & {"burgers", "chicken", "fish"} and not categories & {"sides", "drinks", "McCafe"}:
+        message_to_user += " Would you like a side and a drink with that?"
+    elif categories & {"sides", "salads"} or any("NUG" in line.item.id for line in parsed.lines):
+        if "condiments" not in categories:
+            message_to_user += " Would you like any sauce with that?"
+    
+    message_to_user += f"\n\n Your current order total is ${updated_order['total']:.2f}"
+    
+    conversation_store.append(session_id, {"role": "user", "content": user_message})
+    conversation_store.append(session_id, {"role": "assistant", "content": message_to_user})
+    
+    return {
+        "message": message_to_user,
+        "is_order": True,
+        "is_valid": True,
+        "is_new_order": False,
+        "updated_order": updated_order,
+        "source": "local_parser",
+        "timings": {"llm_calls": 0, "llm_seconds": 0.0}
+    }
+
+def apply_cached_turn(user_message, turn, menu_items, current_order, session_id, order_repairer=None,
+                      ingredients=None):
+    """
+    Replay a cached agent turn against the session, without calling the LLM.
+
+    The turn's order changes are applied again rather than its resulting order
+    being saved, so the replay goes through the same validation, repairs and
+    notes as the original turn and the customer sees the same message.
+    """
+    conversation_store.append(session_id, {"role": "user", "content": user_message})
+    conversation_store.append(session_id, {"role": "assistant", "content": turn["reply"]})
+    
+    result = {
+        "message": turn["message"],
+        "is_order": turn["is_order"],
+        "is_valid": turn["is_valid"],
+        "is_new_order": turn["is_new_order"],
+        "updated_order": current_order,
+        "source": "response_cache",
+        "timings": {"llm_calls": 0, "llm_seconds": 0.0}
+    }
+    if turn["changes"] is not None:
+        apply_order_changes(result, turn["changes"], menu_items, session_id, turn["is_new_order"], order_repairer,
+                            ingredients)
+    return result
+
+def last_assistant_message(history):
+    """Return the assistant's most recent reply, which the next utterance may be answering."""
+    return next((m["content"] for m in reversed(history) if m["role"] == "assistant"), "")
+
+def process_order_request(user_message, menu_items, current_order=None, session_id=DEFAULT_SESSION_ID, mode=None,
+                          order_parser=None, menu_version=None, on_delta=None, store_id=None, order_repairer=None,
+                          ingredients=None):
+    """
+    Process an order request from the user.
+
+    Args:
+        user_message (str): The user's message/order request
+        menu_items (list): List of menu items
+        current_order (dict, optional): Current order data. 
+                                        If None, loads the session's order from the order store.
+        session_id (str, optional): Session whose order is read and updated
+        mode (str, optional): "single" or "two_stage"; defaults to AGENT_MODE
+        order_parser (OrderParser, optional): Local parser tried before the LLM;
+                                              confident parses never reach the model
+        order_repairer (OrderRepairer, optional): Repairs the model's order changes locally
+                                                  instead of rejecting them
+        ingredients (dict, optional): The menu's order_tools.ingredient_index, for reading
+                                      customizations in the model's notes; built per turn if not given
+        menu_version (optional): Version of the menu in use; when given, turns are
+                                 cached in response_cache and reused for repeated utterances
+        store_id (str, optional): Store whose menu menu_items came from; cached turns
+                                  are invalidated per store when its menu version changes
+        on_delta (callable, optional): Called with each piece of the reply text as it is
+                                       generated, for streaming the reply to the user
+    Returns:
+        dict: Result dictionary with the processed order information
+    """
+    mode = mode or AGENT_MODE
+    started = time.perf_counter()
+    first_delta = []
+    
+    def emit(text):
+        if on_delta is not None and text:
+            if not first_delta:
+                first_delta.append(time.perf_counter() - started)
+            on_delta(text)
+    
+    # Simple orders are resolved locally in milliseconds
+    if order_parser is not None:
+        parsed = order_parser.parse(user_message)
+        # Only the model can tell whether "I'd like to order ..." starts over or adds
+        # to an existing order, so such utterances are applied locally only to an empty cart
+        if parsed.confident and not (parsed.new_order and load_current_order(session_id)["menuItems"]):
+            result = apply_local_parse(user_message, parsed, session_id)
+            emit(result["message"])
+            return result
+    
+    if current_order is None:
+        current_order = load_current_order(session_id)
+    
+    history, summary = conversation_store.context(session_id)
+    
+    # Repeated utterances against the same order, question and summary of older turns reuse an earlier turn
+    cache_key = None
+    if menu_version is not None:
+        response_cache.invalidate(menu_version, store_id)
+        cache_key = response_cache.key(user_message, current_order, menu_version, mode,
+                                       last_assistant_message(history), summary)
+        turn = response_cache.get(cache_key)
+        if turn is not None:
+            result = apply_cached_turn(user_message, turn, menu_items, current_order, session_id, order_repairer,
+                                       ingredients)
+            emit(result["message"])
+            return result
+    
+    # Build the prompt: the static system message, a summary of older turns, recent
+    # turns within the token budget, and a single slot holding the current order so
+    # the AI sees what has been ordered so far. Everything per-session follows the
+    # system message, so the prompt prefix is shared across turns and sessions.
+    build_started = time.perf_counter()
+    system_message = build_system_message(menu_items, mode, menu_version)
+    messages, prompt_metrics = prompt_window.build(system_message, history, summary, current_order, user_message,
+                                                   build_started=build_started)
+
+    stream_to = emit if on_delta is not None else None
+    try:
+        if mode == "two_stage":
+            result = _process_two_stage(messages, menu_items, current_order, session_id, stream_to, order_repairer,
+                                        ingredients)
+        else:
+            result = _process_single_call(messages, menu_items, current_order, session_id, stream_to, order_repairer,
+                                          ingredients)
+        # The exchange is only remembered once the model has answered, so a failed call
+        # leaves no unanswered message behind. History keeps the bare message; the order
+        # is supplied fresh every turn
+        conversation_store.append(session_id, {"role": "user", "content": user_message})
+        conversation_store.append(session_id, {"role": "assistant", "content": result.pop("reply")})
+        turn = result.pop("turn")
+        if cache_key is not None and turn is not None:
+            response_cache.put(cache_key, turn, store_id)
+        result["prompt_metrics"] = prompt_metrics
+        result["timings"]["total_seconds"] = time.perf_counter() - started
+        if first_delta:
+            result["timings"]["first_delta_seconds"] = first_delta[0]
         return result
         
     except Exception as e:
@@ -290,7 +458,182 @@ def process_order_request(user_message, menu_items, current_order=None):
             "error": str(e)
         }
 
-def reset_conversation_history():
-    """Reset the global conversation history."""
-    global conversation_history
-    conversation_history = []
+def cached_turn(reply, message_to_user, result, changes):
+    """Return the part of a completed turn that can be replayed from response_cache."""
+    return {
+        "reply": reply,                 # Assistant message as stored in the conversation history
+        "message": message_to_user,     # Model's message to the user, before the order notes and total
+        "is_order": result["is_order"],
+        "is_valid": result["is_valid"],
+        "is_new_order": result["is_new_order"],
+        "changes": changes              # (name, arguments) of the order changes the turn made, or None
+    }
+
+def _stream_single_call(messages, on_delta):
+    """Stream a structured turn, passing the "message" field's text to on_delta as it arrives."""
+    message_field = JsonFieldStream("message")
+    output = []
+    stream = client.responses.create(
+        model="gpt-4o",
+        input=messages,
+        text=load_turn_schema(),
+        stream=True
+    )
+    for event in stream:
+        if event.type == "response.output_text.delta":
+            output.append(event.delta)
+            on_delta(message_field.feed(event.delta))
+        elif event.type == "response.completed":
+            record_usage(event.response.usage)
+    return "".join(output)
+
+def _process_single_call(messages, menu_items, current_order, session_id, on_delta=None, order_repairer=None,
+                         ingredients=None):
+    """Classify, reply and update the order with one structured model call."""
+    started = time.perf_counter()
+    if on_delta is not None:
+        output_text = _stream_single_call(messages, on_delta)
+    else:
+        response = client.responses.create(
+            model="gpt-4o",
+            input=messages,
+            text=load_turn_schema()
+        )
+        record_usage(response.usage)
+        output_text = response.output_text
+    llm_seconds = time.perf_counter() - started
+    
+    turn = json.loads(output_text)
+    message_to_user = turn.get("message", "")
+    is_order = turn.get("is_order", False)
+    is_valid = turn.get("is_valid", False)
+    is_new_order = turn.get("is_new_order", False)
+    
+    result = {
+        "message": message_to_user,
+        "is_order": is_order,
+        "is_valid": is_valid,
+        "is_new_order": is_new_order,
+        "updated_order": current_order,
+        "reply": message_to_user,   # The AI's answer, for the conversation history
+        "timings": {"llm_calls": 1, "llm_seconds": llm_seconds}
+    }
+    
+    # Process order if needed
+    changes = None
+    if is_order and is_valid and (turn.get("order_changes") or is_new_order):
+        try:
+            changes = turn_changes(turn.get("order_changes"))
+            apply_order_changes(result, changes, menu_items, session_id, is_new_order, order_repairer, ingredients)
+        except Exception as e:
+            print(f"Error processing order: {e}")
+            result["message"] += "\n\nI apologize, but there was an error processing your order. Please try again."
+            result["turn"] = None
+            return result
+    
+    result["turn"] = cached_turn(message_to_user, message_to_user, result, changes)
+    return result
+
+def _stream_two_stage_reply(messages, on_delta):
+    """Stream the first-stage completion, passing the reply after its JSON header line to on_delta."""
+    reply = SeparatorStream("\n\n")
+    output = []
+    stream = client.chat.completions.create(
+        model="gpt-4o",
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    for chunk in stream:
+        # The final chunk carries the call's usage and no choices
+        if getattr(chunk, "usage", None) is not None:
+            record_usage(chunk.usage)
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        output.append(chunk.choices[0].delta.content)
+        on_delta(reply.feed(chunk.choices[0].delta.content))
+    return "".join(output)
+
+def _process_two_stage(messages, menu_items, current_order, session_id, on_delta=None, order_repairer=None,
+                       ingredients=None):
+    """Classify and reply with one model call, then make the order changes with a second."""
+    started = time.perf_counter()
+    # Generate completion with the windowed conversation
+    if on_delta is not None:
+        full_response = _stream_two_stage_reply(messages, on_delta)
+    else:
+        completion = client.chat.completions.create(
+            model="gpt-4o",
+            messages=messages
+        )
+        record_usage(completion.usage)
+        full_response = completion.choices[0].message.content
+    llm_seconds = time.perf_counter() - started
+
+    try:
+        json_str, _, conversation = full_response.partition('\n\n')
+        evaluation = json.loads(json_str)
+        message_to_user = conversation
+        
+        is_order = evaluation.get("is_order", False)
+        is_valid = evaluation.get("is_valid", False)
+        is_new_order = evaluation.get("is_new_order", False)
+    except:
+        # If parsing fails, treat it as a normal text message
+        message_to_user = full_response
+        is_order = False
+        is_valid = False
+        is_new_order = False
+    
+    result = {
+        "message": message_to_user,
+        "is_order": is_order,
+        "is_valid": is_valid,
+        "is_new_order": is_new_order,
+        "updated_order": current_order,
+        "reply": full_response,     # The AI's answer, for the conversation history
+        "timings": {"llm_calls": 1, "llm_seconds": llm_seconds}
+    }
+
+    # If this is a new order, the changes apply to an empty order
+    if is_new_order:
+        current_order = empty_order()
+        messages[-2] = prompt_window.order_message(current_order)
+
+    # The first stage's prompt and reply, then the order-building instructions
+    client_input = list(messages)
+    client_input.append({"role": "assistant", "content": full_response})
+    client_input.append({"role": "system", "content": ORDER_BUILDER_INSTRUCTIONS})
+    
+    # Process order if needed
+    changes = None
+    if is_order and is_valid:
+        try:
+            # Make a second call for the order changes, as tool calls executed locally
+            started = time.perf_counter()
+            order_response = client.responses.create(
+                model="gpt-4o",
+                input=client_input,
+                tools=ORDER_TOOLS,
+                tool_choice="required",
+                parallel_tool_calls=True
+            )
+            record_usage(order_response.usage)
+            result["timings"]["llm_calls"] += 1
+            result["timings"]["llm_seconds"] += time.perf_counter() - started
+            
+            changes = function_calls(order_response.output)
+            apply_order_changes(result, changes, menu_items, session_id, is_new_order, order_repairer, ingredients)
+            
+        except Exception as e:
+            print(f"Error processing order: {e}")
+            result["message"] += "\n\nI apologize, but there was an error processing your order. Please try again."
+            result["turn"] = None
+            return result
+    
+    result["turn"] = cached_turn(full_response, message_to_user, result, changes)
+    return result
+
+def reset_conversation_history(session_id=DEFAULT_SESSION_ID):
+    """Reset the conversation history for a session."""
+    conversation_store.reset(session_id)
@@ -0,0 +1,240 @@
+"""
+Local repair of the order changes the agent makes.
+
+The model sometimes names an item by an ID that is not on the menu, mangles
+a size variant ("SIDE001-large", "side001-M", a bare "SIDE001") or leaves
+ingredient IDs in the notes. Rather than rejecting the change and making
+the customer repeat themselves, which costs another full LLM turn, the
+repairer maps such output onto the menu when it can do so unambiguously,
+and counts every intervention. Anything it cannot place with confidence is
+left unrepaired, so the change is rejected and the model asks the customer.
+"""
+import re
+import threading
+
+from local_parser import ITEM_ALIASES, SIZE_WORDS, ItemGroup, NormalizedWords, base_name, normalize
+from menu_search import trigrams
+
+# Lowest trigram similarity between a name and a menu item name or alias accepted as naming it.
+# This is the plain Dice coefficient, without the search index's prefix bonuses.
+MIN_NAME_SIMILARITY = 0.8
+
+# How far the best matching item must lead the best match for any other item
+MIN_NAME_MARGIN = 0.1
+
+# Size suffixes seen in model output, as size codes
+SIZE_SUFFIXES = dict(SIZE_WORDS, s="s", m="m", l="l", xl="xl", sm="s", med="m", reg="m", lg="l", xlarge="xl")
+
+# Menu item ID, optionally followed by a size suffix: "SIDE001", "SIDE001-l", "side001 (Large)"
+ITEM_ID = re.compile(r"^([A-Za-z]+\d+)(?:[\s_-]*\(?\s*([A-Za-z][A-Za-z -]*?)\s*\)?)?$")
+
+REPAIR_KINDS = ("size", "closest_name", "line_reference", "notes")
+
+
+def spoken_size(words):
+    """Return (size code, piece count) said in a list of normalized words."""
+    size = None
+    pieces = None
+    for index, word in enumerate(words):
+        if word == "extra" and index + 1 < len(words) and words[index + 1] == "large":
+            size = "xl"
+        elif word in SIZE_WORDS and size is None:
+            size = SIZE_WORDS[word]
+        elif word.isdigit() and index + 1 < len(words) and words[index + 1] in ("pc", "piece"):
+            pieces = int(word)
+    return size, pieces
+
+
+def without_size(words):
+    """Return normalized words with size and piece-count words left out."""
+    kept = []
+    for index, word in enumerate(words):
+        if word in SIZE_WORDS or word in ("extra", "pc", "piece"):
+            continue
+        if word.isdigit() and index + 1 < len(words) and words[index + 1] in ("pc", "piece"):
+            continue
+        kept.append(word)
+    return kept
+
+
+def substitution_notice(repaired):
+    """
+    Return the sentence telling the customer which items were substituted, or "".
+
+    Only substitutions of something the customer could have said are mentioned;
+    a corrected ID for the item they named is not news to them.
+    """
+    noticed = [(asked, used) for asked, used in repaired
+               if isinstance(asked, str) and not ITEM_ID.match(asked.strip()) and normalize(asked) != normalize(used)]
+    if not noticed:
+        return ""
+    return "Please check your order: " + "; ".join(f'I took "{asked}" to mean {used}' for asked, used in noticed) + "."
+
+
+class OrderRepairer:
+    """
+    Maps the agent's item references and notes onto the menu.
+
+    Unknown IDs are repaired in two steps: a recognisable base ID with a
+    mangled or missing size suffix is normalized to the right size variant,
+    and otherwise the item name the agent gave is matched against menu item
+    names and aliases. A name match must be close on its own, without the
+    search ranking bonuses, and clearly ahead of every other item; a sized
+    or piece-count item must resolve to exactly one variant. Ingredient IDs
+    left in notes are replaced with their names.
+    """
+
+    def __init__(self, menu_items, normalized=None):
+        """
+        Args:
+            menu_items (dict or list): Menu items, as Menu.items or Menu.get_items()
+            normalized (NormalizedWords, optional): The menu's normalized names, shared with its other indexes
+        """
+        if isinstance(menu_items, dict):
+            menu_items = list(menu_items.values())
+        if normalized is None:
+            normalized = NormalizedWords()
+
+        self.items_by_id = {item.id: item for item in menu_items}
+        self._groups = {}  # Upper-cased base ID -> ItemGroup of its size variants
+        for item in menu_items:
+            if item.category in ("toppings", "condiments", "patties"):
+                continue
+            base_id, _, size_code = item.id.partition("-")
+            group = self._groups.setdefault(base_id.upper(), ItemGroup(base_id))
+            group.variants[size_code] = item
+            pieces = re.search(r"\((\d+)\s*pc\)", item.name)
+            if pieces:
+                group.by_pieces[int(pieces.group(1))] = item
+
+        names = {}  # Normalized base name or alias -> upper-cased base ID
+        for key, group in self._groups.items():
+            for item in group.variants.values():
+                names.setdefault(" ".join(normalized[base_name(item.name)]), key)
+        for alias, target in ITEM_ALIASES.items():
+            target_key = names.get(" ".join(normalized[target]))
+            if target_key is not None:
+                names.setdefault(" ".join(normalized[alias]), target_key)
+        self._names = [(trigrams(text.split()), key) for text, key in names.items() if text]
+
+        ids = sorted(self.items_by_id, key=len, reverse=True)
+        self._id_pattern = re.compile(r"\b(" + "|".join(map(re.escape, ids)) + r")\b",
+                                      re.IGNORECASE) if ids else None
+        self._ids_by_upper = {item_id.upper(): item_id for item_id in ids}
+
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.repaired = dict.fromkeys(REPAIR_KINDS, 0)
+        self.unrepaired = 0
+
+    def _record(self, kind):
+        with self._lock:
+            if kind is None:
+                self.unrepaired += 1
+            else:
+                self.repaired[kind] += 1
+
+    def check(self):
+        """Count one order change passing through the repairer."""
+        with self._lock:
+            self.checked += 1
+
+    def resolve_item(self, item_id, name=None):
+        """
+        Return the menu item an agent reference means, or None when it cannot be told for sure.
+
+        Args:
+            item_id (str): Item ID the agent gave
+            name (str, optional): Item name the agent gave, used as a hint
+        """
+        item = self.items_by_id.get(item_id)
+        if item is not None:
+            return item
+
+        item = self._normalize_size(item_id, name)
+        if item is not None:
+            self._record("size")
+            return item
+
+        query = name or item_id
+        item = self._match_name(query) if isinstance(query, str) else None
+        self._record("closest_name" if item is not None else None)
+        return item
+
+    def _normalize_size(self, item_id, name):
+        if not isinstance(item_id, str):
+            return None
+        match = ITEM_ID.match(item_id.strip())
+        if not match:
+            return None
+        group = self._groups.get(match.group(1).upper())
+        if group is None:
+            return None
+        suffix = (match.group(2) or "").lower().replace("-", " ").strip()
+        size, pieces = spoken_size(normalize(name or ""))
+        if suffix:
+            size = SIZE_SUFFIXES.get(suffix)
+            if size is None:
+                return None
+        return self._variant(group, size, pieces)
+
+    @staticmethod
+    def _variant(group, size, pieces):
+        """Return the one item of group that size and pieces name, or None if they don't name exactly one."""
+        if len(group.variants) == 1 and not group.by_pieces:
+            return next(iter(group.variants.values()))
+        return group.resolve(size, pieces)
+
+    def _match_name(self, name):
+        words = normalize(name)
+        best_score, best_key = 0.0, None
+        for candidate in (words, without_size(words)):
+            if not candidate:
+                continue
+            grams = trigrams(candidate)
+            scores = {}  # Base ID -> best similarity of its names
+            for entry_grams, key in self._names:
+                score = 2 * len(grams & entry_grams) / (len(grams) + len(entry_grams))
+                if score > scores.get(key, 0.0):
+                    scores[key] = score
+            ranked = sorted(scores.items(), key=lambda pair: -pair[1])
+            if not ranked or ranked[0][1] < MIN_NAME_SIMILARITY:
+                continue
+            if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < MIN_NAME_MARGIN:
+                continue
+            if ranked[0][1] > best_score:
+                best_key, best_score = ranked[0]
+        if best_key is None:
+            return None
+        return self._variant(self._groups[best_key], *spoken_size(words))
+
+    def resolve_line(self, cart, reference):
+        """Return the cart line key an agent reference to a line in the order means, or None."""
+        item = None
+        if isinstance(reference, str):
+            item = self.items_by_id.get(reference) or self._normalize_size(reference, None) or \
+                self._match_name(reference)
+        key = cart.find_key(item.id) if item is not None else None
+        self._record("line_reference" if key is not None else None)
+        return key
+
+    def repair_notes(self, notes):
+        """Replace menu item IDs left in notes with the items' names."""
+        if not notes or self._id_pattern is None:
+            return notes
+        repaired = self._id_pattern.sub(
+            lambda match: self.items_by_id[self._ids_by_upper[match.group(1).upper()]].name, notes)
+        if repaired != notes:
+            self._record("notes")
+        return repaired
+
+    def stats(self):
+        with self._lock:
+            interventions = sum(self.repaired.values())
+            return {
+                "changes_checked": self.checked,
+                "interventions": interventions,
+                "by_kind": dict(self.repaired),
+                "unrepaired": self.unrepaired,
+                "intervention_rate": interventions / self.checked if self.checked else 0
+            }
@@ -0,0 +1,454 @@
+import glob
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from shopping_cart import ShoppingCart
+
+
+def empty_order():
+    """Return a fresh empty order document."""
+    return {"menuItems": [], "total": 0.0}
+
+
+class OrderStore:
+    """
+    Base class for order storage backends.
+
+    Orders are keyed by session ID so every kiosk gets its own ShoppingCart.
+    Each session also gets its own lock; every mutation goes through
+    apply() under that lock, and callers that need to read the result of a
+    mutation wrap both in `with store.lock(session_id):` so concurrent
+    requests from the same kiosk cannot interleave, while other kiosks are
+    never blocked.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def lock(self, session_id):
+        """Return the re-entrant lock guarding a single session's order."""
+        session_lock = self._locks.get(session_id)
+        if session_lock is None:
+            with self._locks_guard:
+                session_lock = self._locks.setdefault(session_id, threading.RLock())
+        return session_lock
+
+    def cart(self, session_id):
+        """Return the ShoppingCart for a session, for reading; a session without one gets an empty cart."""
+        raise NotImplementedError
+
+    def _writable_cart(self, session_id):
+        """Return the ShoppingCart an operation on a session mutates. Caller holds the session lock."""
+        return self.cart(session_id)
+
+    def _persist(self, session_id, cart):
+        """Make a mutated cart durable. Caller holds the session lock."""
+        pass
+
+    def load(self, session_id):
+        """Return a session's order as an order document."""
+        with self.lock(session_id):
+            return self.cart(session_id).to_order()
+
+    def save(self, session_id, order):
+        """Replace a session's order with a complete order document."""
+        self.apply(session_id, {"op": "replace", "order": order})
+
+    def apply(self, session_id, op):
+        """Apply one cart operation (see ShoppingCart.apply) to a session's cart."""
+        with self.lock(session_id):
+            cart = self._writable_cart(session_id)
+            result = cart.apply(op)
+            self._persist(session_id, cart)
+            return result
+
+    def clear(self, session_id):
+        """Empty a session's cart and return the empty order."""
+        with self.lock(session_id):
+            self.apply(session_id, {"op": "clear"})
+            return self.load(session_id)
+
+    def discard(self, session_id):
+        """Forget a session entirely."""
+        with self._locks_guard:
+            self._locks.pop(session_id, None)
+
+    def session_count(self):
+        raise NotImplementedError
+
+
+class InMemoryOrderStore(OrderStore):
+    """
+    Keeps every session's cart in process memory. No disk I/O.
+
+    Reading a session that has no cart gives a transient empty cart; a cart
+    is only stored once an operation is applied to it, so page views and
+    polls from kiosks that never order hold no memory. Stored carts are kept
+    in least-recently-used order, and a cart is evicted once it has been
+    idle for longer than ttl_seconds, or when more than max_sessions are
+    resident.
+
+    Args:
+        max_sessions (int): Maximum number of stored carts
+        ttl_seconds (float): Idle time after which a cart is forgotten
+    """
+
+    def __init__(self, max_sessions=10000, ttl_seconds=86400):
+        super().__init__()
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._carts = OrderedDict()  # Session ID -> ShoppingCart, least recently used first
+        self._last_used = {}         # Session ID -> time its cart was last read or changed
+        self._carts_lock = threading.Lock()
+        self.evictions = 0
+
+    def cart(self, session_id):
+        with self._carts_lock:
+            cart = self._carts.get(session_id)
+            if cart is not None:
+                self._carts.move_to_end(session_id)
+                self._last_used[session_id] = time.time()
+        return cart if cart is not None else ShoppingCart(session_id)
+
+    def _writable_cart(self, session_id):
+        with self._carts_lock:
+            cart = self._carts.get(session_id)
+            if cart is None:
+                cart = self._carts[session_id] = ShoppingCart(session_id)
+            else:
+                self._carts.move_to_end(session_id)
+            self._last_used[session_id] = time.time()
+            evicted = self._evict_locked()
+        for evicted_id in evicted:
+            self._evicted(evicted_id)
+        return cart
+
+    def _evict_locked(self):
+        """Drop expired and excess carts and return their session IDs. Caller holds the carts lock."""
+        evicted = []
+        cutoff = time.time() - self.ttl_seconds
+        while self._carts:
+            session_id = next(iter(self._carts))
+            if len(self._carts) <= self.max_sessions and self._last_used[session_id] >= cutoff:
+                break
+            del self._carts[session_id]
+            del self._last_used[session_id]
+            evicted.append(session_id)
+        self.evictions += len(evicted)
+        return evicted
+
+    def _evicted(self, session_id):
+        """Called after a session's cart was evicted."""
+        OrderStore.discard(self, session_id)
+
+    def _drop(self, session_id):
+        with self._carts_lock:
+            self._carts.pop(session_id, None)
+            self._last_used.pop(session_id, None)
+
+    def discard(self, session_id):
+        with self.lock(session_id):
+            self._drop(session_id)
+        super().discard(session_id)
+
+    def session_count(self):
+        return len(self._carts)
+
+
+class FileOrderStore(OrderStore):
+    """
+    Stores each session's order as its own JSON file.
+
+    Writes go to a temporary file that is then renamed over the old one, so a
+    crash mid-write never leaves a torn order behind.
+    """
+
+    def __init__(self, directory="orders"):
+        super().__init__()
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, session_id):
+        safe_id = "".join(c for c in str(session_id) if c.isalnum() or c in "-_")
+        return os.path.join(self.directory, f"{safe_id or 'default'}.json")
+
+    def cart(self, session_id):
+        try:
+            with open(self._path(session_id), "r", encoding='utf-8') as file:
+                return ShoppingCart.from_order(json.load(file), session_id)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return ShoppingCart(session_id)
+
+    def _persist(self, session_id, cart):
+        path = self._path(session_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding='utf-8') as file:
+            json.dump(cart.to_order(), file)
+        os.replace(tmp_path, path)
+
+    def discard(self, session_id):
+        with self.lock(session_id):
+            try:
+                os.remove(self._path(session_id))
+            except FileNotFoundError:
+                pass
+        super().discard(session_id)
+
+    def session_count(self):
+        return sum(1 for name in os.listdir(self.directory) if name.endswith(".json"))
+
+
+class JournalOrderStore(InMemoryOrderStore):
+    """
+    In-memory store backed by an append-only write-ahead journal.
+
+    Every mutation is appended to the journal as one small JSON line, so the
+    cost of a click no longer depends on the size of the cart. A background
+    thread fsyncs pending records and periodically compacts the journal into
+    a snapshot; at startup the snapshot is loaded and only the journal
+    records written after it are replayed.
+
+    Args:
+        directory (str): Where the snapshot and journal segments live
+        fsync_batch (int): fsync after this many records (0 leaves it to the
+                           background flush)
+        flush_interval (float): Seconds between background fsyncs/compaction checks
+        compact_threshold (int): Records since the last snapshot that trigger compaction
+        **options: Cart eviction limits, as for InMemoryOrderStore; an evicted
+                   cart is journaled as discarded so a restart does not bring it back
+    """
+
+    SNAPSHOT_NAME = "snapshot.json"
+
+    def __init__(self, directory="order_journal", fsync_batch=1, flush_interval=1.0,
+                 compact_threshold=1000, **options):
+        super().__init__(**options)
+        self.directory = directory
+        self.fsync_batch = fsync_batch
+        self.flush_interval = flush_interval
+        self.compact_threshold = compact_threshold
+
+        self._journal_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._seq = 0
+        self._pending_sync = 0
+        self._records_since_snapshot = 0
+        self._segment = None
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._replay()
+        self._open_segment()
+
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._background_loop, daemon=True)
+        self._worker.start()
+
+    # Journal files
+
+    def _snapshot_path(self):
+        return os.path.join(self.directory, self.SNAPSHOT_NAME)
+
+    def _segment_paths(self):
+        return sorted(glob.glob(os.path.join(self.directory, "journal-*.log")))
+
+    def _next_segment_path(self):
+        return os.path.join(self.directory, f"journal-{self._seq + 1:012d}.log")
+
+    def _open_segment(self):
+        self._segment = open(self._next_segment_path(), "a", encoding='utf-8')
+
+    def _replay(self):
+        """Rebuild in-memory orders from the latest snapshot plus newer journal records."""
+        snapshot_seq = 0
+        try:
+            with open(self._snapshot_path(), "r", encoding='utf-8') as file:
+                snapshot = json.load(file)
+            snapshot_seq = snapshot["seq"]
+            now = time.time()
+            for session_id, order in snapshot["orders"].items():
+                self._carts[session_id] = ShoppingCart.from_order(order, session_id)
+                self._last_used[session_id] = now
+        except FileNotFoundError:
+            pass
+        self._seq = snapshot_seq
+
+        for path in self._segment_paths():
+            with open(path, "r+b") as file:
+                offset = 0
+                line = b""
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        # A torn final record from a crash mid-append was never acknowledged,
+                        # so cut it off rather than letting new records follow it
+                        print(f"Warning: Truncating torn journal record in {path}")
+                        file.truncate(offset)
+                        line = b""
+                        break
+                    offset += len(line)
+                    if record["seq"] <= snapshot_seq:
+                        continue
+                    self._replay_record(record)
+                    self._seq = record["seq"]
+                    self._records_since_snapshot += 1
+                if line and not line.endswith(b"\n"):
+                    # A complete final record whose newline was lost; end it so the next
+                    # record appended does not run into it
+                    file.seek(offset)
+                    file.write(b"\n")
+
+    def _replay_record(self, record):
+        session_id, op = record["session"], record["op"]
+        if op["op"] == "discard":
+            self._drop(session_id)
+            return
+        try:
+            # Stored without evicting; the first write after startup trims back to the limits
+            cart = self._carts.get(session_id)
+            if cart is None:
+                cart = self._carts[session_id] = ShoppingCart(session_id)
+            else:
+                self._carts.move_to_end(session_id)
+            self._last_used[session_id] = time.time()
+            cart.apply(op)
+        except (KeyError, ValueError) as e:
+            print(f"Warning: Skipping journal record {record['seq']}: {e}")
+
+    def _append(self, session_id, op):
+        """Append one record to the journal. Caller holds the journal lock."""
+        self._seq += 1
+        record = {"seq": self._seq, "session": session_id, "op": op}
+        self._segment.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._segment.flush()
+        self._pending_sync += 1
+        self._records_since_snapshot += 1
+        if self.fsync_batch and self._pending_sync >= self.fsync_batch:
+            self._sync_locked()
+
+    def _sync_locked(self):
+        if self._pending_sync:
+            os.fsync(self._segment.fileno())
+            self._pending_sync = 0
+
+    # Store interface
+
+    def apply(self, session_id, op):
+        with self.lock(session_id), self._journal_lock:
+            # Applying first means a rejected operation is never journaled
+            result = self._writable_cart(session_id).apply(op)
+            self._append(session_id, op)
+            return result
+
+    def _evicted(self, session_id):
+        # Called from apply(), which holds the journal lock
+        self._append(session_id, {"op": "discard"})
+        super()._evicted(session_id)
+
+    def discard(self, session_id):
+        with self.lock(session_id), self._journal_lock:
+            self._drop(session_id)
+            self._append(session_id, {"op": "discard"})
+        OrderStore.discard(self, session_id)
+
+    # Maintenance
+
+    def flush(self):
+        """fsync any journal records written since the last sync."""
+        with self._journal_lock:
+            self._sync_locked()
+
+    def compact(self):
+        """Write a snapshot of all orders and delete the journal segments it covers."""
+        with self._compact_lock:
+            with self._journal_lock:
+                self._sync_locked()
+                with self._carts_lock:
+                    carts = list(self._carts.items())
+                snapshot = json.dumps({
+                    "seq": self._seq,
+                    "orders": {session_id: cart.to_order() for session_id, cart in carts}
+                })
+                # The current segment is only reused when nothing was written to it
+                next_path = self._next_segment_path()
+                covered_segments = [path for path in self._segment_paths() if path != next_path]
+                if self._segment.name != next_path:
+                    self._segment.close()
+                    self._open_segment()
+                self._records_since_snapshot = 0
+
+            tmp_path = f"{self._snapshot_path()}.tmp"
+            with open(tmp_path, "w", encoding='utf-8') as file:
+                file.write(snapshot)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self._snapshot_path())
+
+            for path in covered_segments:
+                os.remove(path)
+
+    def _background_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                if self.compact_threshold and self._records_since_snapshot >= self.compact_threshold:
+                    self.compact()
+            except Exception as e:
+                print(f"Error in order journal maintenance: {e}")
+
+    def close(self):
+        """Stop background maintenance and flush the journal to disk."""
+        self._stop.set()
+        self._worker.join()
+        with self._journal_lock:
+            self._sync_locked()
+            self._segment.close()
+
+
+ORDER_STORE_BACKENDS = {
+    "memory": InMemoryOrderStore,
+    "file": FileOrderStore,
+    "journal": JournalOrderStore,
+}
+
+
+# Environment variables configuring each backend: name -> (option, type)
+ORDER_STORE_SETTINGS = {
+    "memory": {
+        "ORDER_STORE_MAX_SESSIONS": ("max_sessions", int),
+        "ORDER_STORE_TTL": ("ttl_seconds", float),
+    },
+    "file": {
+        "ORDER_STORE_DIR": ("directory", str),
+    },
+    "journal": {
+        "ORDER_STORE_MAX_SESSIONS": ("max_sessions", int),
+        "ORDER_STORE_TTL": ("ttl_seconds", float),
+        "ORDER_JOURNAL_DIR": ("directory", str),
+        "ORDER_JOURNAL_FSYNC_BATCH": ("fsync_batch", int),
+        "ORDER_JOURNAL_FLUSH_INTERVAL": ("flush_interval", float),
+        "ORDER_JOURNAL_COMPACT_THRESHOLD": ("compact_threshold", int),
+    },
+}
+
+
+def create_order_store(backend=None, **options):
+    """
+    Create an order store.
+
+    The backend defaults to the ORDER_STORE_BACKEND environment variable,
+    falling back to the in-memory store. Options not given are read from the
+    backend's environment variables (see ORDER_STORE_SETTINGS) when set.
+    """
+    backend = backend or os.environ.get("ORDER_STORE_BACKEND", "memory")
+    if backend not in ORDER_STORE_BACKENDS:
+        raise ValueError(f"Unknown order store backend '{backend}'. "
+                         f"Choose one of: {', '.join(ORDER_STORE_BACKENDS)}")
+    for variable, (option, convert) in ORDER_STORE_SETTINGS[backend].items():
+        if variable in os.environ:
+            options.setdefault(option, convert(os.environ[variable]))
+    return ORDER_STORE_BACKENDS[backend](**options)
@@ -0,0 +1,279 @@
+"""
+Order changes the agent makes through tool calls.
+
+Instead of regenerating the complete order every turn, the model describes
+only what changed, as calls to the tools below. The calls are validated
+against the menu and the session's cart and turned into cart operations, so
+prices always come from the menu and the model's output stays the same size
+however large the order grows.
+"""
+import json
+import re
+
+from local_parser import ADD_WORDS, INGREDIENT_ALIASES, REMOVE_WORDS, NormalizedWords, normalize
+from shopping_cart import ShoppingCart, customized_line
+
+# Most units a single call may add or set
+MAX_QUANTITY = 99
+
+# Categories whose items are ingredients that notes can add or remove
+INGREDIENT_CATEGORIES = ("toppings", "condiments", "patties")
+
+# Modifier at the start of a part of the notes: "Removed:", "no", "extra", ...
+NOTE_MODIFIER = re.compile(r"^(removed|" + "|".join(sorted((re.escape(word) for word in REMOVE_WORDS + ADD_WORDS),
+                                                      key=len, reverse=True)) + r")\b\s*:?\s*", re.IGNORECASE)
+
+
+def _function(name, description, properties):
+    return {
+        "type": "function",
+        "name": name,
+        "description": description,
+        "parameters": {
+            "type": "object",
+            "properties": properties,
+            "required": list(properties),
+            "additionalProperties": False
+        },
+        "strict": True
+    }
+
+
+ITEM_REFERENCE = {"type": "string",
+                  "description": "Menu item ID of a line already in the order, or the line's key"}
+
+# Function tools in the Responses API format
+ORDER_TOOLS = [
+    _function("add_item", "Add units of a menu item to the order.", {
+        "item_id": {"type": "string", "description": "Menu item ID, exactly as it appears in the menu"},
+        "name": {"type": "string", "description": "Menu item name, exactly as it appears in the menu"},
+        "quantity": {"type": "integer", "description": "Units to add"},
+        "notes": {"type": "string", "description": "Customizations, empty when the item is not customized"}
+    }),
+    _function("remove_item", "Remove units of a line from the order.", {
+        "item_id": ITEM_REFERENCE,
+        "quantity": {"type": ["integer", "null"], "description": "Units to remove; null removes the whole line"}
+    }),
+    _function("set_quantity", "Set how many units of a line the order has.", {
+        "item_id": ITEM_REFERENCE,
+        "quantity": {"type": "integer", "description": "New number of units; 0 removes the line"}
+    }),
+    _function("set_notes", "Replace the customizations of a line in the order.", {
+        "item_id": ITEM_REFERENCE,
+        "notes": {"type": "string", "description": "New customizations, empty to remove them all"}
+    }),
+    _function("clear_order", "Remove every item from the order.", {}),
+]
+
+TOOL_NAMES = [tool["name"] for tool in ORDER_TOOLS]
+
+
+class OrderChangeError(ValueError):
+    """Raised for a tool call that cannot be applied to the order."""
+
+
+def function_calls(output):
+    """Return (name, arguments) for each function call in a Responses API output list."""
+    calls = []
+    for item in output or []:
+        if getattr(item, "type", None) == "function_call":
+            try:
+                arguments = json.loads(item.arguments or "{}")
+            except json.JSONDecodeError:
+                arguments = None
+            calls.append((item.name, arguments))
+    return calls
+
+
+def turn_changes(changes):
+    """Return (name, arguments) for each entry of a structured turn's "order_changes"."""
+    calls = []
+    for change in changes or []:
+        arguments = {key: value for key, value in change.items() if key != "tool" and value is not None}
+        calls.append((change.get("tool"), arguments))
+    return calls
+
+
+def _quantity(value, minimum):
+    if isinstance(value, bool) or not isinstance(value, int) or not minimum <= value <= MAX_QUANTITY:
+        raise OrderChangeError(f"invalid quantity {value!r}")
+    return value
+
+
+def _line_key(cart, reference, repairer=None, repaired=None):
+    if reference in cart.lines:
+        return reference
+    key = cart.find_key(reference)
+    if key is None and repairer is not None:
+        key = repairer.resolve_line(cart, reference)
+        if key is not None and repaired is not None:
+            repaired.append((reference, cart.lines[key].name))
+    if key is None:
+        raise OrderChangeError(f"{reference} is not in the order")
+    return key
+
+
+def ingredient_index(menu_items_by_id, normalized=None):
+    """
+    Return normalized ingredient name or alias -> MenuItem, for reading customizations in notes.
+
+    It depends only on the menu, so menus build it once with their other indexes.
+
+    Args:
+        menu_items_by_id (dict): Menu items by ID
+        normalized (NormalizedWords, optional): The menu's normalized names, shared with its other indexes
+    """
+    if normalized is None:
+        normalized = NormalizedWords()
+    index = {}
+    for item in menu_items_by_id.values():
+        if item.category in INGREDIENT_CATEGORIES:
+            index[" ".join(normalized[item.name])] = item
+    by_name = {item.name.lower(): item for item in index.values()}
+    for alias, target in INGREDIENT_ALIASES.items():
+        if target.lower() in by_name:
+            index.setdefault(" ".join(normalized[alias]), by_name[target.lower()])
+    return index
+
+
+def read_customizations(notes, ingredients):
+    """
+    Split notes into ingredients removed, ingredients added and any other requests.
+
+    Notes are read part by part ("Removed: Pickles, Onions; Added: Bacon",
+    "no pickles, extra cheese"); a modifier applies to the parts after it
+    until the next one. Parts that are not a modifier plus a menu ingredient
+    are kept as they were written.
+
+    Returns:
+        tuple: (removed, added, other) lists of MenuItems, MenuItems and strings
+    """
+    removed, added, other = [], [], []
+    for clause in re.split(r"[;\n]", notes or ""):
+        mode = None
+        for part in re.split(r",|\band\b", clause):
+            text = part.strip()
+            if not text:
+                continue
+            match = NOTE_MODIFIER.match(text)
+            if match:
+                word = match.group(1).lower()
+                mode = "remove" if word == "removed" or word in REMOVE_WORDS else "add"
+            ingredient = ingredients.get(" ".join(normalize(text[match.end():] if match else text)))
+            if ingredient is None or mode is None:
+                other.append(text)
+            elif mode == "remove":
+                removed.append(ingredient)
+            else:
+                added.append(ingredient)
+    return removed, added, other
+
+
+def _line_op(item, quantity, notes, ingredients):
+    """Return the cart operation adding item with notes, charging for added ingredients."""
+    if not notes:
+        return {"op": "add", "line": {"id": item.id, "name": item.name, "price": item.price, "quantity": quantity}}
+    removed, added, other = read_customizations(notes, ingredients)
+    return {"op": "customize", "line": customized_line(item, removed, added, quantity, extra_notes=other)}
+
+
+def change_ops(cart, menu_items_by_id, name, arguments, describe_notes=None, repairer=None, ingredients=None,
+               repaired=None):
+    """
+    Translate one tool call into cart operations against cart.
+
+    Args:
+        cart (ShoppingCart): The order the call applies to
+        menu_items_by_id (dict): Menu item ID -> MenuItem, for validation and prices
+        name (str): Tool name
+        arguments (dict): Tool arguments
+        describe_notes (callable, optional): Rewrites notes for display (e.g. ingredient IDs to names)
+        repairer (OrderRepairer, optional): Maps unknown IDs and stray IDs in notes onto the menu
+        ingredients (dict, optional): ingredient_index of the menu, built when not given
+        repaired (list, optional): Receives (what the agent asked for, what was used instead)
+                                   for every reference the repairer substituted
+
+    Raises OrderChangeError if the call names an unknown tool, an item that is
+    not on the menu or a line that is not in the order.
+    """
+    if not isinstance(arguments, dict):
+        raise OrderChangeError(f"{name} has unreadable arguments")
+    if ingredients is None:
+        ingredients = ingredient_index(menu_items_by_id)
+
+    def describe(notes):
+        notes = describe_notes(notes) if describe_notes else notes
+        return repairer.repair_notes(notes) if repairer is not None else notes
+
+    if name == "add_item":
+        item = menu_items_by_id.get(arguments.get("item_id"))
+        if item is None and repairer is not None:
+            item = repairer.resolve_item(arguments.get("item_id"), arguments.get("name"))
+            if item is not None and repaired is not None:
+                repaired.append((arguments.get("name") or arguments.get("item_id"), item.name))
+        if item is None:
+            raise OrderChangeError(f"{arguments.get('item_id')} is not on the menu")
+        quantity = _quantity(arguments.get("quantity", 1), 1)
+        return [_line_op(item, quantity, describe(arguments.get("notes") or ""), ingredients)]
+
+    if name == "remove_item":
+        key = _line_key(cart, arguments.get("item_id"), repairer, repaired)
+        quantity = arguments.get("quantity")
+        if quantity is None or _quantity(quantity, 1) >= cart.lines[key].quantity:
+            return [{"op": "remove", "key": key}]
+        return [{"op": "set_quantity", "key": key, "quantity": cart.lines[key].quantity - quantity}]
+
+    if name == "set_quantity":
+        key = _line_key(cart, arguments.get("item_id"), repairer, repaired)
+        return [{"op": "set_quantity", "key": key, "quantity": _quantity(arguments.get("quantity"), 0)}]
+
+    if name == "set_notes":
+        key = _line_key(cart, arguments.get("item_id"), repairer, repaired)
+        line = cart.lines[key]
+        item = menu_items_by_id.get(line.id)
+        if item is None:
+            raise OrderChangeError(f"{line.id} is no longer on the menu")
+        notes = describe(arguments.get("notes") or "")
+        # Notes are part of a line's identity, so the line is replaced and priced again
+        return [{"op": "remove", "key": key}, _line_op(item, line.quantity, notes, ingredients)]
+
+    if name == "clear_order":
+        return [{"op": "clear"}]
+
+    raise OrderChangeError(f"unknown tool {name!r}")
+
+
+def plan_order_changes(calls, menu_items_by_id, current_order, describe_notes=None, repairer=None, ingredients=None):
+    """
+    Validate tool calls in order and return the cart operations they amount to.
+
+    Each call is checked against the order as the calls before it leave it, so
+    a call may refer to a line an earlier call added. Calls that cannot be
+    applied, even after repair when a repairer is given, are skipped.
+    ingredients is the menu's ingredient_index, built when not given.
+
+    Returns:
+        tuple: (ops, rejected, repaired) where ops is a list of cart operations,
+               rejected lists "tool: reason" for each skipped call and repaired
+               lists (asked for, used instead) for each substitution the repairer made
+    """
+    cart = ShoppingCart.from_order(current_order)
+    if ingredients is None:
+        ingredients = ingredient_index(menu_items_by_id)
+    ops = []
+    rejected = []
+    repaired = []
+    for name, arguments in calls:
+        if repairer is not None:
+            repairer.check()
+        call_repaired = []
+        try:
+            call_ops = change_ops(cart, menu_items_by_id, name, arguments, describe_notes, repairer, ingredients,
+                                  call_repaired)
+            cart.apply({"op": "batch", "ops": call_ops})
+        except (OrderChangeError, KeyError) as e:
+            rejected.append(f"{name}: {e}")
+            continue
+        ops.extend(call_ops)
+        repaired.extend(call_repaired)
+    return ops, rejected, repaired
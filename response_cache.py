@@ -0,0 +1,109 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from local_parser import normalize
+
+
+def order_fingerprint(order):
+    """Return a hash of an order's contents that ignores line order and formatting."""
+    lines = sorted(
+        (line["id"], line.get("quantity", 1), line.get("notes", "") or "", line.get("price", 0))
+        for line in order.get("menuItems", order.get("items", []))
+    )
+    return hashlib.sha1(json.dumps(lines).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache of agent turns for utterances the kiosk sees over and over.
+
+    A turn is keyed on the normalized user message, a fingerprint of the
+    session's current order, the menu version and any extra context the
+    caller supplies (such as the question the assistant just asked and the
+    summary of older turns), so a cached turn is only reused where it would
+    have been produced anyway.
+    Entries expire after ttl_seconds, the least recently used entry is
+    evicted beyond max_entries, and a scope's entries (one scope per store
+    menu) are dropped when that scope's menu version changes.
+
+    Args:
+        max_entries (int): Maximum number of cached turns
+        ttl_seconds (float): Age after which a cached turn is no longer used
+    """
+
+    def __init__(self, max_entries=1000, ttl_seconds=900):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries = OrderedDict()  # Key -> (stored_at, scope, turn), least recently used first
+        self._lock = threading.Lock()
+        self._menu_versions = {}       # Scope -> menu version its entries were cached for
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(message, current_order, menu_version, *context):
+        parts = [" ".join(normalize(message)), order_fingerprint(current_order), str(menu_version)]
+        parts.extend(str(part) for part in context)
+        return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def invalidate(self, menu_version, scope=None):
+        """Drop a scope's entries if its menu version differs from the one they were cached for."""
+        with self._lock:
+            previous = self._menu_versions.get(scope)
+            if menu_version == previous:
+                return
+            self._menu_versions[scope] = menu_version
+            if previous is None:
+                return
+            stale = [key for key, entry in self._entries.items() if entry[1] == scope]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self.invalidations += 1
+
+    def get(self, key):
+        """Return a copy of a cached turn, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[2])
+
+    def put(self, key, turn, scope=None):
+        with self._lock:
+            self._entries[key] = (time.time(), scope, copy.deepcopy(turn))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "menu_versions": dict(self._menu_versions)
+            }
@@ -1,32 +1,243 @@
-from menu import MenuItem
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from menu import MenuItem
+
+
+def to_cents(price):
+    """Convert a dollar price to integer cents."""
+    return int(round(price * 100))
+
+
+def customized_line(base_item, removed=(), added=(), quantity=1, extra_notes=()):
+    """
+    Return the order line for a menu item with ingredients removed or added.
+
+    Every path that customizes an item (menu page, local parser, agent) builds
+    its line here, so added ingredients are always charged at their menu price.
+
+    Args:
+        base_item (MenuItem): Item being customized
+        removed (list): Ingredients removed, as MenuItems or names
+        added (list): Ingredients added, as MenuItems or names; names are not on the menu and cost nothing
+        quantity (int): Units on the line
+        extra_notes (list): Notes listed before the ingredient changes, such as the size
+    """
+    def name_of(ing):
+        return ing if isinstance(ing, str) else ing.name
+
+    notes = list(extra_notes)
+    if removed:
+        notes.append(f"Removed: {', '.join(name_of(ing) for ing in removed)}")
+    if added:
+        notes.append(f"Added: {', '.join(name_of(ing) for ing in added)}")
+    price_cents = to_cents(base_item.price) + sum(to_cents(ing.price) for ing in added if not isinstance(ing, str))
+    return {
+        "id": base_item.id,
+        "name": f"{base_item.name} (Customized)",
+        "price": price_cents / 100,
+        "quantity": quantity,
+        "notes": "; ".join(notes)
+    }
+
+
+class CartLine:
+    def __init__(self, key, id, name, price_cents, quantity=1, notes=""):
+        self.key = key                  # Unique key of this line within the cart
+        self.id = id                    # Menu item ID
+        self.name = name                # Display name
+        self.price_cents = price_cents  # Unit price in integer cents
+        self.quantity = quantity        # Number of units on this line
+        self.notes = notes              # Customizations, empty for plain items
+
+    def to_dict(self):
+        line = {
+            "key": self.key,
+            "id": self.id,
+            "name": self.name,
+            "price": self.price_cents / 100,
+            "quantity": self.quantity
+        }
+        if self.notes:
+            line["notes"] = self.notes
+        return line
+
 
 class ShoppingCart:
-    def __init__(self, name):
+    """
+    Cart engine used by every cart route and by the ordering agent.
+
+    Lines are indexed by line key, and the total is maintained incrementally
+    in integer cents, so adding, removing or changing the quantity of a line
+    costs the same no matter how large the order is. Plain items are keyed by
+    their menu ID; customized items are keyed by menu ID plus notes, so
+    identical customizations share a line.
+    """
+
+    def __init__(self, name="cart"):
         self.name = name
-        self.items = {}  # Dictionary to store item counts
-        self.totalCost = 0.0
-    
-    def add_item(self, item: MenuItem):
-        # Add item to cart and update total cost
-        self.items[item] = self.items.get(item, 0) + 1
-        self.totalCost += item.price
-    
-    def remove_item(self, item: MenuItem):
-        # Remove item from cart and update total cost
-        if item in self.items:
-            self.items[item] -= 1
-            if self.items[item] == 0:
-                del self.items[item]
-            self.totalCost -= item.price  # Fixed typo: self.item.price -> item.price
+        self.lines = {}        # Line key -> CartLine, in the order lines were added
+        self._keys_by_id = {}  # Menu item ID -> line keys holding that item
+        self.total_cents = 0
+
+    @staticmethod
+    def line_key(item_id, notes=""):
+        return f"{item_id}|{notes}" if notes else item_id
+
+    # Quantity operations
+
+    def add(self, item_id, name, price, quantity=1, notes=""):
+        """Add units of an item, merging with an existing identical line. Returns the line key."""
+        key = self.line_key(item_id, notes)
+        line = self.lines.get(key)
+        if line is None:
+            line = CartLine(key, item_id, name, to_cents(price), 0, notes)
+            self.lines[key] = line
+            self._keys_by_id.setdefault(item_id, []).append(key)
+        line.quantity += quantity
+        self.total_cents += line.price_cents * quantity
+        return key
+
+    def set_quantity(self, key, quantity):
+        """Set a line's quantity; a quantity of zero or less removes the line."""
+        line = self.lines[key]
+        if quantity <= 0:
+            self.remove(key)
+            return
+        self.total_cents += line.price_cents * (quantity - line.quantity)
+        line.quantity = quantity
+
+    def decrease(self, key, amount=1):
+        """Decrease a line's quantity, removing it when it reaches zero. Returns the units removed."""
+        line = self.lines[key]
+        removed = min(amount, line.quantity)
+        self.set_quantity(key, line.quantity - removed)
+        return removed
+
+    def remove(self, key):
+        """Remove a line entirely. Returns the units removed."""
+        line = self.lines.pop(key)
+        keys = self._keys_by_id[line.id]
+        keys.remove(key)
+        if not keys:
+            del self._keys_by_id[line.id]
+        self.total_cents -= line.price_cents * line.quantity
+        return line.quantity
+
+    def clear(self):
+        self.lines.clear()
+        self._keys_by_id.clear()
+        self.total_cents = 0
+
+    def find_key(self, item_id):
+        """Return the key of the first line holding a menu item, or None."""
+        keys = self._keys_by_id.get(item_id)
+        return keys[0] if keys else None
+
+    # Operations
+
+    def apply(self, op):
+        """
+        Apply a single cart operation.
+
+        Supported operations:
+            {"op": "add", "line": {...}}        add a plain line, merging by menu ID
+            {"op": "customize", "line": {...}}  add a customized line, merging identical customizations
+            {"op": "remove", "key" or "id": ..., "decrease_only": bool}
+            {"op": "set_quantity", "key" or "id": ..., "quantity": n}
+            {"op": "clear"}
+            {"op": "replace", "order": {...}}   swap in a complete order (used by the agent)
+            {"op": "batch", "ops": [...]}       apply several operations, all or nothing
+
+        Returns the quantity removed for "remove" operations, a list of results
+        for "batch" operations and None otherwise.
+        Raises KeyError if the targeted line is not in the cart.
+        """
+        kind = op["op"]
+
+        if kind in ("add", "customize"):
+            line = op["line"]
+            notes = line.get("notes", "") if kind == "customize" else ""
+            self.add(line["id"], line["name"], line["price"], line.get("quantity", 1), notes)
+        elif kind in ("remove", "set_quantity"):
+            key = op.get("key") or self.find_key(op.get("id"))
+            if key not in self.lines:
+                raise KeyError(op.get("key") or op.get("id"))
+            if kind == "set_quantity":
+                self.set_quantity(key, op["quantity"])
+            elif op.get("decrease_only") and self.lines[key].quantity > 1:
+                return self.decrease(key)
+            else:
+                return self.remove(key)
+        elif kind == "clear":
+            self.clear()
+        elif kind == "replace":
+            self.clear()
+            self.load_order(op["order"])
+        elif kind == "batch":
+            return self.apply_batch(op["ops"])
         else:
+            raise ValueError(f"Unknown cart operation '{kind}'")
+        return None
+
+    def apply_batch(self, ops):
+        """
+        Apply operations in order as one unit. Returns the result of each.
+
+        If any operation fails the cart is restored to its state before the
+        batch and the error is raised, so either every operation applies or
+        none does.
+        """
+        checkpoint = self.to_order()
+        try:
+            return [self.apply(op) for op in ops]
+        except Exception:
+            self.clear()
+            self.load_order(checkpoint)
+            raise
+
+    # Order documents
+
+    @property
+    def total(self):
+        return self.total_cents / 100
+
+    def load_order(self, order):
+        """Add every line of an order document to the cart."""
+        for line in order.get("menuItems", order.get("items", [])):
+            self.add(line["id"], line.get("name", line["id"]), line.get("price", 0),
+                     line.get("quantity", 1), line.get("notes", "") or "")
+
+    @classmethod
+    def from_order(cls, order, name="cart"):
+        cart = cls(name)
+        cart.load_order(order)
+        return cart
+
+    def to_order(self):
+        """Return the cart as an order document: {"menuItems": [...], "total": ...}."""
+        return {
+            "menuItems": [line.to_dict() for line in self.lines.values()],
+            "total": self.total
+        }
+
+    # MenuItem helpers
+
+    def add_item(self, item: "MenuItem"):
+        return self.add(item.id, item.name, item.price)
+
+    def remove_item(self, item: "MenuItem"):
+        key = self.line_key(item.id)
+        if key not in self.lines:
             raise KeyError(f"Menu item '{item.name}' not found in the cart.")
-    
+        self.decrease(key)
+
     def get_cart(self):
-        return self.items
-    
+        return list(self.lines.values())
+
     def get_total_cost(self):
-        return self.totalCost
-    
+        return self.total
+
     def edit_item(self, old_item, new_item):
         self.remove_item(old_item)
-        self.add_item(new_item)
\ No newline at end of file
+        self.add_item(new_item)
@@ -243,6 +243,82 @@ function removeTypingIndicator() {
     }
 }
 
+// Parse one Server-Sent Events frame into {event, data}
+function parseSseFrame(frame) {
+    let event = 'message';
+    const dataLines = [];
+    frame.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+        }
+    });
+    return { event: event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : null };
+}
+
+// Send a chat message to the streaming endpoint, rendering the reply as it
+// arrives, and resolve with the final payload (the same shape /api/chat returns)
+async function streamChatResponse(body) {
+    const response = await fetch('/api/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(body),
+    });
+    
+    // The server turns chat requests away while its agent pool is full
+    if (response.status === 503) {
+        const busy = await response.json();
+        removeTypingIndicator();
+        addMessage(busy.response);
+        return busy;
+    }
+
+    if (!response.ok || !response.body) {
+        throw new Error('Chat stream failed with status ' + response.status);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let replyPara = null;
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = parseSseFrame(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+            
+            if (frame.event === 'delta') {
+                if (!replyPara) {
+                    removeTypingIndicator();
+                    addMessage('');
+                    replyPara = chatMessages.lastElementChild.querySelector('p');
+                }
+                replyPara.textContent += frame.data.text;
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            } else if (frame.event === 'order' || frame.event === 'error') {
+                // The final payload carries the complete reply, including the order total
+                removeTypingIndicator();
+                if (replyPara) {
+                    replyPara.textContent = frame.data.response;
+                } else {
+                    addMessage(frame.data.response);
+                }
+                return frame.data;
+            }
+        }
+    }
+    
+    throw new Error('Chat stream ended without an order event');
+}
+
 async function sendMessage(message) {
     addMessage(message, true);
     showTypingIndicator();
@@ -300,23 +376,12 @@ async function sendMessage(message) {
         
         const isRemovalIntent = /remove|delete|take off|clear|empty/i.test(message);
         
-        const response = await fetch('/api/chat', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                message: message,
-                currentOrder: currentOrder,
-                conversationHistory: conversationHistory
-            }),
+        const data = await streamChatResponse({
+            message: message,
+            currentOrder: currentOrder,
+            conversationHistory: conversationHistory
         });
         
-        const data = await response.json();
-        
-        removeTypingIndicator();
-        addMessage(data.response);
-        
         if (isRemovalIntent || (data.removed_items && data.removed_items.length > 0)) {
             if (typeof window.forceCartRefresh === 'function') {
                 window.forceCartRefresh();
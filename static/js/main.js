@@ -13,6 +13,52 @@ let currentDrinks = [];
 let selectedSauce = null;
 let selectedSide = null;
 
+// Whole-menu snapshot, preloaded once per page; lookups fall back to the server until it arrives
+let menuSnapshot = null;
+let menuSnapshotRequest = null;
+
+function loadMenuSnapshot() {
+    if (!menuSnapshotRequest) {
+        menuSnapshotRequest = fetch('/api/menu/snapshot')
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                menuSnapshot = data;
+            }
+            return menuSnapshot;
+        })
+        .catch(error => {
+            console.error('Error loading menu snapshot:', error);
+            menuSnapshotRequest = null;
+            return null;
+        });
+    }
+    return menuSnapshotRequest;
+}
+
+// Resolves to the same { success, item } response as /api/get_item_details
+function fetchItemDetails(itemId) {
+    return loadMenuSnapshot().then(snapshot => {
+        if (snapshot && snapshot.details[itemId]) {
+            // Copied so modals can't modify the snapshot
+            return { success: true, item: JSON.parse(JSON.stringify(snapshot.details[itemId])) };
+        }
+        return fetch('/api/get_item_details?item_id=' + encodeURIComponent(itemId))
+        .then(response => response.json());
+    });
+}
+
+// Resolves to the same response as /api/get_sauces, /api/get_drinks or /api/get_sides
+function fetchMenuList(name) {
+    return loadMenuSnapshot().then(snapshot => {
+        if (snapshot) {
+            return { success: true, [name]: snapshot[name] };
+        }
+        return fetch('/api/get_' + name)
+        .then(response => response.json());
+    });
+}
+
 function saveCartToLocalStorage() {
     localStorage.setItem('cartItems', JSON.stringify(cartItems));
     localStorage.setItem('cartTotal', cartTotal.toString());
@@ -66,13 +112,7 @@ function openComboModal(item) {
     selectedDrink = null;
     
     // Fetch available drinks
-    fetch('/api/get_drinks', {
-        method: 'GET',
-        headers: {
-            'Content-Type': 'application/json',
-        }
-    })
-    .then(response => response.json())
+    fetchMenuList('drinks')
     .then(data => {
         if (data.success) {
             // Create radio buttons for each drink
@@ -137,69 +177,50 @@ function openComboModal(item) {
     comboModal.style.display = 'block';
 }
 
-function addComboToCart(baseItem, drinkItem) {
-    if (!baseItem || !drinkItem) {
-        showNotification('Please select a drink for your combo', 'error');
-        return;
-    }
-    
-    // Find the fries item
-    fetch('/api/get_item_details', {
+// Apply several cart operations in one atomic request; resolves to the /api/cart/batch response
+function applyCartBatch(operations) {
+    return fetch('/api/cart/batch', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ item_id: 'SIDE002' }),  // MEDIUM French Fries ID
+        body: JSON.stringify({ operations: operations }),
     })
     .then(response => response.json())
     .then(data => {
         if (data.success) {
-            const friesItem = data.item;
+            cartItems = data.cart;
+            cartTotal = data.total;
             
-            const standardDrinkPrice = 1.99;
-            const baseComboUpcharge = 2.99;
-            const drinkUpcharge = Math.max(0, drinkItem.price - standardDrinkPrice);
-            const finalComboPrice = baseItem.price + baseComboUpcharge + drinkUpcharge;
+            saveCartToLocalStorage();
+            updateCartCountBadge();
+        }
+        return data;
+    });
+}
+
+function addComboToCart(baseItem, drinkItem) {
+    if (!baseItem || !drinkItem) {
+        showNotification('Please select a drink for your combo', 'error');
+        return;
+    }
+    
+    // The server adds the medium fries and prices the combo, including any premium drink upcharge
+    applyCartBatch([
+        { op: 'combo', item_id: baseItem.id, drink_id: drinkItem.id }
+    ])
+    .then(data => {
+        if (data.success) {
+            showNotification('Combo meal added to cart!');
             
-            fetch('/api/add_combo_to_cart', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    base_item_id: baseItem.id,
-                    fries_item_id: friesItem.id,
-                    drink_item_id: drinkItem.id,
-                    combo_price: finalComboPrice
-                }),
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    cartItems = data.cart;
-                    cartTotal = data.total;
-                    
-                    saveCartToLocalStorage();
-                    updateCartCountBadge();
-                    
-                    showNotification('Combo meal added to cart!');
-                    
-                    document.getElementById('combo-modal').style.display = 'none';
-                } else {
-                    showNotification('Error: ' + data.message, 'error');
-                }
-            })
-            .catch(error => {
-                console.error('Error adding combo to cart:', error);
-                showNotification('Error adding combo to cart', 'error');
-            });
+            document.getElementById('combo-modal').style.display = 'none';
         } else {
-            showNotification('Error getting fries information: ' + data.message, 'error');
+            showNotification('Error: ' + data.message, 'error');
         }
     })
     .catch(error => {
-        console.error('Error getting fries details:', error);
-        showNotification('Error getting fries details', 'error');
+        console.error('Error adding combo to cart:', error);
+        showNotification('Error adding combo to cart', 'error');
     });
 }
 
@@ -392,6 +413,8 @@ function updateCartCountBadge() {
 }
 
 document.addEventListener('DOMContentLoaded', function() {
+    loadMenuSnapshot();
+    
     const cartModal = document.getElementById('cart-modal');
     const cartBtn = document.getElementById('cart-btn');
     const closeBtn = document.querySelector('#cart-modal .close');
@@ -535,14 +558,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 itemId = sizeSelect.value;
             }
             
-            fetch('/api/get_item_details', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ item_id: itemId }),
-            })
-            .then(response => response.json())
+            fetchItemDetails(itemId)
             .then(data => {
                 if (data.success) {
                     openComboModal(data.item);
@@ -624,14 +640,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 itemId = sizeSelect.value;
             }
             
-            fetch('/api/get_item_details', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ item_id: itemId }),
-            })
-            .then(response => response.json())
+            fetchItemDetails(itemId)
             .then(data => {
                 if (data.success) {
                     openCustomizeModal(data.item);
@@ -657,6 +666,15 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
     
+    const menuSearchInput = document.getElementById('menu-search-input');
+    if (menuSearchInput) {
+        let searchTimer = null;
+        menuSearchInput.addEventListener('input', function() {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(() => searchMenu(menuSearchInput.value.trim()), 120);
+        });
+    }
+    
     if (llmSubmit && llmInput) {
         llmSubmit.addEventListener('click', function() {
             const userInput = llmInput.value.trim();
@@ -886,6 +904,81 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 });
 
+let latestSearchQuery = '';
+
+// Search-as-you-type over the menu; results reuse the menu item card markup
+function searchMenu(query) {
+    const menuSection = document.querySelector('.menu-section');
+    const resultsContainer = document.getElementById('search-results');
+    latestSearchQuery = query;
+    
+    if (!query) {
+        menuSection.classList.remove('searching');
+        resultsContainer.innerHTML = '';
+        return;
+    }
+    
+    fetch('/api/search?q=' + encodeURIComponent(query))
+    .then(response => response.json())
+    .then(data => {
+        // Ignore responses to queries the customer has already typed past
+        if (query !== latestSearchQuery) return;
+        
+        menuSection.classList.add('searching');
+        resultsContainer.innerHTML = '';
+        
+        if (!data.success || data.results.length === 0) {
+            const empty = document.createElement('p');
+            empty.className = 'search-empty';
+            empty.textContent = 'No menu items match "' + query + '"';
+            resultsContainer.appendChild(empty);
+            return;
+        }
+        
+        data.results.forEach(item => {
+            const card = document.createElement('div');
+            card.className = 'menu-item';
+            card.dataset.id = item.id;
+            card.dataset.combo = String(item.combo).toLowerCase();
+            
+            const details = document.createElement('div');
+            details.className = 'item-details';
+            const name = document.createElement('h4');
+            name.textContent = item.name;
+            const description = document.createElement('p');
+            description.className = 'item-description';
+            description.textContent = item.description;
+            const price = document.createElement('p');
+            price.className = 'price';
+            price.textContent = '$' + item.price.toFixed(2);
+            details.append(name, description, price);
+            
+            const actions = document.createElement('div');
+            actions.className = 'item-actions';
+            const customizeButton = document.createElement('button');
+            customizeButton.className = 'customize-btn';
+            customizeButton.textContent = 'Customize';
+            actions.appendChild(customizeButton);
+            if (item.combo) {
+                const comboButton = document.createElement('button');
+                comboButton.className = 'combo-btn';
+                comboButton.textContent = 'Order as Combo (+$2.99)';
+                actions.appendChild(comboButton);
+            }
+            const addButton = document.createElement('button');
+            addButton.className = 'add-to-cart-btn';
+            addButton.textContent = 'Add to Cart';
+            actions.appendChild(addButton);
+            
+            card.append(details, actions);
+            resultsContainer.appendChild(card);
+        });
+    })
+    .catch(error => {
+        console.error('Error searching the menu:', error);
+    });
+}
+
 function openCustomizeModal(item) {
     currentItem = item;
     
@@ -1221,7 +1314,7 @@ function updateCartDisplay() {
             removeBtn.innerHTML = '<i class="fas fa-trash"></i>';
             removeBtn.title = 'Remove combo';
             removeBtn.addEventListener('click', function() {
-                removeFromCart(item.id);
+                removeFromCart(item.id, false, item.key);
             });
             
             const decreaseBtn = document.createElement('button');
@@ -1229,7 +1322,7 @@ function updateCartDisplay() {
             decreaseBtn.innerHTML = '<i class="fas fa-minus"></i>';
             decreaseBtn.title = 'Decrease quantity';
             decreaseBtn.addEventListener('click', function() {
-                removeFromCart(item.id, true);
+                removeFromCart(item.id, true, item.key);
             });
             
             const actionsContainer = document.createElement('div');
@@ -1270,7 +1363,7 @@ function updateCartDisplay() {
             removeBtn.innerHTML = '<i class="fas fa-trash"></i>';
             removeBtn.title = 'Remove item';
             removeBtn.addEventListener('click', function() {
-                removeFromCart(item.id);
+                removeFromCart(item.id, false, item.key);
             });
             
             const decreaseBtn = document.createElement('button');
@@ -1278,7 +1371,7 @@ function updateCartDisplay() {
             decreaseBtn.innerHTML = '<i class="fas fa-minus"></i>';
             decreaseBtn.title = 'Decrease quantity';
             decreaseBtn.addEventListener('click', function() {
-                removeFromCart(item.id, true);
+                removeFromCart(item.id, true, item.key);
             });
             
             const actionsContainer = document.createElement('div');
@@ -1308,7 +1401,7 @@ function updateCartDisplay() {
     cartTotalPrice.textContent = '$' + cartTotal.toFixed(2);
 }
 
-function removeFromCart(itemId, decreaseOnly = false) {
+function removeFromCart(itemId, decreaseOnly = false, lineKey = null) {
     // Find the item in the cart array
     let itemIndex = -1;
     if (Array.isArray(cartItems)) {
@@ -1332,6 +1425,7 @@ function removeFromCart(itemId, decreaseOnly = false) {
         },
         body: JSON.stringify({ 
             item_id: itemId,
+            line_key: lineKey,
             decrease_only: decreaseOnly
         }),
     })
@@ -1547,13 +1641,7 @@ function openSauceSuggestionModal(itemId) {
     sauceOptions.innerHTML = '';
     
     // Fetch available sauces
-    fetch('/api/get_sauces', {
-        method: 'GET',
-        headers: {
-            'Content-Type': 'application/json',
-        }
-    })
-    .then(response => response.json())
+    fetchMenuList('sauces')
     .then(data => {
         if (data.success) {
             currentSauces = data.sauces;
@@ -1677,13 +1765,7 @@ function openEntreeSuggestionModal(itemId) {
     
     // Fetch sides data
     console.log('Fetching sides data...');
-    fetch('/api/get_sides', {
-        method: 'GET',
-        headers: {
-            'Content-Type': 'application/json',
-        }
-    })
-    .then(response => response.json())
+    fetchMenuList('sides')
     .then(data => {
         if (data.success) {
             currentSides = data.sides;
@@ -1763,13 +1845,7 @@ function openEntreeSuggestionModal(itemId) {
         showNotification('Error fetching suggestions', 'error');
     });
 
-    fetch('/api/get_drinks', {
-        method: 'GET',
-        headers: {
-            'Content-Type': 'application/json',
-        }
-    })
-    .then(response => response.json())
+    fetchMenuList('drinks')
     .then(data => {
         if (data.success) {
             currentDrinks = data.drinks; // Fix variable name
@@ -1879,77 +1955,29 @@ function addSelectedSideAndDrinkToCart() {
     }
     
     if (itemsToAdd.length > 0) {
-        // Use the multiple_items endpoint if we have both items
-        if (itemsToAdd.length > 1) {
-            fetch('/api/add_to_cart', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    multiple_items: true,
-                    items: itemsToAdd
-                }),
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    cartItems = data.cart;
-                    cartTotal = data.total;
-                    
-                    saveCartToLocalStorage();
-                    updateCartCountBadge();
-                    
-                    let message = '';
-                    if (selectedSide && selectedDrink) {
-                        message = `Added ${selectedSide.name} and ${selectedDrink.name} to your order!`;
-                    }
-                    
-                    if (message) {
-                        showNotification(message);
-                    }
+        applyCartBatch(itemsToAdd.map(item => ({ op: 'add', item_id: item.id })))
+        .then(data => {
+            if (data.success) {
+                let message = '';
+                if (selectedSide && selectedDrink) {
+                    message = `Added ${selectedSide.name} and ${selectedDrink.name} to your order!`;
+                } else if (selectedSide) {
+                    message = `Added ${selectedSide.name} to your order!`;
+                } else if (selectedDrink) {
+                    message = `Added ${selectedDrink.name} to your order!`;
                 }
-            })
-            .catch(error => {
-                console.error('Error adding multiple items to cart:', error);
-                showNotification('Error adding items to cart', 'error');
-            });
-        } else {
-            // Use the single item endpoint if we only have one item
-            const singleItem = itemsToAdd[0];
-            fetch('/api/add_to_cart', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ item_id: singleItem.id }),
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    cartItems = data.cart;
-                    cartTotal = data.total;
-                    
-                    saveCartToLocalStorage();
-                    updateCartCountBadge();
-                    
-                    let message = '';
-                    if (selectedSide) {
-                        message = `Added ${selectedSide.name} to your order!`;
-                    } else if (selectedDrink) {
-                        message = `Added ${selectedDrink.name} to your order!`;
-                    }
-                    
-                    if (message) {
-                        showNotification(message);
-                    }
+                
+                if (message) {
+                    showNotification(message);
                 }
-            })
-            .catch(error => {
-                console.error('Error adding item to cart:', error);
-                showNotification('Error adding item to cart', 'error');
-            });
-        }
+            } else {
+                showNotification('Error: ' + data.message, 'error');
+            }
+        })
+        .catch(error => {
+            console.error('Error adding items to cart:', error);
+            showNotification('Error adding items to cart', 'error');
+        });
     }
     
     entreeModal.style.display = 'none';
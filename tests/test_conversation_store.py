@@ -0,0 +1,80 @@
+import pytest
+
+import conversation_store
+from conversation_store import ConversationStore
+
+
+class Clock:
+    """Stands in for the time module so TTLs can be crossed without sleeping."""
+
+    def __init__(self):
+        self.now = 1000000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(conversation_store, "time", clock)
+    return clock
+
+
+def user(text):
+    return {"role": "user", "content": text}
+
+
+def test_least_recently_used_sessions_are_evicted_beyond_max_sessions(clock):
+    store = ConversationStore(max_sessions=2)
+    store.append("a", user("one Big Mac"))
+    clock.now += 1
+    store.append("b", user("large fries"))
+    clock.now += 1
+    store.history("a")  # Reading marks "a" as recently used
+    clock.now += 1
+    store.append("c", user("a coke"))
+
+    assert store.evictions == 1
+    assert store.stats()["resident_sessions"] == 2
+    assert store.history("a") == [user("one Big Mac")]
+
+
+def test_idle_sessions_expire_after_ttl(clock):
+    store = ConversationStore(ttl_seconds=60)
+    store.append("idle", user("one Big Mac"))
+    clock.now += 30
+    store.append("active", user("large fries"))
+    clock.now += 45
+
+    assert store.stats()["resident_sessions"] == 1
+    assert store.evictions == 1
+    assert store.history("idle") == []
+
+
+def test_trimming_keeps_system_messages_and_summarizes_dropped_ones():
+    dropped = []
+
+    def summarizer(summary, message):
+        dropped.append(message["content"])
+        return f"{summary} {message['content']}".strip()
+
+    store = ConversationStore(max_messages=3, summarizer=summarizer)
+    store.append("a", {"role": "system", "content": "You take orders."})
+    for text in ("one", "two", "three", "four"):
+        store.append("a", user(text))
+
+    messages, summary = store.context("a")
+    assert [m["content"] for m in messages] == ["You take orders.", "three", "four"]
+    assert dropped == ["one", "two"]
+    assert summary == "one two"
+    assert store.stats()["resident_chars"] == sum(len(m["content"]) for m in messages)
+
+
+def test_newest_message_is_kept_even_when_it_exceeds_max_chars():
+    store = ConversationStore(max_chars=10)
+    store.append("a", user("short"))
+    store.append("a", user("a message longer than the cap"))
+
+    assert store.history("a") == [user("a message longer than the cap")]
+    assert store.trimmed_messages == 1
@@ -0,0 +1,53 @@
+import shutil
+
+import pytest
+
+from menu_registry import MenuRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    for store_id in ("north", "south", "east", "west"):
+        shutil.copy("menu_data.json", tmp_path / f"{store_id}.json")
+    return MenuRegistry(directory=str(tmp_path), default_path="menu_data.json", max_resident=2)
+
+
+def test_least_recently_used_store_is_evicted_beyond_max_resident(registry):
+    registry.menu("north")
+    registry.menu("south")
+    registry.menu("north")  # Marks "north" as recently used
+    registry.menu("east")
+
+    assert registry.stats()["resident"] == ["north", "east"]
+    assert registry.evictions == 1
+
+
+def test_evicted_store_is_reloaded_on_its_next_request(registry):
+    first = registry.menu("north")
+    registry.menu("south")
+    registry.menu("east")
+
+    again = registry.menu("north")
+    assert again is not first
+    assert again.items.keys() == first.items.keys()
+    assert registry.stats()["stores"]["north"]["loads"] == 2
+
+
+def test_preloaded_stores_are_never_evicted(registry):
+    registry.preload(["north"])
+    for store_id in ("south", "east", "west"):
+        registry.menu(store_id)
+
+    resident = registry.stats()["resident"]
+    assert "north" in resident
+    assert len(resident) == 2
+
+
+def test_unknown_and_malformed_stores_are_rejected_without_taking_a_slot(registry):
+    with pytest.raises(KeyError):
+        registry.menu("nowhere")
+    with pytest.raises(KeyError):
+        registry.menu("../menu_data")
+
+    assert registry.stats()["resident"] == []
+    assert registry._load_locks == {}
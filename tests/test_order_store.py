@@ -0,0 +1,198 @@
+import os
+
+import pytest
+
+import order_store
+from order_store import InMemoryOrderStore, JournalOrderStore
+
+
+class Clock:
+    """Stands in for the time module so TTLs can be crossed without sleeping."""
+
+    def __init__(self):
+        self.now = 1000000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(order_store, "time", clock)
+    return clock
+
+
+def add(item_id, price=1.0, quantity=1):
+    return {"op": "add", "line": {"id": item_id, "name": item_id, "price": price, "quantity": quantity}}
+
+
+def open_journal(directory, **options):
+    # A long flush interval keeps the background thread from compacting mid-test
+    options.setdefault("flush_interval", 100)
+    return JournalOrderStore(str(directory), **options)
+
+
+def segment_paths(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.startswith("journal-"))
+
+
+# In-memory store
+
+def test_reading_a_session_does_not_store_a_cart():
+    store = InMemoryOrderStore()
+
+    assert store.load("kiosk-1")["menuItems"] == []
+    assert store.session_count() == 0
+
+
+def test_least_recently_used_carts_are_evicted_beyond_max_sessions(clock):
+    store = InMemoryOrderStore(max_sessions=2)
+    store.apply("a", add("BURG001"))
+    clock.now += 1
+    store.apply("b", add("BURG001"))
+    clock.now += 1
+    store.load("a")  # Reading marks "a" as recently used
+    clock.now += 1
+    store.apply("c", add("BURG001"))
+
+    assert store.session_count() == 2
+    assert store.evictions == 1
+    assert store.load("b")["menuItems"] == []
+    assert len(store.load("a")["menuItems"]) == 1
+
+
+def test_idle_carts_expire_after_ttl(clock):
+    store = InMemoryOrderStore(ttl_seconds=60)
+    store.apply("idle", add("BURG001"))
+    clock.now += 30
+    store.apply("active", add("BURG001"))
+    clock.now += 45
+    store.apply("active", add("SIDE001-m"))
+
+    assert store.session_count() == 1
+    assert store.evictions == 1
+    assert store.load("idle")["menuItems"] == []
+
+
+def test_rejected_operation_leaves_the_cart_unchanged():
+    store = InMemoryOrderStore()
+    store.apply("a", add("BURG001", 5.99))
+    before = store.load("a")
+
+    with pytest.raises(KeyError):
+        store.apply("a", {"op": "batch", "ops": [add("SIDE001-m"), {"op": "remove", "key": "DRINK001-m"}]})
+
+    assert store.load("a") == before
+
+
+# Journal store
+
+def test_journal_replays_orders_after_restart(tmp_path):
+    store = open_journal(tmp_path)
+    store.apply("a", add("BURG001", 5.99, 2))
+    store.apply("b", add("SIDE001-m", 2.99))
+    store.apply("a", {"op": "set_quantity", "key": "BURG001", "quantity": 3})
+    store.discard("b")
+    store.close()
+
+    store = open_journal(tmp_path)
+    try:
+        assert store.load("a")["menuItems"][0]["quantity"] == 3
+        assert store.load("a")["total"] == 17.97
+        assert store.session_count() == 1
+    finally:
+        store.close()
+
+
+def test_journal_truncates_a_torn_record_and_keeps_appending(tmp_path):
+    store = open_journal(tmp_path)
+    store.apply("a", add("BURG001", 5.99))
+    store.apply("a", add("SIDE001-m", 2.99))
+    store.close()
+    # A crash mid-append leaves half a record at the end of the segment
+    segment = segment_paths(tmp_path)[-1]
+    size_before_tear = os.path.getsize(segment)
+    with open(segment, "ab") as file:
+        file.write(b'{"seq":3,"session":"a","op":{"op":"add","li')
+
+    store = open_journal(tmp_path)
+    try:
+        assert [line["id"] for line in store.load("a")["menuItems"]] == ["BURG001", "SIDE001-m"]
+        assert os.path.getsize(segment) == size_before_tear
+        store.apply("a", add("DRINK001-m", 1.99))
+    finally:
+        store.close()
+
+    store = open_journal(tmp_path)
+    try:
+        assert [line["id"] for line in store.load("a")["menuItems"]] == ["BURG001", "SIDE001-m", "DRINK001-m"]
+    finally:
+        store.close()
+
+
+def test_journal_ends_a_final_record_that_lost_its_newline(tmp_path):
+    store = open_journal(tmp_path)
+    store.apply("a", add("BURG001", 5.99))
+    store.close()
+    segment = segment_paths(tmp_path)[-1]
+    with open(segment, "rb+") as file:
+        file.truncate(os.path.getsize(segment) - 1)
+
+    store = open_journal(tmp_path)
+    try:
+        store.apply("a", add("SIDE001-m", 2.99))
+    finally:
+        store.close()
+
+    store = open_journal(tmp_path)
+    try:
+        assert [line["id"] for line in store.load("a")["menuItems"]] == ["BURG001", "SIDE001-m"]
+    finally:
+        store.close()
+
+
+def test_journal_compaction_keeps_orders_and_removes_covered_segments(tmp_path):
+    store = open_journal(tmp_path)
+    store.apply("a", add("BURG001", 5.99))
+    store.apply("b", add("SIDE001-m", 2.99))
+    store.compact()
+    store.apply("a", add("BURG001", 5.99))
+    store.discard("b")
+    store.close()
+
+    assert len(segment_paths(tmp_path)) == 1
+    assert os.path.exists(tmp_path / JournalOrderStore.SNAPSHOT_NAME)
+
+    store = open_journal(tmp_path)
+    try:
+        assert store.load("a")["menuItems"][0]["quantity"] == 2
+        assert store.load("b")["menuItems"] == []
+    finally:
+        store.close()
+
+
+def test_journal_does_not_record_rejected_operations(tmp_path):
+    store = open_journal(tmp_path)
+    store.apply("a", add("BURG001", 5.99))
+    with pytest.raises(KeyError):
+        store.apply("a", {"op": "remove", "key": "DRINK001-m"})
+    store.close()
+
+    with open(segment_paths(tmp_path)[-1], encoding="utf-8") as file:
+        assert len(file.readlines()) == 1
+
+
+def test_journal_does_not_bring_back_evicted_carts(tmp_path):
+    store = open_journal(tmp_path, max_sessions=1)
+    store.apply("a", add("BURG001", 5.99))
+    store.apply("b", add("SIDE001-m", 2.99))
+    assert store.evictions == 1
+    store.close()
+
+    store = open_journal(tmp_path, max_sessions=1)
+    try:
+        assert store.load("a")["menuItems"] == []
+        assert len(store.load("b")["menuItems"]) == 1
+    finally:
+        store.close()
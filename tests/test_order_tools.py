@@ -0,0 +1,73 @@
+import pytest
+
+from menu import Menu
+from order_repair import OrderRepairer
+from order_tools import ingredient_index, plan_order_changes
+from shopping_cart import ShoppingCart
+
+
+@pytest.fixture(scope="module")
+def menu():
+    menu = Menu()
+    menu.load_menu("menu_data.json")
+    return menu
+
+
+def plan(menu, calls, order=None, repairer=True):
+    return plan_order_changes(calls, menu.items, order or {"menuItems": [], "total": 0.0},
+                              repairer=OrderRepairer(menu.items) if repairer else None,
+                              ingredients=ingredient_index(menu.items))
+
+
+def apply(order, ops):
+    cart = ShoppingCart.from_order(order)
+    cart.apply({"op": "batch", "ops": ops})
+    return cart.to_order()
+
+
+def test_mangled_size_suffix_is_repaired_to_the_size_variant(menu):
+    ops, rejected, repaired = plan(menu, [("add_item", {"item_id": "side001 (Large)", "quantity": 2})])
+
+    assert rejected == []
+    assert ops[0]["line"]["id"] == "SIDE001-l"
+    assert ops[0]["line"]["quantity"] == 2
+    assert repaired == [("side001 (Large)", "French Fries (Large)")]
+
+
+def test_unknown_item_is_rejected_without_a_repairer(menu):
+    ops, rejected, repaired = plan(menu, [("add_item", {"item_id": "SIDE001-large"})], repairer=False)
+
+    assert ops == []
+    assert rejected == ["add_item: SIDE001-large is not on the menu"]
+
+
+def test_item_that_cannot_be_told_for_sure_is_rejected(menu):
+    ops, rejected, repaired = plan(menu, [("add_item", {"item_id": "ZZZ999", "name": "Unicorn Sundae"})])
+
+    assert ops == []
+    assert len(rejected) == 1
+    assert repaired == []
+
+
+def test_line_reference_is_repaired_against_the_order(menu):
+    order = apply({"menuItems": [], "total": 0.0}, plan(menu, [("add_item", {"item_id": "BURG001"})])[0])
+
+    ops, rejected, repaired = plan(menu, [("set_quantity", {"item_id": "Big Mac", "quantity": 3})], order)
+
+    assert rejected == []
+    assert ops == [{"op": "set_quantity", "key": "BURG001", "quantity": 3}]
+    assert repaired == [("Big Mac", "Big Mac")]
+
+
+def test_later_calls_see_lines_added_by_earlier_ones_and_bad_calls_are_skipped(menu):
+    ops, rejected, repaired = plan(menu, [
+        ("add_item", {"item_id": "BURG001"}),
+        ("remove_item", {"item_id": "DRINK999"}),
+        ("set_notes", {"item_id": "BURG001", "notes": "no pickles, extra TOPPING010"}),
+    ])
+
+    order = apply({"menuItems": [], "total": 0.0}, ops)
+    assert len(rejected) == 1
+    assert [line["name"] for line in order["menuItems"]] == ["Big Mac (Customized)"]
+    # Bacon, named by its ingredient ID, is repaired in the notes and charged for
+    assert order["total"] == 6.99
@@ -0,0 +1,56 @@
+import pytest
+
+from shopping_cart import ShoppingCart
+
+
+def line(item_id, price, quantity=1, notes=None):
+    data = {"id": item_id, "name": item_id, "price": price, "quantity": quantity}
+    if notes:
+        data["notes"] = notes
+    return data
+
+
+def test_batch_applies_every_operation_and_returns_each_result():
+    cart = ShoppingCart()
+    results = cart.apply({"op": "batch", "ops": [
+        {"op": "add", "line": line("BURG001", 5.99, 2)},
+        {"op": "customize", "line": line("BURG001", 6.99, notes="Added: Bacon")},
+        {"op": "remove", "id": "BURG001", "decrease_only": True},
+    ]})
+
+    assert results == [None, None, 1]
+    assert cart.lines["BURG001"].quantity == 1
+    assert cart.lines["BURG001|Added: Bacon"].quantity == 1
+    assert cart.total == 12.98
+
+
+def test_failed_batch_restores_the_cart():
+    cart = ShoppingCart()
+    cart.apply({"op": "add", "line": line("SIDE001-m", 2.79)})
+    before = cart.to_order()
+
+    with pytest.raises(KeyError):
+        cart.apply({"op": "batch", "ops": [
+            {"op": "add", "line": line("BURG001", 5.99)},
+            {"op": "set_quantity", "id": "SIDE001-m", "quantity": 3},
+            {"op": "clear"},
+            {"op": "remove", "key": "DRINK001-m"},
+        ]})
+
+    assert cart.to_order() == before
+    assert cart.total_cents == 279
+    # The ID index is rebuilt too, so lines are still found by menu ID
+    assert cart.find_key("SIDE001-m") == "SIDE001-m"
+    assert cart.find_key("BURG001") is None
+
+
+def test_failed_batch_inside_a_batch_rolls_back_the_outer_batch():
+    cart = ShoppingCart()
+
+    with pytest.raises(ValueError):
+        cart.apply({"op": "batch", "ops": [
+            {"op": "add", "line": line("BURG001", 5.99)},
+            {"op": "batch", "ops": [{"op": "add", "line": line("SIDE001-m", 2.79)}, {"op": "unknown"}]},
+        ]})
+
+    assert cart.to_order() == {"menuItems": [], "total": 0.0}